@@ -0,0 +1,42 @@
+"""Contacts trigram indexes
+
+Revision ID: 5d08e6f3c9a1
+Revises: b7e2d4c81a05
+Create Date: 2026-10-18 11:58:31.270446
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d08e6f3c9a1'
+down_revision: Union[str, None] = 'b7e2d4c81a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRGM_COLUMNS = ('first_name', 'last_name', 'email')
+
+
+def upgrade() -> None:
+    # fuzzy search is PostgreSQL only, other databases use ILIKE
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in TRGM_COLUMNS:
+        op.create_index(
+            f'ix_contacts_{column}_trgm',
+            'contacts',
+            [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for column in TRGM_COLUMNS:
+        op.drop_index(f'ix_contacts_{column}_trgm', table_name='contacts')
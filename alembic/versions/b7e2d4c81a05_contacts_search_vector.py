@@ -0,0 +1,43 @@
+"""Contacts search vector
+
+Revision ID: b7e2d4c81a05
+Revises: 3f1c9a7d2b64
+Create Date: 2026-10-18 10:41:07.553912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d4c81a05'
+down_revision: Union[str, None] = '3f1c9a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # full-text search is PostgreSQL only, other databases use ILIKE
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(
+        "ALTER TABLE contacts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(first_name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(last_name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(email, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(phone, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(notes, '')), 'C')"
+        ") STORED"
+    )
+    op.create_index(
+        'ix_contacts_search_vector', 'contacts', ['search_vector'], postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_contacts_search_vector', table_name='contacts')
+    op.drop_column('contacts', 'search_vector')
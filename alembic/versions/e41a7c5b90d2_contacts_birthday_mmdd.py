@@ -0,0 +1,40 @@
+"""Contacts birthday mmdd
+
+Revision ID: e41a7c5b90d2
+Revises: 5d08e6f3c9a1
+Create Date: 2026-10-18 13:20:54.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41a7c5b90d2'
+down_revision: Union[str, None] = '5d08e6f3c9a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birthday_mmdd', sa.SmallInteger(), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "UPDATE contacts SET birthday_mmdd = "
+            "EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday) "
+            "WHERE birthday IS NOT NULL"
+        )
+    else:
+        op.execute(
+            "UPDATE contacts SET birthday_mmdd = "
+            "CAST(strftime('%m', birthday) AS INTEGER) * 100 + CAST(strftime('%d', birthday) AS INTEGER) "
+            "WHERE birthday IS NOT NULL"
+        )
+    op.create_index('ix_contacts_user_id_birthday_mmdd', 'contacts', ['user_id', 'birthday_mmdd'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birthday_mmdd', table_name='contacts')
+    op.drop_column('contacts', 'birthday_mmdd')
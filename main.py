@@ -1,30 +1,23 @@
-from fastapi import FastAPI, Request, status
-from fastapi_limiter import FastAPILimiter
+import asyncio
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
-from ipaddress import ip_address
 from src.conf.config import settings
-from src.routes import auth, contacts, users, db, seed
+from src.database.db import check_tables
+from src.routes import auth, contacts, users, db, seed, jobs
+from src.services.bans import BanMiddleware, ban_list, watch_bans
+from src.services.redis_pool import close_redis, redis_client
+from src.services.user_cache import user_cache
+from src.services.worker import start_workers
 from pathlib import Path
 
-from typing import Callable
-
-import re
-import redis.asyncio as redis
 import uvicorn
 
 
 app = FastAPI()
 
-banned_ips = [
-    # ip_address("127.0.0.1"),
-    ip_address("0.0.0.1"),
-]
-
-user_agent_ban_list = [r"Googlebot", r"Somebot", r"Python-urllib"]
-
 origins = ["*"]
 
 app.add_middleware(
@@ -35,6 +28,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# added last, so it is the outermost: the banned clients are refused before anything else runs
+app.add_middleware(BanMiddleware, ban_list=ban_list)
+
 BASE_DIR = Path(__file__).parent
 templates = Jinja2Templates(directory=BASE_DIR / "templates")
 
@@ -70,6 +66,7 @@ app.include_router(auth.router, prefix="/api")
 app.include_router(contacts.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(db.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
 app.include_router(seed.router, prefix="")
 
 
@@ -78,49 +75,30 @@ async def startup_app():
     """
     A function that runs when the program starts.
     """
-    r = await redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        db=0,
-        encoding="utf-8",
-        decode_responses=True,
-    )
-    await FastAPILimiter.init(r)
-
-
-app.add_event_handler("startup", startup_app)
-
-
-# @app.middleware("http")
-# async def ban_ips(request: Request, call_next: Callable):
-#     """
-#     ips ban function
-#     """
-#     ip = ip_address(request.client.host)
-#     if ip in banned_ips:
-#         print(f"{ip = }")
-#         return JSONResponse(
-#             status_code=status.HTTP_403_FORBIDDEN, content={"detail": "You are banned"}
-#         )
-#     response = await call_next(request)
-#     return response
+    await check_tables()
+    app.state.user_cache_listener = asyncio.create_task(user_cache.listen(redis_client))
+    app.state.job_workers = start_workers(settings.job_workers)
+    if settings.ban_source:
+        app.state.ban_watcher = asyncio.create_task(
+            watch_bans(ban_list, settings.ban_source, settings.ban_reload_interval)
+        )
 
 
-@app.middleware("http")
-async def user_agent_ban_middleware(request: Request, call_next: Callable):
+async def shutdown_app():
     """
-    user agent ban function
+    A function that runs when the program stops.
     """
-    user_agent = request.headers.get("user-agent")
-    for ban_pattern in user_agent_ban_list:
-        if re.search(ban_pattern, user_agent):
-            print(f"{ban_pattern = }")
-            return JSONResponse(
-                status_code=status.HTTP_403_FORBIDDEN,
-                content={"detail": "You are banned"},
-            )
-    response = await call_next(request)
-    return response
+    for name in ("user_cache_listener", "ban_watcher"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    for worker in getattr(app.state, "job_workers", []):
+        worker.cancel()
+    await close_redis()
+
+
+app.add_event_handler("startup", startup_app)
+app.add_event_handler("shutdown", shutdown_app)
 
 
 if __name__ == "__main__":
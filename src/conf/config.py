@@ -7,6 +7,67 @@ class Settings(BaseSettings):
     postgres_password: str
     postgres_port: int
     sqlalchemy_database_url: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800
+    db_pool_timeout: float = 30
+    fuzzy_similarity_threshold: float = 0.3
+    birthday_index_enabled: bool = False
+    birthday_index_max_users: int = 1000
+    birthday_index_ttl: float = 300
+    user_cache_ttl: int = 21600
+    user_cache_local_ttl: float = 30
+    user_cache_local_maxsize: int = 10000
+    user_cache_stale_ttl: int = 300
+    cache_ttl_jitter: float = 0.1
+    cache_lock_enabled: bool = False
+    cache_lock_timeout: float = 5
+    token_cache_maxsize: int = 10000
+    bcrypt_rounds: int = 12
+    bcrypt_workers: int = 4
+    bcrypt_max_queue: int = 100
+    # "redis" or "memory" (a single worker only)
+    refresh_token_store: str = "redis"
+    refresh_token_ttl: int = 7 * 24 * 3600
+    # processes generating the fake data of the /seed routes, 0 - a thread of the app
+    seed_workers: int = 0
+    # the ETag of the contacts of a user changes at least this often, even if a change was missed
+    contacts_version_ttl: int = 24 * 3600
+    # "redis" or "memory" (the entries are kept in each worker, the versions are still in Redis)
+    contacts_cache: str = "redis"
+    contacts_cache_ttl: int = 3600
+    contacts_cache_local_maxsize: int = 10000
+    # "redis" or "memory" (the jobs are run by the workers of the app only)
+    job_queue: str = "redis"
+    # job workers of each app process, 0 - the jobs are run by python -m src.services.worker
+    job_workers: int = 2
+    job_max_attempts: int = 3
+    job_retry_delay: float = 1
+    job_poll_interval: float = 0.5
+    job_ttl: int = 24 * 3600
+    # the connections of the Redis pool shared by all the Redis users of a worker
+    redis_max_connections: int = 50
+    redis_socket_timeout: float = 5
+    # seconds the commands fail at once after a failed connect (the circuit breaker of the pool)
+    redis_breaker_cooldown: float = 5
+    # "memory" (each worker on its own), "redis" (exact, a round trip per request)
+    # or "hybrid" (local counters synced with Redis in the background)
+    rate_limit_backend: str = "hybrid"
+    rate_limit_sync_interval: float = 1
+    rate_limit_sync_batch: int = 10
+    rate_limit_local_maxsize: int = 100000
+    # the costs are doubled while this share of the database connections is in use, above 1 - never
+    rate_limit_busy_occupancy: float = 0.8
+    # cost units of each user a day on the contacts routes
+    user_daily_quota: int = 5000
+    user_quota_backend: str = "hybrid"
+    # the ban lists added to the built-in ones: "" - none, "file" (JSON ban_file)
+    # or "redis" (the sets bans:user_agents and bans:ips), reloaded every ban_reload_interval seconds
+    ban_source: str = ""
+    ban_file: str = "bans.json"
+    ban_reload_interval: float = 30
+    ban_user_agent_cache_size: int = 10000
     secret_key: str
     algorithm: str
     mail_username: str
@@ -16,3 +16,12 @@ NOT_AUTHENTICATED = "Not authenticated"
 EMAIL_CONFIRMATION_SENT = "Email confirmation sent successfully"
 EMAIL_CONFIRMED = "Email confirmed"
 USER_EMAIL_NOT_EXIST = "User with this email does not exist"
+INVALID_CURSOR = "Invalid pagination cursor"
+UNSUPPORTED_FILE_FORMAT = "Unsupported file format, use csv or jsonl"
+BATCH_TOO_LARGE = "Too many items in the batch"
+PASSWORD_HASHING_BUSY = "Too many password checks in progress, try again later"
+SESSION_STORE_UNAVAILABLE = "Sessions are temporarily unavailable, try again later"
+JOB_QUEUE_UNAVAILABLE = "Background jobs are temporarily unavailable, try again later"
+JOB_NOT_FOUND = "Job not found"
+TOO_MANY_REQUESTS = "Too many requests"
+BANNED = "You are banned"
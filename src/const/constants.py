@@ -1,4 +1,16 @@
 NAME_LEN = 30
 EMAIL_LEN = 80
 PHONE_LEN = 13
-NOTES_LEN = 255
\ No newline at end of file
+NOTES_LEN = 255
+PAGE_LIMIT = 50
+PAGE_LIMIT_MAX = 500
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+EXPORT_CHUNK_SIZE = 1000
+BATCH_LIMIT = 500
+SEED_CHUNK_SIZE = 10000
+COST_BIRTHDAY_DAYS = 30
+COST_BODY_BYTES = 64 * 1024
+COST_EXPORT = 100
+BANNED_USER_AGENTS = [r"Googlebot", r"Somebot", r"Python-urllib"]
+BANNED_IPS = ["0.0.0.1"]
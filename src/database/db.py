@@ -1,47 +1,145 @@
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import MetaData, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from src.database.models import Base
+from src.database.pool import MonitoredQueuePool, pool_monitor
 from src.conf.config import settings
 
 
-def reset_db():
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(url: str) -> str:
+    """
+    Convert a database URL to the URL of its async driver
+    (asyncpg for Postgres, aiosqlite for SQLite).
+    The sync URL from settings is still used by alembic.
+
+    :param url: The database URL from settings.
+    :type url: str
+    :return: The database URL with the async driver.
+    :rtype: str
+    """
+    url_ = make_url(url)
+    backend = url_.get_backend_name()
+    if backend in ASYNC_DRIVERS:
+        url_ = url_.set(drivername=ASYNC_DRIVERS[backend])
+    return url_.render_as_string(hide_password=False)
+
+
+async def reset_db():
     """
     Complete deletion of tables from the database and creation of new ones.
     no param
     """
-    Base.metadata.drop_all(engine, checkfirst=True)
-    Base.metadata.create_all(engine)
-    Base.metadata.bind = engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all, checkfirst=True)
+        await conn.run_sync(Base.metadata.create_all)
 
 
-def check_tables():
+async def check_tables():
     """
     getting a list of all database tables (if they exist)
     no param
     """
-    tables_metadata = MetaData()
-    tables_metadata.reflect(bind=engine)
-    existing_tables = tables_metadata.tables.keys()
+
+    def reflect_tables(sync_conn):
+        tables_metadata = MetaData()
+        tables_metadata.reflect(bind=sync_conn)
+        return tables_metadata.tables.keys()
+
+    async with engine.connect() as conn:
+        existing_tables = await conn.run_sync(reflect_tables)
 
     if not existing_tables:
-        reset_db()
+        await reset_db()
 
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-
-check_tables()
+engine = create_async_engine(
+    get_async_url(SQLALCHEMY_DATABASE_URL),
+    poolclass=MonitoredQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_recycle=settings.db_pool_recycle,
+    pool_timeout=settings.db_pool_timeout,
+)
 
 
-SessionLocal = sessionmaker(
-    expire_on_commit=True, autocommit=False, autoflush=False, bind=engine
+SessionLocal = async_sessionmaker(
+    expire_on_commit=False, autocommit=False, autoflush=False, bind=engine
 )
 
 
+def dialect_name(db: AsyncSession) -> str:
+    """
+    The name of the database dialect of the session ("postgresql", "sqlite", ...).
+
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The dialect name.
+    :rtype: str
+    """
+    return db.get_bind().dialect.name
+
+
+async def bulk_insert(db: AsyncSession, model: type[Base], rows: list[dict]) -> None:
+    """
+    Insert the rows into the table of the model in one round trip, bypassing the ORM
+    (the rows must hold every column the model fills in by itself):
+    COPY on PostgreSQL, executemany of one INSERT on other databases. Not committed.
+
+    :param db: The database session.
+    :type db: AsyncSession
+    :param model: The model of the table.
+    :type model: type[Base]
+    :param rows: The rows, all with the same keys.
+    :type rows: list[dict]
+    """
+    if not rows:
+        return
+    if dialect_name(db) == "postgresql":
+        columns = list(rows[0])
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            model.__tablename__,
+            records=[tuple(row[column] for column in columns) for row in rows],
+            columns=columns,
+        )
+    else:
+        await db.execute(insert(model), rows)
+
+
+def get_pool_stats() -> dict:
+    """
+    Statistics of the connection pool of this worker.
+    no param
+    """
+    return pool_monitor.snapshot(engine.pool)
+
+
+def pool_occupancy() -> float:
+    """
+    The share of the connections of the pool in use (0 .. 1), 0 for pools without a size.
+    no param
+    """
+    pool = engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return 0.0
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    return pool.checkedout() / capacity if capacity else 0.0
+
+
 # Dependency
-def get_db():
+async def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
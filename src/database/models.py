@@ -1,6 +1,6 @@
 from datetime import date
-from sqlalchemy import Integer, String, DateTime, Date, func, Boolean
-from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
+from sqlalchemy import Integer, SmallInteger, String, DateTime, Date, func, Boolean, Index, DDL, event
+from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase, validates
 from sqlalchemy.sql.schema import ForeignKey
 from src.const.constants import NAME_LEN, EMAIL_LEN, PHONE_LEN, NOTES_LEN
 
@@ -9,6 +9,20 @@ class Base(DeclarativeBase):
     ...
 
 
+def birthday_mmdd(birthday: date | None) -> int | None:
+    """
+    The day of the year of the birthday as the number MMDD (e.g. 1225 for December 25).
+
+    :param birthday: The date of birth.
+    :type birthday: date | None
+    :return: month * 100 + day.
+    :rtype: int | None
+    """
+    if birthday is None:
+        return None
+    return birthday.month * 100 + birthday.day
+
+
 class Contact(Base):
     __tablename__ = "contacts"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -17,12 +31,66 @@ class Contact(Base):
     email: Mapped[str] = mapped_column(String(EMAIL_LEN))
     phone: Mapped[str] = mapped_column(String(PHONE_LEN))
     birthday: Mapped[date] = mapped_column(Date())
+    # kept in sync with birthday (see set_birthday_mmdd), for the upcoming birthdays lookup
+    birthday_mmdd: Mapped[int] = mapped_column(SmallInteger, nullable=True)
     notes: Mapped[str] = mapped_column(String(NOTES_LEN), nullable=True)
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE"), default=1
     )
     user = relationship("User", backref="contacts")
 
+    # keyset pagination: (user_id, sort key, id) for every sort order of the contacts list
+    __table_args__ = (
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_id_last_name_id", "user_id", "last_name", "id"),
+        Index("ix_contacts_user_id_birthday_id", "user_id", "birthday", "id"),
+        Index("ix_contacts_user_id_birthday_mmdd", "user_id", "birthday_mmdd"),
+    )
+
+    @validates("birthday")
+    def set_birthday_mmdd(self, key, value):
+        self.birthday_mmdd = birthday_mmdd(value)
+        return value
+
+
+# Full-text search of the contacts (PostgreSQL only).
+# search_vector is a generated column, so the database keeps it up to date on every insert/update.
+# It is not mapped: the repository refers to it by name on PostgreSQL and uses ILIKE elsewhere.
+SEARCH_CONFIG = "simple"
+
+CONTACTS_SEARCH_VECTOR = DDL(
+    "ALTER TABLE contacts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(first_name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(last_name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(email, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(phone, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(notes, '')), 'C')"
+    ") STORED"
+)
+CONTACTS_SEARCH_INDEX = DDL(
+    "CREATE INDEX ix_contacts_search_vector ON contacts USING gin (search_vector)"
+)
+
+event.listen(
+    Contact.__table__, "after_create", CONTACTS_SEARCH_VECTOR.execute_if(dialect="postgresql")
+)
+event.listen(
+    Contact.__table__, "after_create", CONTACTS_SEARCH_INDEX.execute_if(dialect="postgresql")
+)
+
+# Fuzzy search of the contacts (PostgreSQL only): trigram GIN indexes for the % operator of pg_trgm
+TRGM_EXTENSION = DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+event.listen(Contact.__table__, "after_create", TRGM_EXTENSION.execute_if(dialect="postgresql"))
+for trgm_column in ("first_name", "last_name", "email"):
+    event.listen(
+        Contact.__table__,
+        "after_create",
+        DDL(
+            f"CREATE INDEX ix_contacts_{trgm_column}_trgm ON contacts "
+            f"USING gin ({trgm_column} gin_trgm_ops)"
+        ).execute_if(dialect="postgresql"),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
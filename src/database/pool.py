@@ -0,0 +1,113 @@
+import time
+from threading import Lock
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolMonitor:
+    """
+    Counters of connection checkouts from the database pool.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Reset all the counters.
+        no param
+        """
+        with self._lock:
+            self.checkouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.timeouts = 0
+            self.overflow_checkouts = 0
+            self.max_overflow_used = 0
+
+    def record_checkout(self, wait: float, overflow: int):
+        """
+        Register a successful checkout.
+
+        :param wait: Time in seconds spent waiting for the connection.
+        :type wait: float
+        :param overflow: The number of overflow connections in use after the checkout.
+        :type overflow: int
+        """
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if overflow > 0:
+                self.overflow_checkouts += 1
+                self.max_overflow_used = max(self.max_overflow_used, overflow)
+
+    def record_timeout(self, wait: float):
+        """
+        Register a checkout that failed because the pool was exhausted.
+
+        :param wait: Time in seconds spent waiting before the timeout.
+        :type wait: float
+        """
+        with self._lock:
+            self.timeouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self, pool) -> dict:
+        """
+        Current pool occupancy together with the accumulated counters.
+
+        :param pool: The pool of the engine.
+        :type pool: Pool
+        :return: The pool statistics.
+        :rtype: dict
+        """
+        stats = {"pool_class": type(pool).__name__}
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            stats.update(
+                {
+                    "pool_size": pool.size(),
+                    "max_overflow": pool._max_overflow,
+                    "checked_in": pool.checkedin(),
+                    "checked_out": pool.checkedout(),
+                    "overflow": max(pool.overflow(), 0),
+                    "occupancy": round(pool.checkedout() / capacity, 3) if capacity else None,
+                    "timeout": pool.timeout(),
+                }
+            )
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            stats.update(
+                {
+                    "checkouts": self.checkouts,
+                    "timeouts": self.timeouts,
+                    "overflow_checkouts": self.overflow_checkouts,
+                    "max_overflow_used": self.max_overflow_used,
+                    "avg_wait_ms": round(self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+                    "max_wait_ms": round(self.max_wait * 1000, 3),
+                }
+            )
+        return stats
+
+
+pool_monitor = PoolMonitor()
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool which measures how long every checkout waits for a connection.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_monitor.record_timeout(time.perf_counter() - start)
+            raise
+        pool_monitor.record_checkout(time.perf_counter() - start, self.overflow())
+        return connection
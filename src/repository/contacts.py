@@ -1,16 +1,33 @@
-from datetime import datetime, timedelta
-from fastapi import Depends, HTTPException
-from sqlalchemy import or_, and_, extract, select, func
-from sqlalchemy.orm import Session
-from src.database.db import get_db
-from src.database.models import Contact, User
-from src.schemas.contacts import ContactModel
+import base64
+import calendar
+import json
+from datetime import date, datetime, timedelta
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import or_, and_, select, insert, update, delete, bindparam, func, literal_column, case, true, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.db import get_db, dialect_name, bulk_insert
+from src.database.models import Contact, User, SEARCH_CONFIG, birthday_mmdd
+from src.schemas.contacts import ContactModel, ContactPatch, ContactBatchUpdateItem
+from src.services.birthday_index import birthday_index
+from src.services.contacts_io import missing_fields
+from src.services.contacts_version import contacts_version
+from src.conf import messages
+from src.conf.config import settings
 from src.const.colors import GRAY, RESET, CYAN, MAGENTA, WHITE, GRAY_BACK
-from typing import List
+from src.const.constants import PAGE_LIMIT, EXPORT_CHUNK_SIZE
+from typing import AsyncIterator, List
 
-# from sqlalchemy.ext.asyncio import AsyncSession
+SORT_COLUMNS = {
+    "id": Contact.id,
+    "last_name": Contact.last_name,
+    "birthday": Contact.birthday,
+}
 
-async def create_contact(contact: ContactModel, user: User, db: Session = Depends(get_db)):
+# generated tsvector column, exists in PostgreSQL only (see src.database.models)
+SEARCH_VECTOR = literal_column("contacts.search_vector")
+
+
+async def create_contact(contact: ContactModel, user: User, db: AsyncSession = Depends(get_db)):
     """
     Create a new contact for an authorized user.
 
@@ -19,53 +36,303 @@ async def create_contact(contact: ContactModel, user: User, db: Session = Depend
     :param user: The user to create the contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The newly created contact.
     :rtype: Contact
     """
-    db_contact = Contact(**contact.model_dump())
+    db_contact = Contact(**contact.model_dump(), user_id=user.id)
     db.add(db_contact)
-    db.commit()
-    db.refresh(db_contact)
+    await db.commit()
+    await db.refresh(db_contact)
+    birthday_index.add(user.id, db_contact.id, db_contact.birthday)
+    await contacts_version.bump(user.id)
     return db_contact
 
 
-async def read_contacts(db: Session = Depends(get_db), q: str = "", user = User):
+def contact_rows(contacts: List[dict], user: User) -> List[dict]:
+    """
+    Rows of the contacts table for the bulk statements.
+    The ORM is bypassed, so user_id and birthday_mmdd are filled in here.
+
+    :param contacts: The contacts (ContactModel.model_dump() dicts).
+    :type contacts: List[dict]
+    :param user: The owner of the contacts.
+    :type user: User
+    :return: The rows.
+    :rtype: List[dict]
+    """
+    return [
+        {**contact, "user_id": user.id, "birthday_mmdd": birthday_mmdd(contact["birthday"])}
+        for contact in contacts
+    ]
+
+
+async def insert_contacts(contacts: List[dict], user: User, db: AsyncSession) -> int:
     """
-    Get all contacts of an authorized user.
-    If desired, contacts can be filtered by search query.
+    Insert a batch of validated contacts of an authorized user in one round trip:
+    COPY on PostgreSQL, executemany of one INSERT on other databases.
 
+    :param contacts: The contacts (ContactModel.model_dump() dicts).
+    :type contacts: List[dict]
+    :param user: The user to create the contacts for.
+    :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :return: The number of inserted contacts.
+    :rtype: int
+    """
+    if not contacts:
+        return 0
+    rows = contact_rows(contacts, user)
+    await bulk_insert(db, Contact, rows)
+    await db.commit()
+    birthday_index.invalidate(user.id)
+    await contacts_version.bump(user.id)
+    return len(rows)
+
+
+def encode_cursor(sort_by: str, sort_value, contact_id: int) -> str:
+    """
+    Pack the position of the last contact of the page into an opaque cursor.
+
+    :param sort_by: The name of the sort key.
+    :type sort_by: str
+    :param sort_value: The value of the sort key of the last contact.
+    :param contact_id: The ID of the last contact.
+    :type contact_id: int
+    :return: The cursor.
+    :rtype: str
+    """
+    if isinstance(sort_value, date):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_by, sort_value, contact_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str) -> tuple:
+    """
+    Unpack the cursor made by encode_cursor.
+
+    :param cursor: The cursor.
+    :type cursor: str
+    :param sort_by: The name of the sort key the cursor must be made for.
+    :type sort_by: str
+    :raises HTTPException: If the cursor is broken or was made for another sort key.
+    :return: The value of the sort key and the ID of the last contact of the previous page.
+    :rtype: tuple
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort_by, sort_value, contact_id = json.loads(raw)
+        if cursor_sort_by != sort_by or sort_value is None or not isinstance(contact_id, int):
+            raise ValueError(cursor)
+        if sort_by == "birthday":
+            sort_value = date.fromisoformat(sort_value)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=messages.INVALID_CURSOR
+        )
+    return sort_value, contact_id
+
+
+def keyset_filter(sort_by: str, sort_key, sort_value, contact_id: int):
+    """
+    The condition "the contact goes after (sort_value, contact_id)"
+    for the order "rank DESC, id ASC" of the search rank
+    and "sort key ASC, id ASC" of the columns (NOT NULL). The row value comparison
+    of the columns seeks the index (user_id, sort key, id).
+
+    :param sort_by: The name of the sort key.
+    :type sort_by: str
+    :param sort_key: The column or the rank expression to sort by.
+    :param sort_value: The value of the sort key of the last contact of the previous page.
+    :param contact_id: The ID of the last contact of the previous page.
+    :type contact_id: int
+    """
+    if sort_by == "id":
+        return Contact.id > contact_id
+    if sort_by == "rank":
+        return or_(
+            sort_key < sort_value,
+            and_(sort_key == sort_value, Contact.id > contact_id),
+        )
+    return tuple_(sort_key, Contact.id) > tuple_(sort_value, contact_id)
+
+
+def substring_search(q: str):
+    """
+    Case-insensitive substring search over the contact fields.
+    Works on any database, but can not use an index.
+
+    :param q: The search query.
+    :type q: str
+    :return: The filter condition.
+    """
+    return or_(
+        Contact.first_name.ilike(f"%{q}%"),
+        Contact.last_name.ilike(f"%{q}%"),
+        Contact.email.ilike(f"%{q}%"),
+        Contact.phone.ilike(f"%{q}%"),
+        Contact.notes.ilike(f"%{q}%"),
+    )
+
+
+def fulltext_search(q: str) -> tuple:
+    """
+    PostgreSQL full-text search over the GIN-indexed search_vector column.
+    The query is parsed by websearch_to_tsquery ("quoted phrases", OR, -exclusion).
+
+    :param q: The search query.
+    :type q: str
+    :return: The filter condition and the rank expression.
+    :rtype: tuple
+    """
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    return SEARCH_VECTOR.op("@@")(query), func.ts_rank_cd(SEARCH_VECTOR, query)
+
+
+def fuzzy_search(q: str) -> tuple:
+    """
+    PostgreSQL typo-tolerant search by trigram similarity (pg_trgm) of names and email.
+    The % operator uses the trigram GIN indexes and the pg_trgm.similarity_threshold setting.
+
+    :param q: The search query.
+    :type q: str
+    :return: The filter condition and the similarity score expression.
+    :rtype: tuple
+    """
+    columns = (Contact.first_name, Contact.last_name, Contact.email)
+    condition = or_(*(column.op("%")(q) for column in columns))
+    score = func.greatest(*(func.similarity(column, q) for column in columns))
+    return condition, score
+
+
+async def search_condition(db: AsyncSession, q: str, mode: str, threshold: float | None = None) -> tuple:
+    """
+    Choose the search by the mode and the database.
+    Other databases than PostgreSQL always use the substring search.
+
+    :param db: The database session.
+    :type db: AsyncSession
+    :param q: The search query.
+    :type q: str
+    :param mode: The search mode: fulltext, fuzzy or substring.
+    :type mode: str
+    :param threshold: The minimal similarity for the fuzzy mode. Defaults to settings.
+    :type threshold: float | None
+    :return: The filter condition and the rank expression (None if the search is not ranked).
+    :rtype: tuple
+    """
+    if mode == "substring" or dialect_name(db) != "postgresql":
+        return substring_search(q), None
+    if mode == "fuzzy":
+        if threshold is None:
+            threshold = settings.fuzzy_similarity_threshold
+        # local to the transaction of this request
+        await db.execute(
+            select(func.set_config("pg_trgm.similarity_threshold", str(threshold), True))
+        )
+        return fuzzy_search(q)
+    return fulltext_search(q)
+
+
+async def read_contacts(
+    db: AsyncSession = Depends(get_db),
+    q: str = "",
+    user = User,
+    limit: int = PAGE_LIMIT,
+    cursor: str | None = None,
+    sort_by: str | None = None,
+    mode: str = "fulltext",
+    threshold: float | None = None,
+):
+    """
+    Get one page of contacts of an authorized user.
+    If desired, contacts can be filtered by search query:
+    full-text or fuzzy search ranked by relevance on PostgreSQL, substring search on other databases.
+    Pages are taken by the cursor (keyset pagination) in the order (sort key, id),
+    so any page costs the same as the first one.
+
+    :param db: The database session.
+    :type db: AsyncSession
     :param q: The search query. Defaults to None.
     :type q: str
     :param user: The user to retrieve contacts for.
     :type user: User
-    :return: List of contacts matching the search query if provided or all contacts of the user, if query is None.
-    :rtype: List[Contact]
+    :param limit: The maximum number of contacts on the page.
+    :type limit: int
+    :param cursor: The cursor from the previous page. Defaults to None (the first page).
+    :type cursor: str | None
+    :param sort_by: The sort key: rank, id, last_name or birthday.
+        Defaults to rank for the ranked search and to id otherwise.
+    :type sort_by: str | None
+    :param mode: The search mode: fulltext, fuzzy or substring.
+    :type mode: str
+    :param threshold: The minimal similarity for the fuzzy mode. Defaults to settings.
+    :type threshold: float | None
+    :raises HTTPException: If the cursor is invalid.
+    :return: Contacts of the page and the cursor of the next page (None for the last page).
+    :rtype: dict
     """
+    stmt = select(Contact).filter(Contact.user_id == user.id)
+    rank = None
     if q:
-        return (
-            db.query(Contact)
-            .filter(
-                and_(
-                or_(
-                    Contact.first_name.ilike(f"%{q}%"),
-                    Contact.last_name.ilike(f"%{q}%"),
-                    Contact.email.ilike(f"%{q}%"),
-                    Contact.phone.ilike(f"%{q}%"),
-                    Contact.notes.ilike(f"%{q}%"),
-                ),
-                Contact.user_id == user.id
-
-            ))
-            .all()
-        )
+        condition, rank = await search_condition(db, q, mode, threshold)
+        stmt = stmt.filter(condition)
+
+    if sort_by is None or (sort_by == "rank" and rank is None):
+        sort_by = "rank" if rank is not None else "id"
+    sort_key = rank if sort_by == "rank" else SORT_COLUMNS[sort_by]
+    stmt = stmt.add_columns(sort_key)
+
+    if cursor:
+        sort_value, contact_id = decode_cursor(cursor, sort_by)
+        stmt = stmt.filter(keyset_filter(sort_by, sort_key, sort_value, contact_id))
+    if sort_by == "id":
+        stmt = stmt.order_by(Contact.id)
+    elif sort_by == "rank":
+        stmt = stmt.order_by(sort_key.desc(), Contact.id)
+    else:
+        stmt = stmt.order_by(sort_key, Contact.id)
+
+    stmt = stmt.limit(limit + 1)
+    rows = await db.execute(stmt)
+    rows = rows.all()
 
-    return db.query(Contact).filter(Contact.user_id == user.id).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_contact, last_value = rows[-1]
+        next_cursor = encode_cursor(sort_by, last_value, last_contact.id)
+    return {"items": [contact for contact, _ in rows], "next_cursor": next_cursor}
 
 
-async def find_contact(contact_id: int, user: User, db: Session = Depends(get_db)):
+async def stream_contacts(user: User, db: AsyncSession, chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[List[Contact]]:
+    """
+    All contacts of an authorized user by chunks, read with a server-side cursor,
+    so only one chunk is kept in memory.
+
+    :param user: The user to retrieve contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param chunk_size: The number of contacts in the chunk.
+    :type chunk_size: int
+    :return: Chunks of contacts in the order of id.
+    :rtype: AsyncIterator[List[Contact]]
+    """
+    stmt = (
+        select(Contact)
+        .filter(Contact.user_id == user.id)
+        .order_by(Contact.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    result = await db.stream(stmt)
+    async for contacts in result.scalars().partitions():
+        yield contacts
+
+
+async def find_contact(contact_id: int, user: User, db: AsyncSession = Depends(get_db)):
     """
     Get one contact with the specified ID for the authorized user.
 
@@ -74,12 +341,14 @@ async def find_contact(contact_id: int, user: User, db: Session = Depends(get_db
     :param user: The user to retrieve contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the contact with the specified ID is not found.
     :return: The found contact.
     :rtype: Contact
     """
-    contact = db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)).first()
+    stmt = select(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
+    contact = await db.execute(stmt)
+    contact = contact.scalar_one_or_none()
     if contact is None:
         raise HTTPException(
             status_code=404, detail=f"Contact with id: {contact_id} was not found"
@@ -87,43 +356,92 @@ async def find_contact(contact_id: int, user: User, db: Session = Depends(get_db
     return contact
 
 
-async def update_contact(contact_id: int, user: User, body: ContactModel, db: Session):
+async def update_contact_fields(contact_id: int, user: User, values: dict, db: AsyncSession):
     """
-    Update a specified contact's details for a authorized user.
+    Update the given fields of the contact of an authorized user
+    with one statement UPDATE ... WHERE user_id AND id RETURNING.
 
     :param contact_id: The ID of the contact to update.
     :type contact_id: int
     :param user: The user to whom the contact belongs.
     :type user: User
-    :param contact: The updated contact details.
-    :type contact: ContactUpdate
+    :param values: The new values of the contact fields.
+    :type values: dict
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the contact with the specified ID is not found.
     :return: The updated contact.
     :rtype: Contact
     """
-    contact = (
-        db.query(Contact)
-        .filter(and_(Contact.user_id == user.id,  Contact.id == contact_id))
-        .first()
+    if "birthday" in values:
+        values = {**values, "birthday_mmdd": birthday_mmdd(values["birthday"])}
+    stmt = (
+        update(Contact)
+        .where(Contact.user_id == user.id, Contact.id == contact_id)
+        .values(**values)
+        .returning(Contact)
+        .execution_options(populate_existing=True)
     )
-
+    contact = await db.execute(stmt)
+    contact = contact.scalar_one_or_none()
     if contact is None:
         raise HTTPException(
             status_code=404, detail=f"Contact with id: {contact_id} was not found"
         )
+    await db.commit()
+    if "birthday" in values:
+        birthday_index.update(user.id, contact.id, contact.birthday)
+    await contacts_version.bump(user.id)
+    return contact
 
-    if contact:
-        for key, value in body.model_dump().items():
-            setattr(contact, key, value)
-        db.commit()
-        db.refresh(contact)
 
-    return contact
+async def update_contact(contact_id: int, user: User, body: ContactModel, db: AsyncSession):
+    """
+    Update a specified contact's details for a authorized user.
+
+    :param contact_id: The ID of the contact to update.
+    :type contact_id: int
+    :param user: The user to whom the contact belongs.
+    :type user: User
+    :param contact: The updated contact details.
+    :type contact: ContactUpdate
+    :param db: The database session.
+    :type db: AsyncSession
+    :raises HTTPException: If the contact with the specified ID is not found.
+    :return: The updated contact.
+    :rtype: Contact
+    """
+    return await update_contact_fields(contact_id, user, body.model_dump(), db)
+
+
+async def patch_contact(contact_id: int, user: User, body: ContactPatch, db: AsyncSession):
+    """
+    Update only the supplied fields of a specified contact for a authorized user.
+
+    :param contact_id: The ID of the contact to update.
+    :type contact_id: int
+    :param user: The user to whom the contact belongs.
+    :type user: User
+    :param body: The fields to update.
+    :type body: ContactPatch
+    :param db: The database session.
+    :type db: AsyncSession
+    :raises HTTPException: If a required field is set to null or the contact is not found.
+    :return: The updated contact.
+    :rtype: Contact
+    """
+    values = body.model_dump(exclude_unset=True)
+    errors = missing_fields(values)
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="; ".join(errors)
+        )
+    if not values:
+        return await find_contact(contact_id, user, db)
+    return await update_contact_fields(contact_id, user, values, db)
 
 
-async def delete_contact(contact_id: int, user: User, db: Session = Depends(get_db)):
+async def delete_contact(contact_id: int, user: User, db: AsyncSession = Depends(get_db)):
     """
     Deletes one contact with the specified ID for the authorized service.
 
@@ -132,25 +450,182 @@ async def delete_contact(contact_id: int, user: User, db: Session = Depends(get_
     :param user: The user to remove the contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the contact with the specified ID is not found.
     :return: A message confirming the deletion.
     :rtype: dict
     """
-    db_contact = (
-        db.query(Contact)
-        .filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
-        .first()
+    stmt = (
+        delete(Contact)
+        .where(Contact.user_id == user.id, Contact.id == contact_id)
+        .returning(Contact.id)
     )
-    if db_contact is None:
+    deleted = await db.execute(stmt)
+    if deleted.scalar_one_or_none() is None:
         raise HTTPException(
             status_code=404, detail=f"Contact with id: {contact_id} was not found"
         )
-    db.delete(db_contact)
-    db.commit()
+    await db.commit()
+    birthday_index.remove(user.id, contact_id)
+    await contacts_version.bump(user.id)
     return {"message": "Contact successfully deleted"}
 
 
+def not_found(contact_id: int) -> dict:
+    return {
+        "id": contact_id,
+        "status": status.HTTP_404_NOT_FOUND,
+        "detail": f"Contact with id: {contact_id} was not found",
+    }
+
+
+async def create_contacts(contacts: List[ContactModel], user: User, db: AsyncSession) -> List[dict]:
+    """
+    Create several contacts for an authorized user with one multi-row INSERT ... RETURNING
+    in one transaction.
+
+    :param contacts: The data for the contacts to be created.
+    :type contacts: List[ContactModel]
+    :param user: The user to create the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The result of every item in the order of the request: id, status, contact or detail.
+    :rtype: List[dict]
+    """
+    results = [None] * len(contacts)
+    valid = []
+    for position, contact in enumerate(contacts):
+        data = contact.model_dump()
+        errors = missing_fields(data)
+        if errors:
+            results[position] = {"status": status.HTTP_422_UNPROCESSABLE_ENTITY, "detail": "; ".join(errors)}
+        else:
+            valid.append((position, data))
+
+    if valid:
+        stmt = insert(Contact).returning(Contact, sort_by_parameter_order=True)
+        created = await db.execute(stmt, contact_rows([data for _, data in valid], user))
+        created = created.scalars().all()
+        await db.commit()
+        for (position, _), contact in zip(valid, created):
+            results[position] = {"id": contact.id, "status": status.HTTP_201_CREATED, "contact": contact}
+            birthday_index.add(user.id, contact.id, contact.birthday)
+        await contacts_version.bump(user.id)
+    return results
+
+
+async def find_contacts(contact_ids: List[int], user: User, db: AsyncSession) -> List[dict]:
+    """
+    Get several contacts of an authorized user by their IDs with one query.
+
+    :param contact_ids: The IDs of the contacts to retrieve.
+    :type contact_ids: List[int]
+    :param user: The user to retrieve contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The result of every ID in the order of the request: id, status, contact or detail.
+    :rtype: List[dict]
+    """
+    if not contact_ids:
+        return []
+    stmt = select(Contact).filter(Contact.user_id == user.id, Contact.id.in_(contact_ids))
+    contacts = await db.execute(stmt)
+    contacts = {contact.id: contact for contact in contacts.scalars().all()}
+    return [
+        {"id": id_, "status": status.HTTP_200_OK, "contact": contacts[id_]} if id_ in contacts else not_found(id_)
+        for id_ in contact_ids
+    ]
+
+
+async def update_contacts(items: List[ContactBatchUpdateItem], user: User, db: AsyncSession) -> List[dict]:
+    """
+    Update several contacts of an authorized user in one transaction:
+    one UPDATE executed for all the items (executemany) and one SELECT of the updated contacts.
+
+    :param items: The IDs and the updated details of the contacts.
+    :type items: List[ContactBatchUpdateItem]
+    :param user: The user to whom the contacts belong.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The result of every item in the order of the request: id, status, contact or detail.
+    :rtype: List[dict]
+    """
+    errors = {}
+    rows = []
+    for item in items:
+        data = item.model_dump(exclude={"id"})
+        missing = missing_fields(data)
+        if missing:
+            errors[item.id] = "; ".join(missing)
+        else:
+            rows.append({"contact_id": item.id, **contact_rows([data], user)[0]})
+
+    contacts = {}
+    if rows:
+        table = Contact.__table__
+        stmt = update(table).where(table.c.user_id == user.id, table.c.id == bindparam("contact_id"))
+        await db.execute(stmt, rows)
+        stmt = (
+            select(Contact)
+            .filter(Contact.user_id == user.id, Contact.id.in_([row["contact_id"] for row in rows]))
+            .execution_options(populate_existing=True)
+        )
+        contacts = await db.execute(stmt)
+        contacts = {contact.id: contact for contact in contacts.scalars().all()}
+        await db.commit()
+        for contact in contacts.values():
+            birthday_index.update(user.id, contact.id, contact.birthday)
+        await contacts_version.bump(user.id)
+
+    results = []
+    for item in items:
+        if item.id in errors:
+            results.append(
+                {"id": item.id, "status": status.HTTP_422_UNPROCESSABLE_ENTITY, "detail": errors[item.id]}
+            )
+        elif item.id in contacts:
+            results.append({"id": item.id, "status": status.HTTP_200_OK, "contact": contacts[item.id]})
+        else:
+            results.append(not_found(item.id))
+    return results
+
+
+async def delete_contacts(contact_ids: List[int], user: User, db: AsyncSession) -> List[dict]:
+    """
+    Delete several contacts of an authorized user with one DELETE ... RETURNING.
+
+    :param contact_ids: The IDs of the contacts to delete.
+    :type contact_ids: List[int]
+    :param user: The user to remove the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The result of every ID in the order of the request: id, status, detail.
+    :rtype: List[dict]
+    """
+    stmt = (
+        delete(Contact)
+        .where(Contact.user_id == user.id, Contact.id.in_(contact_ids))
+        .returning(Contact.id)
+    )
+    deleted = await db.execute(stmt)
+    deleted = set(deleted.scalars().all())
+    await db.commit()
+    for contact_id in deleted:
+        birthday_index.remove(user.id, contact_id)
+    if deleted:
+        await contacts_version.bump(user.id)
+    return [
+        {"id": id_, "status": status.HTTP_200_OK, "detail": "Contact successfully deleted"}
+        if id_ in deleted
+        else not_found(id_)
+        for id_ in contact_ids
+    ]
+
+
 def birthdays_print(result, today_, days_):
     '''
     for debugging: outputting data to the terminal
@@ -175,100 +650,121 @@ def birthdays_print(result, today_, days_):
         print('------------------------------------------------', RESET)
 
 
-async def get_next_days_birthdays(user: User, db: Session = Depends(get_db), days_: int = 7):
+def upcoming_birthdays_stmt(user: User, today_: date, days_: int):
+    """
+    One query for the contacts with birthdays from today_ to today_ + days_ (inclusive),
+    sorted by the upcoming date. It is a range over the indexed birthday_mmdd column;
+    a window crossing the New Year is split into two ranges (MMDD >= start OR MMDD <= end).
+    In a non-leap year the birthday of February 29 is celebrated on March 1.
+
+    :param user: The user to retrieve the contacts for.
+    :type user: User
+    :param today_: The first day of the window.
+    :type today_: date
+    :param days_: The number of days after today_.
+    :type days_: int
+    :return: The select statement.
+    """
+    # any window of a year or more is the whole year; no date overflow for a large days_
+    days_ = min(days_, 365)
+    start = birthday_mmdd(today_)
+    end = birthday_mmdd(today_ + timedelta(days=days_))
+
+    # the year of the February 29 (or March 1 in a non-leap year) that falls into the window
+    february_year = today_.year if start <= 301 else today_.year + 1
+    leap = calendar.isleap(february_year)
+
+    # the filter is on the raw column, so it is a range scan of the index
+    mmdd = Contact.birthday_mmdd
+    if days_ >= 365:
+        window, march_1 = true(), False
+    elif start <= end:
+        window, march_1 = mmdd.between(start, end), start <= 301 <= end
+    else:
+        window, march_1 = or_(mmdd >= start, mmdd <= end), start <= 301 or 301 <= end
+    if march_1 and not leap:
+        window = or_(window, mmdd == 229)
+
+    # February 29 goes after February 28 in the order only
+    if not leap:
+        mmdd = case((Contact.birthday_mmdd == 229, 301), else_=Contact.birthday_mmdd)
+
+    return (
+        select(Contact)
+        .filter(Contact.user_id == user.id, Contact.birthday_mmdd.is_not(None), window)
+        .order_by(case((mmdd >= start, 0), else_=1), mmdd, Contact.id)
+    )
+
+
+async def get_next_days_birthdays(user: User, db: AsyncSession = Depends(get_db), days_: int = 7):
     """
     Get all contacts of an authorized user with birthdays in the next N days (default N = 7)
     Contacts are displayed sorted by date
+    If the in-process birthday index is enabled, it is used instead of the query.
 
     :param user: The user to retrieve the contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contacts with birthdays within next 7 days.
     :rtype: List[Contact]
     """
+    if birthday_index.enabled:
+        return await get_contact_by_birthday(user, db, days_)
+
     today_ = datetime.today().date()
     # today_ = datetime(year=2023, month=12, day=27).date() # debugging
 
-    result = []
-    for num in range(days_+1):
-
-        date_ = today_ + timedelta(num)
-
-        contacts = db.query(Contact).filter_by(user=user).filter(
-            extract('month', Contact.birthday) == date_.month,
-            extract('day', Contact.birthday) == date_.day
-        ).where(Contact.birthday != None).all()
-
-        for i in range(len(contacts)):
-            result.append(contacts[i])
+    result = await db.execute(upcoming_birthdays_stmt(user, today_, days_))
+    result = result.scalars().all()
 
-    print(f"{result = }")
     birthdays_print(result, today_, days_) # debugging
     return result
 
-async def get_next_birthdays(user: User, db: Session):
+async def get_next_birthdays(user: User, db: AsyncSession):
     """
     Retrieve all contacts with birthdays within next 7 days for a specific user.
 
     :param user: The user to retrieve the contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contacts with birthdays within next 7 days.
     :rtype: List[Contact]
     """
     today = datetime.now().date()
-    end_date = today + timedelta(days=7)
-
-    result = (
-        db.query(Contact)
-        .filter(
-            or_(
-                and_(
-                    extract("month", Contact.birthday) == today.month,
-                    extract("day", Contact.birthday) >= today.day,
-                    extract("day", Contact.birthday) <= end_date.day,
-                    Contact.user_id == user.id,
-                ),
-                and_(
-                    extract("month", Contact.birthday) == end_date.month,
-                    extract("day", Contact.birthday) <= end_date.day,
-                    Contact.user_id == user.id,
-                ),
-            )
-        )
-        .all()
-    )
-    return result
+
+    result = await db.execute(upcoming_birthdays_stmt(user, today, 7))
+    return result.scalars().all()
 
 
-async def get_contact_by_birthday(user_: User, db: Session, days_: int = 7):
+async def get_contact_by_birthday(user_: User, db: AsyncSession, days_: int = 7):
     """
     Get all contacts of an authorized user with birthdays in the next N days (default N = 7)
-    an alternative option - works faster, but there is no sorting by date of birth
+    an alternative option - the window is found in the in-process birthday index
+    (vectorized with numpy), the database only loads the found contacts by primary key.
+    Contacts are sorted by date. If the index is disabled, the query of get_next_days_birthdays is used.
 
     :param user: The user to retrieve the contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contacts with birthdays within next 7 days.
     :rtype: List[Contact]
     """
-    today_ = datetime.today().date()
-    end_date = today_+ timedelta(days=days_)
-
-    result = []
+    if not birthday_index.enabled:
+        return await get_next_days_birthdays(user_, db, days_)
 
-    stmt = select(Contact).filter_by(user=user_).where(Contact.birthday != None)
-    contacts = db.execute(stmt)
-    contacts = contacts.scalars().all()
-    
-    for contact in contacts:
-        bday_this_year = datetime(year=today_.year, month=contact.birthday.month, day=contact.birthday.day).date()
+    today_ = datetime.today().date()
+    contact_ids = await birthday_index.upcoming(user_.id, db, today_, days_)
+    if not contact_ids:
+        return []
 
-        if bday_this_year >= today_ and bday_this_year <= end_date:
-            result.append(contact)
+    stmt = select(Contact).filter_by(user_id=user_.id).where(Contact.id.in_(contact_ids))
+    contacts = await db.execute(stmt)
+    contacts = {contact.id: contact for contact in contacts.scalars().all()}
+    # deleted by another process after the index was built
+    result = [contacts[id_] for id_ in contact_ids if id_ in contacts]
 
-    birthdays_print(result, today_, end_date) # debugging
+    birthdays_print(result, today_, days_) # debugging
     return result
@@ -1,31 +1,35 @@
 from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 from src.schemas.users import UserModel
+from src.services.user_cache import user_cache
 
 
-async def get_user_by_email(email_: str, db: Session) -> User | None:
+async def get_user_by_email(email_: str, db: AsyncSession) -> User | None:
     """
     Get the user by email from the database.
 
     :param email: The email of the user to retrive.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user with the specified email
     :rtype: User
     """
-    return db.query(User).filter(User.email == email_).first()
+    stmt = select(User).filter(User.email == email_)
+    user = await db.execute(stmt)
+    return user.scalar_one_or_none()
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: AsyncSession) -> User:
     """Create a new user.
 
     :param body: The data for the new user to be created.
     :type body: UserModel
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The newly created user.
     :rtype: User
     """
@@ -37,44 +41,45 @@ async def create_user(body: UserModel, db: Session) -> User:
         print(e)
     new_user = User(**body.model_dump(), avatar=avatar)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
-    # async def update_token(user: User, token: str, db: Session) -> None:
+async def update_password(user: User, password: str, db: AsyncSession) -> None:
     """
-    Update token for the specified user.
+    Update the password hash of the specified user.
 
-    :param user: The user to update token for.
+    :param user: The user to update the password for.
     :type user: User
-    :param token: The refreshed token.
-    :type token: str | None
+    :param password: The new password hash.
+    :type password: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: None
     """
-    user.refresh_token = token
-    db.commit()
+    user.password = password
+    await db.commit()
+    # the password is not in the user cache, nothing to invalidate
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     Confirm user's email.
 
     :param email: The email to confirm.
     :type email: str
     :param bd: The database session.
-    :type bd: Session
+    :type bd: AsyncSession
     :return: None
     """
-    user = await get_user_by_email(email, db)
-    user.confirmed = True
-    db.commit()
+    stmt = update(User).where(User.email == email).values(confirmed=True)
+    await db.execute(stmt)
+    await db.commit()
+    await user_cache.invalidate(email)
 
 
-async def update_avatar(email, url: str, db: Session) -> User:
+async def update_avatar(email, url: str, db: AsyncSession) -> User:
     """
     Update user's avatar url.
 
@@ -83,11 +88,20 @@ async def update_avatar(email, url: str, db: Session) -> User:
     :param url: The new avatar URL.
     :type url: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The updated user.
     :rtype: User
     """
-    user = await get_user_by_email(email, db)
-    user.avatar = url
-    db.commit()
+    stmt = (
+        update(User)
+        .where(User.email == email)
+        .values(avatar=url)
+        .returning(User)
+        .execution_options(populate_existing=True)
+    )
+    user = await db.execute(stmt)
+    user = user.scalar_one_or_none()
+    await db.commit()
+    if user is not None:
+        await user_cache.refresh(user)
     return user
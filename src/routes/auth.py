@@ -4,7 +4,6 @@ from fastapi import (
     Depends,
     status,
     Security,
-    BackgroundTasks,
     Request,
 )
 from fastapi.security import (
@@ -12,40 +11,60 @@ from fastapi.security import (
     HTTPAuthorizationCredentials,
     HTTPBearer,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.schemas.users import UserModel, UserResponse, TokenModel, RequestEmail
 from src.repository import users as repository_users
 from src.services.auth import auth_service
-from src.services.email import send_email
+from src.services.jobs import job_queue
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 security = HTTPBearer()
 
 
+@router.get("/token_cache_stats")
+async def token_cache_stats():
+    """
+    Statistics of the verified access token cache of the current worker: size and hit rate.
+    no param
+    :return: The cache statistics
+    :rtype: dict
+    """
+    return auth_service.token_cache.stats()
+
+
+@router.get("/hashing_stats")
+async def hashing_stats():
+    """
+    Statistics of the password hashing pool of the current worker: active and queued calls, wait times.
+    no param
+    :return: The pool statistics
+    :rtype: dict
+    """
+    return auth_service.password_hasher.stats()
+
+
 @router.post(
     "/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED
 )
 async def signup(
     body: UserModel,
-    background_tasks: BackgroundTasks,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Create a new user in database based on data validated by pydantic.
     Password is hashed and stored in database.
-    An email for email address confirmetion is sent to the newly created users' email.
+    An email for email address confirmetion is sent to the newly created users' email
+    by a background job.
 
     :param body: The data for the new user to create.
     :type body: UserModel
-    :param background_tasks: Backgoung task to run.
-    :type background_tasks: BackgroundTasks
     :param request: The base url of the server.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The created user.
     :rtype: UserResponse
     """
@@ -54,11 +73,15 @@ async def signup(
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Account already exists"
         )
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash(body.password)
     new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(
-        send_email, new_user.email, new_user.username, str(request.base_url)
-    )
+    try:
+        await job_queue.enqueue(
+            "send_email", email=new_user.email, username=new_user.username, host=str(request.base_url)
+        )
+    except HTTPException as err:
+        # the user is created, the email can be requested again (/request_email)
+        print(err.detail)
     return {
         "user": new_user,
         "detail": "User successfully created. Check your email for confirmation.",
@@ -67,7 +90,7 @@ async def signup(
 
 @router.post("/login", response_model=TokenModel)
 async def login(
-    body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
 ):
     """
     User's authentication.
@@ -77,7 +100,7 @@ async def login(
     :param body: The login cridentials.
     :type body: OAuth2PasswordRequestForm
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The access token and refresh token.
     :rtypr: TokenModel
     """
@@ -92,65 +115,45 @@ async def login(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Email is not confirmed"
         )
 
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_and_update_password(body.password, user.password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password"
         )
-    # Generate JWT
-    access_token = await auth_service.create_access_token(data={"sub": user.email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repository_users.update_token(user, refresh_token, db)
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-    }
+    if new_hash:
+        # bcrypt rounds were changed in settings
+        await repository_users.update_password(user, new_hash, db)
+    # Generate JWT, client_id of the form names the session (device)
+    return await auth_service.create_session_tokens(user.email, body.client_id)
 
 
 @router.get("/refresh_token", response_model=TokenModel)
 async def refresh_token(
     credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db),
 ):
     """
     Refresh the access token.
-    Provides a new pair of access and refresh tokens for the user.
+    Provides a new pair of access and refresh tokens for the session of the refresh token
+    (one operation in the refresh token store, the database is not touched).
+    A refresh token can be used once; reusing it revokes the session.
 
     :param credentials: The HTTP authorization credential scontaining the refresh token.
     :type credentials: HTTPAuthorizationCredentials
-    :param db: The database session.
-    :type db: Session
     :return: A dictionary containing the new access token, refresh token and token type.
     :rtype: TokenModel
     """
-    token = credentials.credentials
-    email = await auth_service.decode_refresh_token(token)
-    user = await repository_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
-        )
-
-    access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repository_users.update_token(user, refresh_token, db)
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-    }
+    return await auth_service.rotate_session_tokens(credentials.credentials)
 
 
 @router.get("/confirmed_email/{token}")
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
     User's email confirmation.
 
     :param token: The confirmation token.
     :type token: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A message confirming the email.
     :rtype: dict
 
@@ -171,21 +174,18 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
 @router.post("/request_email")
 async def request_email(
     body: RequestEmail,
-    background_tasks: BackgroundTasks,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Email confirmation request.
 
     :param body: The email to be confirmed.
     :tupe body: RequestEmail
-    :param backgroud_tasks: Background task to run.
-    :type background_tasks: BackgroundTasks
     :param request: The base URL of the server.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A message instructing the user to check their email for confirmation.
     :rtype: dict
     """
@@ -194,7 +194,7 @@ async def request_email(
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(
-            send_email, user.email, user.username, str(request.base_url)
+        await job_queue.enqueue(
+            "send_email", email=user.email, username=user.username, host=str(request.base_url)
         )
     return {"message": "Check your email for confirmation."}
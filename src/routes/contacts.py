@@ -1,15 +1,114 @@
-from fastapi import APIRouter, Depends, status
-from fastapi_limiter.depends import RateLimiter
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.db import get_db
 from src.database.models import User
 from src.repository import contacts as repository_contacts
-from src.schemas.contacts import ContactModel, ContactResponse
+from src.schemas.contacts import (
+    ContactModel,
+    ContactPatch,
+    ContactResponse,
+    ContactPage,
+    ContactSort,
+    SearchMode,
+    FileFormat,
+    ContactImportReport,
+    ContactBatchCreate,
+    ContactBatchUpdate,
+    ContactBatchDelete,
+    ContactBatchResult,
+)
+from src.conf import messages
+from src.const.constants import PAGE_LIMIT, PAGE_LIMIT_MAX, IMPORT_CHUNK_SIZE, IMPORT_MAX_ERRORS, BATCH_LIMIT
+from src.const.constants import COST_BIRTHDAY_DAYS, COST_BODY_BYTES, COST_EXPORT
 from src.services.auth import auth_service
+from src.services import contacts_io
+from src.services.contacts_cache import contacts_cache
+from src.services.contacts_version import contacts_version, etag_matches
+from src.services.rate_limit import RateLimiter, UserQuota, query_int
+from datetime import date
+from math import ceil
 from typing import List
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
+# the clients keep the contacts, but revalidate them on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+# the costs of the requests in the rate limits and the daily quota, 1 - a page of PAGE_LIMIT contacts
+def page_cost(request: Request) -> int:
+    """
+    A page of contacts: one per PAGE_LIMIT contacts, one more for a search (ranked).
+    """
+    cost = ceil(min(query_int(request, "limit", PAGE_LIMIT), PAGE_LIMIT_MAX) / PAGE_LIMIT)
+    return cost + 1 if request.query_params.get("find_string") else cost
+
+
+def ids_cost(request: Request) -> int:
+    """
+    Contacts by ids: one per PAGE_LIMIT ids.
+    """
+    return max(ceil(len(request.query_params.getlist("ids")) / PAGE_LIMIT), 1)
+
+
+def birthdays_cost(request: Request) -> int:
+    """
+    The birthdays window: one, and one more per COST_BIRTHDAY_DAYS days.
+    """
+    return 1 + max(query_int(request, "days", 7), 0) // COST_BIRTHDAY_DAYS
+
+
+def body_cost(request: Request) -> int:
+    """
+    An import or a batch: one, and one more per COST_BODY_BYTES of the body.
+    """
+    try:
+        length = int(request.headers.get("content-length", 0))
+    except ValueError:
+        length = 0
+    return 1 + max(length, 0) // COST_BODY_BYTES
+
+
+def export_cost(request: Request) -> int:
+    """
+    The export of all the contacts of the user.
+    """
+    return COST_EXPORT
+
+
+async def not_modified(request: Request, response: Response, user: User) -> Response | None:
+    """
+    Conditional GET of the contacts of the user: the 304 response if If-None-Match of the request
+    matches the current ETag (with the headers of the response), otherwise None
+    and the ETag is set on the response.
+    Must be called before the contacts are read.
+
+    :param request: The request.
+    :type request: Request
+    :param response: The response of the route.
+    :type response: Response
+    :param user: The owner of the contacts.
+    :type user: User
+    :return: The 304 response or None.
+    :rtype: Response | None
+    """
+    etag = await contacts_version.etag(user.id)
+    if etag is None:
+        return None
+    response.headers.update({"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        # the headers set by the dependencies (RateLimit-*) too, but no body ones
+        cached = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+        cached.raw_headers.extend(
+            (name, value)
+            for name, value in response.raw_headers
+            if name not in (b"content-length", b"content-type")
+        )
+        return cached
+    return None
+
 
 # @router.post("/", response_model=ContactResponse)
 @router.post(
@@ -17,11 +116,14 @@ router = APIRouter(prefix="/contacts", tags=["contacts"])
     response_model=ContactResponse,
     status_code=status.HTTP_201_CREATED,
     description="No more than 2 requests per minute",
-    dependencies=[Depends(RateLimiter(times=2, seconds=60))],
+    dependencies=[
+        Depends(RateLimiter(times=2, seconds=60, backend="redis")),
+        Depends(UserQuota()),
+    ],
 )
 async def create_contact(
     contact: ContactModel,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -30,7 +132,7 @@ async def create_contact(
     :param contact: The data for the contact to be created.
     :type contact: ContactModel
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The user to create the contact for.
     :type current_user: User
     :return: The newly created contact.
@@ -39,9 +141,63 @@ async def create_contact(
     return await repository_contacts.create_contact(contact, current_user, db)
 
 
+@router.post(
+    "/import",
+    response_model=ContactImportReport,
+    description="No more than 2 requests per minute",
+    dependencies=[
+        Depends(RateLimiter(times=2, seconds=60, backend="redis")),
+        Depends(UserQuota(cost=body_cost)),
+    ],
+)
+async def import_contacts(
+    file: UploadFile = File(...),
+    format: FileFormat | None = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Import contacts of the authorized user from a CSV file (with a header line) or a JSONL file
+    (one JSON object per line). The file is read and validated by chunks in a worker thread,
+    every chunk is inserted in one batch, so the memory does not depend on the file size.
+    Invalid rows are skipped and reported (the first IMPORT_MAX_ERRORS of them). A file which can not
+    be read further (not UTF-8, a malformed CSV) is imported up to the error, which is reported as a row.
+
+    :param file: The uploaded file.
+    :type file: UploadFile
+    :param format: The file format. Defaults to the file extension (.csv, .jsonl, .ndjson).
+    :type format: FileFormat | None
+    :param db: The database session.
+    :type db: AsyncSession
+    :param current_user: The user to create the contacts for.
+    :type current_user: User
+    :raises HTTPException: If the file format is unknown.
+    :return: The numbers of imported and failed rows and the errors by row number.
+    :rtype: ContactImportReport
+    """
+    format_ = format.value if format else contacts_io.detect_format(file.filename)
+    if format_ is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=messages.UNSUPPORTED_FILE_FORMAT,
+        )
+
+    imported, failed, report_errors = 0, 0, []
+    chunks = contacts_io.iter_chunks(file.file, format_, IMPORT_CHUNK_SIZE)
+    while True:
+        chunk = await run_in_threadpool(next, chunks, None)
+        if chunk is None:
+            break
+        contacts, errors = chunk
+        imported += await repository_contacts.insert_contacts(contacts, current_user, db)
+        failed += len(errors)
+        report_errors.extend(errors[: IMPORT_MAX_ERRORS - len(report_errors)])
+    return {"imported": imported, "failed": failed, "errors": report_errors}
+
+
 # всі контакти без зайвих питань - чи воно треба?
 # @router.get("/", response_model=List[ContactResponse])
-# async def read_all_contacts(db: Session = Depends(get_db)):
+# async def read_all_contacts(db: AsyncSession = Depends(get_db)):
 #     contacts = await repository_contacts.read_contacts(db)
 #     return contacts
 
@@ -50,68 +206,299 @@ async def create_contact(
 # якшо рядок пошуку порожній - виводяться всі контакти
 @router.get(
     "/",
-    response_model=List[ContactResponse],
-    description="No more than 5 requests per minute",
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))],
+    response_model=ContactPage,
+    description="No more than 5 requests per minute, pages over 50 contacts and searches cost more",
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60, cost=page_cost)),
+        Depends(UserQuota(cost=page_cost)),
+    ],
 )
 async def read_contacts(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     find_string: str = "",
+    mode: SearchMode = SearchMode.fulltext,
+    threshold: float | None = Query(None, ge=0, le=1),
+    limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX),
+    cursor: str | None = None,
+    sort_by: ContactSort | None = None,
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
-    Retrieve all contacts for the authorized user, optionally filtered by a search query.
+    Retrieve a page of contacts for the authorized user, optionally filtered by a search query.
+    On PostgreSQL the search is full-text (websearch syntax) or fuzzy (trigram similarity, tolerates typos
+    in names and email) and the results are ranked by relevance.
+    The next page is requested with the next_cursor of the current one.
+    Returns 304 without a body if If-None-Match holds the ETag of the contacts.
 
     :param q: The search query. Defaults to None.
     :type q: str
+    :param mode: The search mode: fulltext, fuzzy or substring.
+    :type mode: SearchMode
+    :param threshold: The minimal similarity for the fuzzy mode. Defaults to settings.
+    :type threshold: float | None
+    :param limit: The maximum number of contacts on the page.
+    :type limit: int
+    :param cursor: The next_cursor of the previous page. Defaults to None (the first page).
+    :type cursor: str | None
+    :param sort_by: The sort key: rank, id, last_name or birthday.
+        Defaults to rank when searching and to id otherwise.
+    :type sort_by: ContactSort | None
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: The user to retrieve contacts for.
     :type user: User
-    :return: List of contacts matching the search query if provided or all contacts of the user, if query is None.
-    :rtype: List[Contact]
+    :return: Contacts of the page and the cursor of the next page.
+    :rtype: ContactPage
     """
-    contacts = await repository_contacts.read_contacts(db, find_string, current_user)
+    cached = await not_modified(request, response, current_user)
+    if cached is not None:
+        return cached
+    contacts = await repository_contacts.read_contacts(
+        db,
+        find_string,
+        current_user,
+        limit,
+        cursor,
+        sort_by.value if sort_by else None,
+        mode.value,
+        threshold,
+    )
     return contacts
 
 
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    description="No more than 2 requests per minute",
+    dependencies=[
+        Depends(RateLimiter(times=2, seconds=60, backend="redis")),
+        Depends(UserQuota(cost=export_cost)),
+    ],
+)
+async def export_contacts(
+    format: FileFormat = FileFormat.csv,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Export all contacts of the authorized user as a CSV or JSONL file.
+    The contacts are read with a server-side cursor and sent by chunks as they are read,
+    so the memory does not depend on the number of contacts.
+
+    :param format: The file format: csv or jsonl.
+    :type format: FileFormat
+    :param db: The database session.
+    :type db: AsyncSession
+    :param current_user: The user to export the contacts of.
+    :type current_user: User
+    :return: The file.
+    :rtype: StreamingResponse
+    """
+
+    async def content():
+        yield contacts_io.dump_header(format.value)
+        async for contacts in repository_contacts.stream_contacts(current_user, db):
+            yield contacts_io.dump_contacts(contacts, format.value)
+
+    return StreamingResponse(
+        content(),
+        media_type=EXPORT_MEDIA_TYPES[format.value],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{format.value}"'},
+    )
+
+
+@router.get(
+    "/batch",
+    response_model=List[ContactBatchResult],
+    description="No more than 5 requests per minute, every 50 ids cost one request",
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60, cost=ids_cost)),
+        Depends(UserQuota(cost=ids_cost)),
+    ],
+)
+async def find_contacts(
+    ids: List[int] = Query([]),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Retrieves several contacts by their IDs (?ids=1&ids=2) for the authorized user with one query.
+
+    :param ids: The IDs of the contacts to retrieve.
+    :type ids: List[int]
+    :param db: The database session.
+    :type db: AsyncSession
+    :param current_user: The user to retrieve contacts for.
+    :type current_user: User
+    :raises HTTPException: If there are more than BATCH_LIMIT IDs.
+    :return: The result of every ID: the contact or 404.
+    :rtype: List[ContactBatchResult]
+    """
+    if len(ids) > BATCH_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=messages.BATCH_TOO_LARGE
+        )
+    return await repository_contacts.find_contacts(ids, current_user, db)
+
+
+@router.post(
+    "/batch",
+    response_model=List[ContactBatchResult],
+    description="No more than 2 requests per minute",
+    dependencies=[
+        Depends(RateLimiter(times=2, seconds=60, backend="redis")),
+        Depends(UserQuota(cost=body_cost)),
+    ],
+)
+async def create_contacts(
+    body: ContactBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Create several contacts for the authorized user in one transaction.
+
+    :param body: The data for the contacts to be created.
+    :type body: ContactBatchCreate
+    :param db: The database session.
+    :type db: AsyncSession
+    :param current_user: The user to create the contacts for.
+    :type current_user: User
+    :return: The result of every item: the created contact or the error.
+    :rtype: List[ContactBatchResult]
+    """
+    return await repository_contacts.create_contacts(body.items, current_user, db)
+
+
+@router.put(
+    "/batch",
+    response_model=List[ContactBatchResult],
+    description="No more than 5 requests per minute",
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60)),
+        Depends(UserQuota(cost=body_cost)),
+    ],
+)
+async def update_contacts(
+    body: ContactBatchUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Update several contacts of the authorized user in one transaction.
+
+    :param body: The IDs and the updated details of the contacts.
+    :type body: ContactBatchUpdate
+    :param db: The database session.
+    :type db: AsyncSession
+    :param current_user: The user to whom the contacts belong.
+    :type current_user: User
+    :return: The result of every item: the updated contact, 404 or the error.
+    :rtype: List[ContactBatchResult]
+    """
+    return await repository_contacts.update_contacts(body.items, current_user, db)
+
+
+@router.post(
+    "/batch/delete",
+    response_model=List[ContactBatchResult],
+    description="No more than 5 requests per minute",
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60)),
+        Depends(UserQuota(cost=body_cost)),
+    ],
+)
+async def delete_contacts(
+    body: ContactBatchDelete,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Removes several contacts of the authorized user with one statement.
+
+    :param body: The IDs of the contacts to delete.
+    :type body: ContactBatchDelete
+    :param db: The database session.
+    :type db: AsyncSession
+    :param current_user: The user to remove the contacts for.
+    :type current_user: User
+    :return: The result of every ID: deleted or 404.
+    :rtype: List[ContactBatchResult]
+    """
+    return await repository_contacts.delete_contacts(body.ids, current_user, db)
+
+
+@router.get("/cache_stats")
+async def cache_stats(current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Statistics of the contacts read-through cache of the current worker: hits and misses.
+
+    :param current_user: The authenticated user.
+    :type current_user: User
+    :return: The cache statistics
+    :rtype: dict
+    """
+    return contacts_cache.stats()
+
+
 @router.get(
     "/{contact_id}",
     response_model=ContactResponse,
     description="No more than 5 requests per minute",
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))],
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60)),
+        Depends(UserQuota()),
+    ],
 )
 async def find_contact_id(
     contact_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
     Retrieves a single contact with specified ID for the authorized user.
+    Returns 304 without a body if If-None-Match holds the ETag of the contacts.
 
     :param contact_id: The ID of the contact to retrieve.
     :type contact_id: int
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The user to retrieve contact for.
     :type current_user: User
     :raises HTTPException: If the contact with the specified ID is not found.
     :return: The found contact.
     """
-    contact = await repository_contacts.find_contact(contact_id, current_user, db)
-    return contact
+    cached = await not_modified(request, response, current_user)
+    if cached is not None:
+        return cached
+
+    async def load():
+        contact = await repository_contacts.find_contact(contact_id, current_user, db)
+        return ContactResponse.model_validate(contact).model_dump(mode="json")
+
+    return await contacts_cache.get_or_load(current_user.id, ("contact", contact_id), load)
 
 
 @router.put(
     "/{contact_id}",
     response_model=ContactResponse,
     description="No more than 5 requests per minute",
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))],
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60)),
+        Depends(UserQuota()),
+    ],
 )
 async def update_contact(
     contact_id: int,
     contact: ContactModel,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -122,7 +509,7 @@ async def update_contact(
     :param contact: The updated contact details.
     :type contact: ContactUpdate
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The user to whom the contact belongs.
     :type current_user: User
     :raises HTTPException: If the contact with the specified ID is not found.
@@ -135,15 +522,54 @@ async def update_contact(
     return contact
 
 
+@router.patch(
+    "/{contact_id}",
+    response_model=ContactResponse,
+    description="No more than 5 requests per minute",
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60)),
+        Depends(UserQuota()),
+    ],
+)
+async def patch_contact(
+    contact_id: int,
+    contact: ContactPatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Update only the supplied fields of a specified contact for a authorized user.
+
+    :param contact_id: The ID of the contact to update.
+    :type contact_id: int
+    :param contact: The fields to update.
+    :type contact: ContactPatch
+    :param db: The database session.
+    :type db: AsyncSession
+    :param current_user: The user to whom the contact belongs.
+    :type current_user: User
+    :raises HTTPException: If a required field is set to null or the contact is not found.
+    :return: The updated contact.
+    :rtype: ContactResponse
+    """
+    contact = await repository_contacts.patch_contact(
+        contact_id, current_user, contact, db
+    )
+    return contact
+
+
 @router.delete(
     "/{contact_id}",
     description="No more than 5 requests per minute",
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))],
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60)),
+        Depends(UserQuota()),
+    ],
 )
 async def delete_contact(
     contact_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Removes a single contact with the specified ID for a authorized user.
@@ -153,7 +579,7 @@ async def delete_contact(
     :param current_user: The user to remove the contact for.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the contact with the specified ID is not found.
     :return: A message confirming the deletion.
     :rtype: dict
@@ -165,27 +591,37 @@ async def delete_contact(
 @router.get(
     "/birthdays/",
     response_model=List[ContactResponse],
-    description="No more than 5 requests per minute",
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))],
+    description="No more than 5 requests per minute, every 30 days cost one request more",
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=60, cost=birthdays_cost)),
+        Depends(UserQuota(cost=birthdays_cost)),
+    ],
 )
 async def get_next_days_birthdays(
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
-    days: int = 7,
+    db: AsyncSession = Depends(get_db),
+    days: int = Query(7, ge=0),
 ):
     """
     Get all contacts of an authorized user with birthdays in the next N days (default N = 7)
     Contacts are displayed sorted by date
+    The answer is cached for the day until the contacts of the user change.
 
     :param user: The user to retrieve the contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contacts with birthdays within next N days.
     :rtype: List[Contact]
     """
-    contacts = await repository_contacts.get_next_days_birthdays(current_user, db, days)
-    return contacts
+
+    async def load():
+        contacts = await repository_contacts.get_next_days_birthdays(current_user, db, days)
+        return [ContactResponse.model_validate(contact).model_dump(mode="json") for contact in contacts]
+
+    return await contacts_cache.get_or_load(
+        current_user.id, ("birthdays", date.today().isoformat(), days), load
+    )
 
     # @router.get(
     #     "/birthdays_4/",
@@ -195,7 +631,7 @@ async def get_next_days_birthdays(
     # )
     # async def get_contact_by_birthday(
     #     current_user: User = Depends(auth_service.get_current_user),
-    #     db: Session = Depends(get_db),
+    #     db: AsyncSession = Depends(get_db),
     #     days: int = 7,
     # ):
     # """
@@ -205,7 +641,7 @@ async def get_next_days_birthdays(
     # :param user: The user to retrieve the contacts for.
     # :type user: User
     # :param db: The database session.
-    # :type db: Session
+    # :type db: AsyncSession
     # :return: Contacts with birthdays within next N days.
     # :rtype: List[Contact]
     # """
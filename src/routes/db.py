@@ -1,26 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text
-from src.database.db import get_db, reset_db
+from src.database.db import get_db, get_pool_stats
+from src.schemas.jobs import JobResponse
+from src.services.jobs import job_queue
+from src.services.redis_pool import get_redis_pool_stats
 
 router = APIRouter(prefix="/database", tags=["database"])
 
 
-@router.delete("/reset_base")
+@router.delete("/reset_base", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def reset_database():
     """
-    Complete deletion of tables from the database and creation of new ones.
+    Queue the complete deletion of tables from the database and creation of new ones.
+    The status is at /api/jobs/{id}.
     no param
+    :return: The job.
+    :rtype: JobResponse
     """
-    reset_db()
-    return {"message": "Congratulations! You have a new fresh database"}
+    return await job_queue.enqueue("reset_db")
 
 
 @router.get("/healthchecker")  # треба розібратися як воно працює (НЕ працює)
-async def healthchecker(db: Session = Depends(get_db)):
+async def healthchecker(db: AsyncSession = Depends(get_db)):
     """Checks the health of the database
     :param: db
-    :type db: Session
+    :type db: AsyncSession
     :return: A message
     :rtype: dict
     :raises: HTMLException with status code 500
@@ -30,7 +35,8 @@ async def healthchecker(db: Session = Depends(get_db)):
             status_code=500, detail="Database is not configured correctly"
         )
     try:
-        result = db.execute(text("SELECT 1")).fetchone()
+        result = await db.execute(text("SELECT 1"))
+        result = result.fetchone()
         if result is None:
             raise HTTPException(
                 status_code=500, detail="Database is not configured correctly"
@@ -39,3 +45,27 @@ async def healthchecker(db: Session = Depends(get_db)):
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail="Error connecting to the database")
+
+
+@router.get("/pool_stats")
+async def pool_stats():
+    """
+    Statistics of the database connection pool of the current worker:
+    occupancy, checkout wait time, overflow and timeout counts.
+    no param
+    :return: The pool statistics
+    :rtype: dict
+    """
+    return get_pool_stats()
+
+
+@router.get("/redis_pool_stats")
+async def redis_pool_stats():
+    """
+    Statistics of the Redis connection pool of the current worker,
+    shared by the caches, the sessions, the job queue and the rate limiter.
+    no param
+    :return: The pool statistics
+    :rtype: dict
+    """
+    return get_redis_pool_stats()
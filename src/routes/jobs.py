@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException, status
+
+from src.conf import messages
+from src.schemas.jobs import JobResponse
+from src.services.jobs import job_queue
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """
+    The status and progress of the background job.
+
+    :param job_id: The ID of the job.
+    :type job_id: str
+    :return: The job.
+    :rtype: JobResponse
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=messages.JOB_NOT_FOUND)
+    return job
@@ -1,17 +1,34 @@
-from fastapi import APIRouter
-from src.seed.contacts import seed_contacts
-from src.seed.users import seed_users
+from fastapi import APIRouter, Query, status
+from src.schemas.jobs import JobResponse
+from src.services.jobs import job_queue
 
 router = APIRouter(prefix="/seed", tags=["seed"])
 
 
-@router.post("/users")
-async def seed_fake_users(number_users: int = 3):
-    seed_users(number_users)
-    return {"message": f"You have {number_users} new fake Users"}
+@router.post("/users", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def seed_fake_users(number_users: int = Query(3, ge=1)):
+    """
+    Queue adding confirmed fake users user_N@gmail.com with the password 123456.
+    The progress is at /api/jobs/{id}.
 
+    :param number_users: The number of users.
+    :type number_users: int
+    :return: The job.
+    :rtype: JobResponse
+    """
+    return await job_queue.enqueue("seed_users", count=number_users)
 
-@router.post("/contacts")
-async def seed_fake_contacts(number_contacts: int = 10):
-    seed_contacts(number_contacts)
-    return {"message": f"You have {number_contacts} new fake Contacts"}
+
+@router.post("/contacts", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def seed_fake_contacts(number_contacts: int = Query(10, ge=1), seed: int | None = None):
+    """
+    Queue adding fake contacts of random users. The progress is at /api/jobs/{id}.
+
+    :param number_contacts: The number of contacts.
+    :type number_contacts: int
+    :param seed: The same seed gives the same contacts (for the same users), random if not set.
+    :type seed: int | None
+    :return: The job.
+    :rtype: JobResponse
+    """
+    return await job_queue.enqueue("seed_contacts", count=number_contacts, seed=seed)
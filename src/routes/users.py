@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import cloudinary
 import cloudinary.uploader
 
@@ -30,7 +30,7 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 async def update_avatar_user(
     file: UploadFile = File(),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Update the avatar of the current user.
@@ -40,7 +40,7 @@ async def update_avatar_user(
     :param current_user: The current authenticated user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The updated user with the new avatar.
     :rtype: UserDb
     """
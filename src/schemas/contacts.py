@@ -1,9 +1,10 @@
 from datetime import date
+from enum import Enum
 # from pydantic import Field, BaseModel, EmailStr
 from pydantic import ConfigDict, Field, BaseModel, EmailStr
 from pydantic_extra_types.phone_numbers import PhoneNumber
-from src.const.constants import NAME_LEN, EMAIL_LEN, PHONE_LEN, NOTES_LEN
-from typing import Optional
+from src.const.constants import NAME_LEN, EMAIL_LEN, PHONE_LEN, NOTES_LEN, BATCH_LIMIT
+from typing import List, Optional
 
 
 PhoneNumber.phone_format = "E164"
@@ -18,9 +19,75 @@ class ContactModel(BaseModel):
     notes: Optional[str] = Field("", max_length=NOTES_LEN)
 
 
+class ContactPatch(BaseModel):
+    first_name: Optional[str] = Field(None, max_length=NAME_LEN)
+    last_name: Optional[str] = Field(None, max_length=NAME_LEN)
+    email: Optional[EmailStr] = Field(None, max_length=EMAIL_LEN)
+    phone: Optional[PhoneNumber] = Field(None, max_length=PHONE_LEN)
+    birthday: Optional[date] = None
+    notes: Optional[str] = Field(None, max_length=NOTES_LEN)
+
+
 class ContactResponse(ContactModel):
     id: int
 
     # class Config:
     #     from_attributes = True
     model_config = ConfigDict(from_attributes=True)
+
+
+class SearchMode(str, Enum):
+    fulltext = "fulltext"
+    fuzzy = "fuzzy"
+    substring = "substring"
+
+
+class ContactSort(str, Enum):
+    rank = "rank"
+    id = "id"
+    last_name = "last_name"
+    birthday = "birthday"
+
+
+class ContactPage(BaseModel):
+    items: List[ContactResponse]
+    next_cursor: Optional[str] = None
+
+
+class ContactBatchUpdateItem(ContactModel):
+    id: int
+
+
+class ContactBatchCreate(BaseModel):
+    items: List[ContactModel] = Field(..., min_length=1, max_length=BATCH_LIMIT)
+
+
+class ContactBatchUpdate(BaseModel):
+    items: List[ContactBatchUpdateItem] = Field(..., min_length=1, max_length=BATCH_LIMIT)
+
+
+class ContactBatchDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BATCH_LIMIT)
+
+
+class ContactBatchResult(BaseModel):
+    id: Optional[int] = None
+    status: int
+    contact: Optional[ContactResponse] = None
+    detail: Optional[str] = None
+
+
+class FileFormat(str, Enum):
+    csv = "csv"
+    jsonl = "jsonl"
+
+
+class ContactImportError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class ContactImportReport(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    errors: List[ContactImportError] = []
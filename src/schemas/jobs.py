@@ -0,0 +1,16 @@
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+class JobResponse(BaseModel):
+    id: str
+    name: str
+    status: str
+    attempts: int
+    done: int
+    total: Optional[int] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
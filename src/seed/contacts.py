@@ -1,13 +1,17 @@
-from sqlalchemy.orm import Session
-from src.database.db import get_db
-from src.database.models import Contact, User
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.const.constants import SEED_CHUNK_SIZE
+from src.database.db import SessionLocal, bulk_insert
+from src.database.models import Contact, User, birthday_mmdd
+from src.seed.engine import chunk_seed, chunk_sizes, generate_chunks, new_seed
 from src.seed.users import seed_users
-from typing import List
+from src.services.birthday_index import birthday_index
+from src.services.contacts_version import contacts_version
+from typing import Awaitable, Callable, List, Sequence
 import random
 from faker import Faker
 
-fake_data: Faker = Faker(locale="uk_UA")
-
 PHONES_CODES = [
     "067",
     "097",
@@ -23,46 +27,109 @@ PHONES_CODES = [
     "073",
 ]
 
+def create_contacts(count: int, seed: int | None, user_ids: Sequence[int]) -> List[dict]:
+    """
+    Rows of the contacts table for count fake contacts of random users of user_ids.
+    No state is shared between the calls, so the chunks of concurrent seeds may be generated
+    in the threads of one process.
 
-def create_contacts(count: int) -> List[dict]:
+    :param count: The number of contacts.
+    :type count: int
+    :param seed: The seed of the random generators, the same seed gives the same contacts.
+    :type seed: int | None
+    :param user_ids: The ids of the users to own the contacts.
+    :type user_ids: Sequence[int]
+    :return: The rows.
+    :rtype: List[dict]
+    """
+    rng = random.Random(seed)
+    fake_data = Faker(locale="uk_UA")
+    fake_data.seed_instance(seed)
     contacts = []
     for _ in range(count):
         notes = ""
-        if bool(random.getrandbits(1)):
+        if rng.getrandbits(1):
             notes = fake_data.paragraph(nb_sentences=1)
+        birthday = fake_data.date_of_birth(minimum_age=5, maximum_age=98)
         contacts.append(
             {
                 "first_name": fake_data.first_name(),
                 "last_name": fake_data.last_name(),
                 "email": fake_data.free_email(),
-                "birthday": fake_data.date_of_birth(minimum_age=5, maximum_age=98),
-                "phone": f"+38{random.choice(PHONES_CODES)}{fake_data.msisdn()[6:]}",
+                "birthday": birthday,
+                "birthday_mmdd": birthday_mmdd(birthday),
+                "phone": f"+38{rng.choice(PHONES_CODES)}{fake_data.msisdn()[6:]}",
                 "notes": notes,
+                "user_id": rng.choice(user_ids),
             }
         )
     return contacts
 
 
-def upload_contacts(db: Session, contacts: List[dict]) -> None:
-    users = db.query(User).all()
-    if len(users) < 1:
+async def upload_contacts(
+    db: AsyncSession,
+    count: int,
+    seed: int | None = None,
+    workers: int = 0,
+    progress: Callable[[int, int], Awaitable[None]] | None = None,
+) -> int:
+    """
+    Insert count fake contacts of random users in chunks, generated in parallel with workers.
+
+    :param db: The database session.
+    :type db: AsyncSession
+    :param count: The number of contacts.
+    :type count: int
+    :param seed: The seed of a reproducible dataset (for the same users), random if None.
+    :type seed: int | None
+    :param workers: The number of processes generating the rows, 0 - no processes.
+    :type workers: int
+    :param progress: Called with the number of inserted and of all contacts after each chunk.
+    :type progress: Callable[[int, int], Awaitable[None]] | None
+    :return: The number of inserted contacts.
+    :rtype: int
+    """
+    ids = (await db.execute(select(User.id).order_by(User.id))).scalars().all()
+    if len(ids) < 1:
         # якщо нема жодного user'а, робимо 3 стандартні контакти
-        seed_users(3)
-        users = db.query(User).all()
+        await seed_users(3)
+        ids = (await db.execute(select(User.id).order_by(User.id))).scalars().all()
 
-    for contact_data in contacts:
-        contact = Contact(**contact_data, user=random.choice(users))
-        db.add(contact)
-    db.commit()
+    if seed is None:
+        seed = new_seed()
+    ids = tuple(ids)
+    chunks = (
+        (size, chunk_seed(seed, index), ids)
+        for index, (_, size) in enumerate(chunk_sizes(count, SEED_CHUNK_SIZE))
+    )
+    inserted = 0
+    owners = set()
+    async for rows in generate_chunks(create_contacts, chunks, workers):
+        await bulk_insert(db, Contact, rows)
+        await db.commit()
+        inserted += len(rows)
+        owners.update(row["user_id"] for row in rows)
+        if progress is not None:
+            await progress(inserted, count)
+    birthday_index.clear()
+    await contacts_version.bump_many(owners)
+    return inserted
 
 
-def seed_contacts(count_contacts: int=10):
-    contacts = create_contacts(count_contacts)
-    upload_contacts(db=next(get_db()), contacts=contacts)
+async def seed_contacts(
+    count_contacts: int = 10,
+    seed: int | None = None,
+    workers: int = 0,
+    progress: Callable[[int, int], Awaitable[None]] | None = None,
+) -> int:
+    async with SessionLocal() as db:
+        return await upload_contacts(
+            db=db, count=count_contacts, seed=seed, workers=workers, progress=progress
+        )
 
 
 def main():
-    seed_contacts()
+    asyncio.run(seed_contacts())
 
 if __name__ == "__main__":
     main()
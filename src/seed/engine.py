@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Iterable
+
+
+def chunk_seed(seed: int, index: int) -> int:
+    """
+    The seed of the random generators of a chunk: the chunks are generated in any process
+    and in any order, but the same seed always gives the same dataset.
+
+    :param seed: The seed of the dataset.
+    :type seed: int
+    :param index: The number of the chunk.
+    :type index: int
+    :return: The seed of the chunk.
+    :rtype: int
+    """
+    return seed * 2**32 + index
+
+
+def new_seed() -> int:
+    return random.randrange(2**31)
+
+
+def chunk_sizes(count: int, chunk_size: int) -> Iterable[tuple[int, int]]:
+    """
+    Split count rows into chunks.
+
+    :param count: The number of rows.
+    :type count: int
+    :param chunk_size: The maximal size of a chunk.
+    :type chunk_size: int
+    :return: The offset and the size of every chunk.
+    :rtype: Iterable[tuple[int, int]]
+    """
+    for offset in range(0, count, chunk_size):
+        yield offset, min(chunk_size, count - offset)
+
+
+async def generate_chunks(
+    func: Callable[..., list],
+    chunks: Iterable[tuple],
+    workers: int,
+    initializer: Callable | None = None,
+    initargs: tuple = (),
+) -> AsyncIterator[list]:
+    """
+    The results of func(*args) for every args of chunks, in order.
+    With workers > 0 the chunks are generated in a pool of processes, a few chunks ahead of
+    the consumer (so the database is written while the next chunks are generated);
+    otherwise in a thread, one by one, so the event loop is not blocked.
+
+    :param func: Generates the rows of a chunk, a module-level function (it is pickled).
+    :type func: Callable[..., list]
+    :param chunks: The arguments of func for every chunk.
+    :type chunks: Iterable[tuple]
+    :param workers: The number of processes, 0 - no processes.
+    :type workers: int
+    :param initializer: Called once in every process (and in this one without processes).
+    :type initializer: Callable | None
+    :param initargs: The arguments of the initializer.
+    :type initargs: tuple
+    :return: The rows of every chunk.
+    :rtype: AsyncIterator[list]
+    """
+    if workers <= 0:
+        if initializer is not None:
+            initializer(*initargs)
+        for args in chunks:
+            yield await asyncio.to_thread(func, *args)
+        return
+
+    loop = asyncio.get_running_loop()
+    # spawn: the app process has threads (thread pools, event loop) that fork does not copy
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=initializer, initargs=initargs
+    ) as pool:
+        pending = deque()
+        for args in chunks:
+            pending.append(loop.run_in_executor(pool, func, *args))
+            if len(pending) >= workers * 2:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+
+
+async def seed(users: int, contacts: int, seed_: int | None, workers: int) -> None:
+    # the seed modules import this one
+    from src.seed.contacts import seed_contacts
+    from src.seed.users import seed_users
+
+    if users:
+        print(f"{await seed_users(users, workers=workers)} users")
+    if contacts:
+        print(f"{await seed_contacts(contacts, seed=seed_, workers=workers)} contacts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the database with fake users and contacts.")
+    parser.add_argument("--users", type=int, default=0, help="the number of users")
+    parser.add_argument("--contacts", type=int, default=0, help="the number of contacts")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of a reproducible dataset")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="processes generating the data"
+    )
+    args = parser.parse_args()
+    asyncio.run(seed(args.users, args.contacts, args.seed, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,97 @@
+import asyncio
+from datetime import datetime
 from libgravatar import Gravatar
-from sqlalchemy.orm import Session
-from src.database.db import get_db
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.const.constants import SEED_CHUNK_SIZE
+from src.database.db import SessionLocal, bulk_insert
 from src.database.models import User
-from src.schemas.users import UserModel
+from src.seed.engine import chunk_sizes, generate_chunks
 from src.services.auth import auth_service
-from typing import List
+from typing import Awaitable, Callable, List
 
+SEED_PASSWORD = "123456"
 
-def create_users(count: int, db: Session):
 
-    number_user = len(db.query(User).all()) + 1
+def create_users(start: int, count: int, password: str, created_at: datetime) -> List[dict]:
+    """
+    Rows of the users table for the fake users number start .. start + count - 1.
 
-    for num in range(number_user, (number_user + count)):
-        body = UserModel(
-            username=f"user_{str(num)}",
-            email=f"user_{str(num)}@gmail.com",
-            password="123456",
+    :param start: The number of the first user.
+    :type start: int
+    :param count: The number of users.
+    :type count: int
+    :param password: The password hash, the same for all the fake users.
+    :type password: str
+    :param created_at: The creation time of the users.
+    :type created_at: datetime
+    :return: The rows.
+    :rtype: List[dict]
+    """
+    users = []
+    for num in range(start, start + count):
+        email = f"user_{num}@gmail.com"
+        users.append(
+            {
+                "username": f"user_{num}",
+                "email": email,
+                "password": password,
+                # computed locally from the email, no request to gravatar
+                "avatar": Gravatar(email).get_image(),
+                "confirmed": True,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
         )
-        body.password = auth_service.get_password_hash(body.password)
+    return users
 
-        avatar = None
-        try:
-            g = Gravatar(body.email)
-            avatar = g.get_image()
-        except Exception as e:
-            print(e)
-        new_user = User(**body.model_dump(), avatar=avatar, confirmed=True)
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
 
+async def create_users_bulk(
+    count: int, db: AsyncSession, workers: int = 0, progress: Callable[[int, int], Awaitable[None]] | None = None
+) -> int:
+    """
+    Insert count confirmed fake users with the password SEED_PASSWORD, in chunks.
+    The password is hashed once for all of them.
+
+    :param count: The number of users.
+    :type count: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :param workers: The number of processes generating the rows, 0 - no processes.
+    :type workers: int
+    :param progress: Called with the number of inserted and of all users after each chunk.
+    :type progress: Callable[[int, int], Awaitable[None]] | None
+    :return: The number of inserted users.
+    :rtype: int
+    """
+    number_user = await db.execute(select(func.count(User.id)))
+    number_user = number_user.scalar() + 1
+    password = await auth_service.get_password_hash(SEED_PASSWORD)
+    created_at = datetime.now()
+
+    chunks = (
+        (number_user + offset, size, password, created_at)
+        for offset, size in chunk_sizes(count, SEED_CHUNK_SIZE)
+    )
+    inserted = 0
+    async for rows in generate_chunks(create_users, chunks, workers):
+        await bulk_insert(db, User, rows)
+        await db.commit()
+        inserted += len(rows)
+        if progress is not None:
+            await progress(inserted, count)
+    return inserted
+
+
+async def seed_users(
+    count_users: int = 3, workers: int = 0, progress: Callable[[int, int], Awaitable[None]] | None = None
+) -> int:
+    async with SessionLocal() as db:
+        return await create_users_bulk(count_users, db=db, workers=workers, progress=progress)
 
-def seed_users(count_users: int=3):
-    create_users(count_users, db=next(get_db()))
 
 def main():
-    seed_users()
+    asyncio.run(seed_users())
 
 if __name__ == "__main__":
     main()
@@ -1,17 +1,23 @@
 from typing import Optional
-import pickle
-import redis
+import hashlib
+import time
+import uuid
 
+import redis
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.repository import users as repository_users
+from src.conf import messages
 from src.conf.config import settings
+from src.services.cache import LRUCache
+from src.services.password_hasher import PasswordHasher
+from src.services.refresh_tokens import ROTATED, refresh_token_store
+from src.services.user_cache import user_cache
 
 
 class Auth:
@@ -19,13 +25,20 @@ class Auth:
     Class for authentication and authorization operations.
     """
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    password_hasher = PasswordHasher(
+        rounds=settings.bcrypt_rounds,
+        max_workers=settings.bcrypt_workers,
+        max_queue=settings.bcrypt_max_queue,
+    )
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    user_cache = user_cache
+    # verified claims of the access tokens by sha256 of the token, each kept until its exp
+    token_cache = LRUCache(maxsize=settings.token_cache_maxsize, ttl=0)
+    refresh_tokens = refresh_token_store
 
-    def verify_password(self, plain_password, hashed_password):
+    async def verify_password(self, plain_password, hashed_password):
         """
         Verify if the plain password matches the hashed password.
 
@@ -36,9 +49,22 @@ class Auth:
         :return: True if the passwords match, False otherwise.
         :rtype: bool
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return await self.password_hasher.verify(plain_password, hashed_password)
+
+    async def verify_and_update_password(self, plain_password, hashed_password):
+        """
+        Verify the password and rehash it if the hash was made with other bcrypt rounds than in settings.
+
+        :param plain_password: The plain password.
+        :type plain_password: str
+        :param hashed_password: The hashed password.
+        :type hashed_password: str
+        :return: Whether the passwords match and the new hash (None if the hash is up to date).
+        :rtype: tuple[bool, str | None]
+        """
+        return await self.password_hasher.verify_and_update(plain_password, hashed_password)
 
-    def get_password_hash(self, password: str):
+    async def get_password_hash(self, password: str):
         """
         Generate hashed password of the provided password.
 
@@ -47,7 +73,7 @@ class Auth:
         :return: The hashed password.
         :rtype: str
         """
-        return self.pwd_context.hash(password)
+        return await self.password_hasher.hash(password)
 
     async def create_access_token(
         self, data: dict, expires_delta: Optional[float] = None
@@ -92,7 +118,7 @@ class Auth:
         if expires_delta:
             expire = datetime.utcnow() + timedelta(seconds=expires_delta)
         else:
-            expire = datetime.utcnow() + timedelta(days=7)
+            expire = datetime.utcnow() + timedelta(seconds=settings.refresh_token_ttl)
         to_encode.update(
             {"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"}
         )
@@ -116,22 +142,22 @@ class Auth:
         token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
         return token
 
-    async def decode_refresh_token(self, refresh_token: str):
+    def refresh_token_claims(self, refresh_token: str) -> dict:
         """
-        Decode the refresh token.
+        The verified claims of the refresh token.
 
         :param refresh_token: The refresh token to decode.
         :type refresh_token: str
-        :return: The decoded email.
-        :rtype: str
+        :raises HTTPException: If the token is invalid or not a refresh token.
+        :return: The claims.
+        :rtype: dict
         """
         try:
             payload = jwt.decode(
                 refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
             )
             if payload["scope"] == "refresh_token":
-                email = payload["sub"]
-                return email
+                return payload
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid scope for token",
@@ -142,8 +168,106 @@ class Auth:
                 detail="Could not validate credentials",
             )
 
+    async def create_session_tokens(self, email: str, session_id: str | None = None) -> dict:
+        """
+        Start a session of the user (a device): a new pair of access and refresh tokens.
+        The refresh token carries the session id and its own id, the session keeps the id of
+        its only valid refresh token in the refresh token store.
+
+        :param email: The email of the user.
+        :type email: str
+        :param session_id: The id of the session, a new one if None. Logging in again
+            with the same id replaces the refresh token of that session.
+        :type session_id: str | None
+        :raises HTTPException: If the refresh token store is unavailable.
+        :return: The access token, refresh token and token type.
+        :rtype: dict
+        """
+        session_id = session_id or uuid.uuid4().hex
+        token_id = uuid.uuid4().hex
+        try:
+            await self.refresh_tokens.add(email, session_id, token_id, settings.refresh_token_ttl)
+        except redis.RedisError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=messages.SESSION_STORE_UNAVAILABLE,
+            )
+        return await self.session_tokens(email, session_id, token_id)
+
+    async def rotate_session_tokens(self, refresh_token: str) -> dict:
+        """
+        A new pair of tokens for the refresh token, which can not be used again.
+        Presenting an already rotated refresh token revokes its session: either the user or
+        someone who stole the token holds a newer one.
+
+        :param refresh_token: The refresh token.
+        :type refresh_token: str
+        :raises HTTPException: If the refresh token is invalid, rotated or its session is revoked,
+            or the refresh token store is unavailable.
+        :return: The access token, refresh token and token type.
+        :rtype: dict
+        """
+        payload = self.refresh_token_claims(refresh_token)
+        email, session_id, token_id = payload["sub"], payload.get("sid"), payload.get("jti")
+        if session_id is None or token_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=messages.INVALID_REFRESH_TOKEN,
+            )
+        new_token_id = uuid.uuid4().hex
+        try:
+            result = await self.refresh_tokens.rotate(
+                email, session_id, token_id, new_token_id, settings.refresh_token_ttl
+            )
+        except redis.RedisError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=messages.SESSION_STORE_UNAVAILABLE,
+            )
+        if result != ROTATED:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=messages.INVALID_REFRESH_TOKEN,
+            )
+        return await self.session_tokens(email, session_id, new_token_id)
+
+    async def session_tokens(self, email: str, session_id: str, token_id: str) -> dict:
+        access_token = await self.create_access_token(data={"sub": email})
+        refresh_token = await self.create_refresh_token(
+            data={"sub": email, "sid": session_id, "jti": token_id}
+        )
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "token_type": "bearer",
+        }
+
+    def decode_access_token(self, token: str) -> dict | None:
+        """
+        The verified claims of the access token. The signature of a token is checked once,
+        then its claims are taken from the token cache until the token expires.
+
+        :param token: The access token.
+        :type token: str
+        :return: The claims, None if the token is invalid, expired or not an access token.
+        :rtype: dict | None
+        """
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self.token_cache.get(key)
+        if payload is not None:
+            return payload
+        try:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        except JWTError:
+            return None
+        if payload.get("scope") != "access_token" or payload.get("sub") is None:
+            return None
+        if payload.get("exp") is not None:
+            self.token_cache.set(key, payload, payload["exp"] - time.time())
+        return payload
+
     async def get_current_user(
-        self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+        self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
     ):
         """
         Get the current authenticated user.
@@ -151,7 +275,7 @@ class Auth:
         :param token: The authentication token.
         :type token: str
         :param db: The database session.
-        :type db: Session
+        :type db: AsyncSession
         :return: The current authenticated user.
         :rtype: User
         """
@@ -161,26 +285,13 @@ class Auth:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-        try:
-            # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload["scope"] == "access_token":
-                email = payload["sub"]
-                if email is None:
-                    raise credentials_exception
-            else:
-                raise credentials_exception
-        except JWTError as e:
+        payload = self.decode_access_token(token)
+        if payload is None:
             raise credentials_exception
-        user = self.r.get(f"user:{email}")
+        email = payload["sub"]
+        user = await self.user_cache.get_or_load(email, db, repository_users.get_user_by_email)
         if user is None:
-            user = await repository_users.get_user_by_email(email, db)
-            if user is None:
-                raise credentials_exception
-            self.r.set(f"user:{email}", pickle.dumps(user))
-            self.r.expire(f"user:{email}", 900)
-        else:
-            user = pickle.loads(user)
+            raise credentials_exception
         return user
 
     async def get_email_from_token(self, token: str):
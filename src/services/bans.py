@@ -0,0 +1,271 @@
+import asyncio
+import json
+import os
+import re
+from functools import lru_cache
+from ipaddress import ip_address, ip_network
+from typing import Iterable
+
+import redis
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.conf import messages
+from src.conf.config import settings
+from src.const.constants import BANNED_IPS, BANNED_USER_AGENTS
+from src.services.redis_pool import redis_client
+
+
+class IPPrefixTree:
+    """
+    The banned networks (CIDR) in binary prefix trees, one for IPv4 and one for IPv6:
+    a lookup walks at most 32 / 128 bits, however many networks are banned.
+    """
+
+    def __init__(self, networks: Iterable[str] = ()):
+        # a node is [child for bit 0, child for bit 1, whether a banned network ends here]
+        self.roots = {4: [None, None, False], 6: [None, None, False]}
+        self.size = 0
+        for network in networks:
+            self.add(network)
+
+    def add(self, network: str):
+        """
+        Ban the network or the address.
+
+        :param network: The network ("10.0.0.0/8", "2001:db8::/32") or the address.
+        :type network: str
+        :raises ValueError: If it is not a network or an address.
+        """
+        network_ = ip_network(network.strip(), strict=False)
+        address = int(network_.network_address)
+        node = self.roots[network_.version]
+        for index in range(network_.prefixlen):
+            bit = (address >> (network_.max_prefixlen - 1 - index)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, False]
+            node = node[bit]
+        node[2] = True
+        self.size += 1
+
+    def __contains__(self, address: str) -> bool:
+        try:
+            address_ = ip_address(address)
+        except ValueError:
+            return False
+        value = int(address_)
+        node = self.roots[address_.version]
+        for index in range(address_.max_prefixlen):
+            if node[2]:
+                return True
+            node = node[(value >> (address_.max_prefixlen - 1 - index)) & 1]
+            if node is None:
+                return False
+        return node[2]
+
+
+# the global flags at the start of a pattern, e.g. "(?i)bot"
+GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+
+def scoped(pattern: str) -> str:
+    """
+    The pattern as a group of the combined regex: its global flags, which are allowed
+    only at the start of the whole regex, become the flags of the group.
+
+    :param pattern: The User-Agent pattern.
+    :type pattern: str
+    :return: The group, e.g. "(?i:bot)" for "(?i)bot".
+    :rtype: str
+    """
+    match = GLOBAL_FLAGS.match(pattern)
+    if match:
+        return f"(?{match.group(1)}:{pattern[match.end():]})"
+    return f"(?:{pattern})"
+
+
+class UserAgentMatcher:
+    """
+    The banned User-Agent patterns compiled into one regex; the decisions for the recent
+    User-Agents are kept in an LRU, as the clients send the same few over and over.
+    The invalid patterns are reported and dropped.
+    """
+
+    def __init__(self, patterns: Iterable[str] = (), cache_size: int = 10000):
+        groups = []
+        for pattern in patterns:
+            try:
+                group = scoped(pattern)
+                re.compile(group)
+            except re.error as err:
+                print(f"Invalid User-Agent ban pattern {pattern!r}: {err}")
+                continue
+            groups.append(group)
+        try:
+            self.regex = re.compile("|".join(groups)) if groups else None
+        except re.error:
+            # a group valid on its own fails in the combined regex, e.g. the same group name in two patterns
+            self.regex = None
+            valid = []
+            for group in groups:
+                try:
+                    self.regex = re.compile("|".join(valid + [group]))
+                except re.error as err:
+                    print(f"Invalid User-Agent ban pattern {group!r}: {err}")
+                    continue
+                valid.append(group)
+            groups = valid
+        self.size = len(groups)
+        self.is_banned = lru_cache(maxsize=cache_size)(self.search)
+
+    def search(self, user_agent: str) -> bool:
+        return self.regex is not None and self.regex.search(user_agent) is not None
+
+
+class BanList:
+    """
+    The banned User-Agents and IP networks. load replaces both at once,
+    the requests in progress keep checking the old ones.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self.source_lists: tuple[frozenset, frozenset] | None = None
+        self.load(BANNED_USER_AGENTS, BANNED_IPS)
+
+    def load(self, user_agents: Iterable[str], ips: Iterable[str]):
+        """
+        Replace the ban lists.
+
+        :param user_agents: The regex patterns of the banned User-Agents.
+        :type user_agents: Iterable[str]
+        :param ips: The banned addresses and networks.
+        :type ips: Iterable[str]
+        """
+        networks = IPPrefixTree()
+        for ip in ips:
+            try:
+                networks.add(ip)
+            except ValueError as err:
+                print(f"Invalid IP ban {ip!r}: {err}")
+        self.user_agents, self.networks = UserAgentMatcher(user_agents, self.cache_size), networks
+
+    def update(self, user_agents: Iterable[str], ips: Iterable[str]) -> bool:
+        """
+        Load the lists of the ban source in addition to the built-in ones, if they changed.
+
+        :param user_agents: The banned User-Agents of the source.
+        :type user_agents: Iterable[str]
+        :param ips: The banned addresses and networks of the source.
+        :type ips: Iterable[str]
+        :return: Whether the lists changed.
+        :rtype: bool
+        """
+        source_lists = (frozenset(user_agents), frozenset(ips))
+        if source_lists == self.source_lists:
+            return False
+        self.load(
+            list(BANNED_USER_AGENTS) + sorted(source_lists[0]),
+            list(BANNED_IPS) + sorted(source_lists[1]),
+        )
+        # only once loaded, so lists which failed are loaded again on the next reload
+        self.source_lists = source_lists
+        return True
+
+    def is_banned(self, ip: str | None, user_agent: str) -> bool:
+        return (ip is not None and ip in self.networks) or self.user_agents.is_banned(user_agent)
+
+
+async def read_ban_file(path: str) -> tuple[list[str], list[str]]:
+    """
+    The ban lists of the JSON file {"user_agents": [...], "ips": [...]}.
+
+    :param path: The path of the file.
+    :type path: str
+    :return: The banned User-Agents and IPs.
+    :rtype: tuple[list[str], list[str]]
+    """
+
+    def read():
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+
+    data = await asyncio.to_thread(read)
+    return data.get("user_agents", []), data.get("ips", [])
+
+
+async def read_ban_redis(redis_client, prefix: str = "bans:") -> tuple[list[str], list[str]]:
+    """
+    The ban lists of the Redis sets "<prefix>user_agents" and "<prefix>ips", in one round trip.
+
+    :param redis_client: The asyncio Redis client.
+    :type redis_client: redis.asyncio.Redis
+    :param prefix: The prefix of the keys.
+    :type prefix: str
+    :return: The banned User-Agents and IPs.
+    :rtype: tuple[list[str], list[str]]
+    """
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.smembers(f"{prefix}user_agents")
+        pipe.smembers(f"{prefix}ips")
+        user_agents, ips = await pipe.execute()
+    return list(user_agents), list(ips)
+
+
+async def watch_bans(ban_list: BanList, source: str, interval: float):
+    """
+    Reload the ban lists from the source every interval seconds, runs until cancelled.
+    The file is read again only when it is modified. On an error the current lists are kept.
+
+    :param ban_list: The ban list.
+    :type ban_list: BanList
+    :param source: "file" (settings.ban_file) or "redis".
+    :type source: str
+    :param interval: Seconds between the reloads.
+    :type interval: float
+    """
+    modified = None
+    while True:
+        try:
+            if source == "file":
+                mtime = os.stat(settings.ban_file).st_mtime
+                if mtime != modified:
+                    ban_list.update(*await read_ban_file(settings.ban_file))
+                    modified = mtime
+            else:
+                ban_list.update(*await read_ban_redis(redis_client))
+        except (OSError, ValueError, AttributeError, TypeError, re.error, redis.RedisError) as err:
+            print(f"Ban lists are not reloaded: {err}")
+        await asyncio.sleep(interval)
+
+
+class BanMiddleware:
+    """
+    Pure ASGI middleware refusing the banned clients (403) before the app handles the request.
+    """
+
+    def __init__(self, app: ASGIApp, ban_list: BanList):
+        self.app = app
+        self.ban_list = ban_list
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        user_agent = ""
+        for name, value in scope["headers"]:
+            if name == b"user-agent":
+                user_agent = value.decode("latin-1")
+                break
+        if not self.ban_list.is_banned(client[0] if client else None, user_agent):
+            await self.app(scope, receive, send)
+            return
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        response = JSONResponse(status_code=403, content={"detail": messages.BANNED})
+        await response(scope, receive, send)
+
+
+ban_list = BanList(cache_size=settings.ban_user_agent_cache_size)
@@ -0,0 +1,214 @@
+import calendar
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import settings
+from src.database.models import Contact
+from src.services.single_flight import SingleFlight
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency (extra "birthday-index")
+    np = None
+
+
+# day of the year in a leap year calendar: January 1 = 1, February 29 = 60, December 31 = 366
+FEB_29 = 60
+MAR_1 = 61
+DAYS_IN_YEAR = 366
+
+
+def day_of_year(birthday: date) -> int:
+    """
+    The day of the year of the birthday in a leap year calendar, so every birthday has its own day.
+
+    :param birthday: The date.
+    :type birthday: date
+    :return: The day of the year (1..366).
+    :rtype: int
+    """
+    return date(2000, birthday.month, birthday.day).timetuple().tm_yday
+
+
+class UserBirthdays:
+    """
+    Compact arrays of the contact ids and their birthdays (day of the year) of one user.
+    The arrays grow by doubling, so adding a contact is amortized O(1).
+    """
+
+    def __init__(self, ids, days):
+        self.size = len(ids)
+        capacity = max(16, self.size)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.days = np.zeros(capacity, dtype=np.int16)
+        self.ids[: self.size] = ids
+        self.days[: self.size] = days
+        self.loaded_at = time.monotonic()
+
+    def add(self, contact_id: int, day: int):
+        if self.size == len(self.ids):
+            self.ids = np.concatenate([self.ids, np.zeros_like(self.ids)])
+            self.days = np.concatenate([self.days, np.zeros_like(self.days)])
+        self.ids[self.size] = contact_id
+        self.days[self.size] = day
+        self.size += 1
+
+    def remove(self, contact_id: int):
+        positions = np.flatnonzero(self.ids[: self.size] == contact_id)
+        for position in positions[::-1]:
+            # the last element takes the place of the removed one
+            self.size -= 1
+            self.ids[position] = self.ids[self.size]
+            self.days[position] = self.days[self.size]
+
+    def upcoming(self, today_: date, days_: int):
+        """
+        Ids of the contacts with birthdays from today_ to today_ + days_ (inclusive),
+        sorted by the upcoming date. In a non-leap year the birthday of February 29 is on March 1.
+        """
+        ids = self.ids[: self.size]
+        days = self.days[: self.size]
+        # any window of a year or more is the whole year; no date overflow for a large days_
+        days_ = min(days_, 365)
+        start = day_of_year(today_)
+        end = day_of_year(today_ + timedelta(days=days_))
+
+        def in_window(day):
+            if days_ >= 365:
+                return day >= 0
+            if start <= end:
+                return (day >= start) & (day <= end)
+            return (day >= start) | (day <= end)
+
+        mask = in_window(days)
+        # the year of the February 29 (or March 1 in a non-leap year) that falls into the window
+        february_year = today_.year if start <= MAR_1 else today_.year + 1
+        leap = calendar.isleap(february_year)
+        if not leap:
+            mask[days == FEB_29] = in_window(MAR_1)
+
+        positions = np.flatnonzero(mask)
+        ids = ids[positions]
+        found = days[positions].astype(np.int64)
+        if not leap:
+            found[found == FEB_29] = MAR_1
+        # days until the birthday (the ones before start are next year), then id
+        until = (found - start) % DAYS_IN_YEAR
+        return ids[np.argsort((until << 40) | ids, kind="stable")].tolist()
+
+
+class BirthdayIndex:
+    """
+    In-process index of the contact birthdays per user for the upcoming birthdays lookup.
+
+    The entry of the user is built lazily from the database on the first lookup and is kept up to date
+    by the contact write paths of this process. Other processes do not notify it, so the entry is
+    rebuilt after settings.birthday_index_ttl seconds. At most settings.birthday_index_max_users
+    users are kept (least recently used are dropped).
+    """
+
+    def __init__(self, max_users: int, ttl: float):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.users: OrderedDict[int, UserBirthdays] = OrderedDict()
+        self.flight = SingleFlight()
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None and settings.birthday_index_enabled
+
+    def get(self, user_id: int) -> UserBirthdays | None:
+        entry = self.users.get(user_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.loaded_at > self.ttl:
+            del self.users[user_id]
+            return None
+        self.users.move_to_end(user_id)
+        return entry
+
+    async def load(self, user_id: int, db: AsyncSession) -> UserBirthdays:
+        """
+        Build the entry of the user from the database.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param db: The database session.
+        :type db: AsyncSession
+        :return: The entry of the user.
+        :rtype: UserBirthdays
+        """
+        stmt = select(Contact.id, Contact.birthday).filter_by(user_id=user_id).where(Contact.birthday != None)
+        rows = await db.execute(stmt)
+        rows = rows.all()
+        entry = UserBirthdays(
+            np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((day_of_year(row.birthday) for row in rows), dtype=np.int16, count=len(rows)),
+        )
+        self.users[user_id] = entry
+        self.users.move_to_end(user_id)
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)
+        return entry
+
+    async def upcoming(self, user_id: int, db: AsyncSession, today_: date, days_: int) -> list[int]:
+        """
+        Ids of the contacts of the user with birthdays in the next days_ days, sorted by the upcoming date.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param db: The database session (used if the entry of the user has to be built).
+        :type db: AsyncSession
+        :param today_: The first day of the window.
+        :type today_: date
+        :param days_: The number of days after today_.
+        :type days_: int
+        :return: The contact ids.
+        :rtype: list[int]
+        """
+        entry = self.get(user_id)
+        if entry is None:
+            # concurrent requests of the user wait for one load
+            entry = await self.flight.do(user_id, lambda: self.load(user_id, db))
+        return entry.upcoming(today_, days_)
+
+    def add(self, user_id: int, contact_id: int, birthday: date | None):
+        """
+        Register the new contact, if the entry of the user is built.
+        """
+        entry = self.users.get(user_id) if self.enabled else None
+        if entry is not None and birthday is not None:
+            entry.add(contact_id, day_of_year(birthday))
+
+    def update(self, user_id: int, contact_id: int, birthday: date | None):
+        """
+        Register the new birthday of the contact, if the entry of the user is built.
+        """
+        self.remove(user_id, contact_id)
+        self.add(user_id, contact_id, birthday)
+
+    def remove(self, user_id: int, contact_id: int):
+        """
+        Unregister the deleted contact, if the entry of the user is built.
+        """
+        entry = self.users.get(user_id) if self.enabled else None
+        if entry is not None:
+            entry.remove(contact_id)
+
+    def invalidate(self, user_id: int):
+        """
+        Drop the entry of the user after a bulk change, it is rebuilt on the next lookup.
+        """
+        self.users.pop(user_id, None)
+
+    def clear(self):
+        self.users.clear()
+
+
+birthday_index = BirthdayIndex(
+    max_users=settings.birthday_index_max_users, ttl=settings.birthday_index_ttl
+)
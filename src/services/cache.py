@@ -0,0 +1,116 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """
+    Bounded in-process cache with a time to live of the entries.
+    The least recently used entries are dropped when the cache is full.
+    Not thread-safe: it is used from the event loop only.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        The value of the key, or default if it is missing or expired.
+
+        :param key: The key.
+        :type key: Hashable
+        :param default: The value for a miss.
+        :type default: Any
+        :return: The cached value.
+        :rtype: Any
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """
+        Store the value of the key.
+
+        :param key: The key.
+        :type key: Hashable
+        :param value: The value.
+        :type value: Any
+        :param ttl: Time to live in seconds. Defaults to the ttl of the cache.
+        :type ttl: float | None
+        """
+        self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Size and hit rate of the cache.
+        no param
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class RedisCache:
+    """
+    Values in Redis as JSON, with the interface of LRUCache (get, set, delete) as coroutines.
+    Redis errors are raised to the caller.
+    """
+
+    def __init__(self, redis_client, ttl: float):
+        self.redis = redis_client
+        self.ttl = ttl
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        raw = await self.redis.get(key)
+        return json.loads(raw) if raw is not None else default
+
+    async def set(self, key: str, value: Any, ttl: float | None = None):
+        await self.redis.setex(key, max(int(self.ttl if ttl is None else ttl), 1), json.dumps(value))
+
+    async def delete(self, key: str):
+        await self.redis.delete(key)
+
+
+class MemoryCache:
+    """
+    LRUCache with the interface of RedisCache, the values are kept in the worker.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.local = LRUCache(maxsize, ttl)
+
+    async def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.local.get(key, default)
+
+    async def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        self.local.set(key, value, ttl)
+
+    async def delete(self, key: Hashable):
+        self.local.delete(key)
@@ -0,0 +1,96 @@
+from typing import Any, Awaitable, Callable, Hashable
+
+import redis
+
+from src.conf.config import settings
+from src.services.cache import MemoryCache, RedisCache
+from src.services.contacts_version import ContactsVersion, contacts_version
+from src.services.redis_pool import redis_client
+from src.services.single_flight import SingleFlight, jittered
+
+
+class ContactsCache:
+    """
+    Read-through cache of the contacts reads of a user (a contact, the birthdays window).
+    The keys hold the version of the contacts of the user (see ContactsVersion), so every write
+    of the contacts invalidates all the entries of the user at once; the old ones expire by ttl.
+    Without the version (Redis is unavailable) the reads bypass the cache.
+
+    The versions are in Redis in both modes, so the workers see the writes of each other:
+    with the "memory" store only the values are kept in the worker, Redis is still required.
+
+    Concurrent misses of a key are loaded once in the worker, the entries expire with jitter.
+    """
+
+    def __init__(self, store, versions: ContactsVersion, ttl: float, prefix: str = "contacts_cache:"):
+        self.store = store
+        self.versions = versions
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.flight = SingleFlight()
+
+    def key(self, user_id: int, version: str, parts: tuple[Hashable, ...]) -> str:
+        return f"{self.prefix}{user_id}:{version}:" + ":".join(str(part) for part in parts)
+
+    async def get_or_load(
+        self, user_id: int, parts: tuple[Hashable, ...], loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        The cached value, or the value of the loader, which is cached.
+
+        :param user_id: The ID of the owner of the contacts.
+        :type user_id: int
+        :param parts: What is read, e.g. ("contact", 1) or ("birthdays", date, days).
+        :type parts: tuple[Hashable, ...]
+        :param loader: Reads the value from the database, a JSON serializable value.
+        :type loader: Callable[[], Awaitable[Any]]
+        :return: The value.
+        :rtype: Any
+        """
+        version = await self.versions.get(user_id)
+        if version is None:
+            self.bypassed += 1
+            return await loader()
+        key = self.key(user_id, version, parts)
+        try:
+            value = await self.store.get(key)
+        except redis.RedisError:
+            value = None
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return await self.flight.do(key, lambda: self.load(key, loader))
+
+    async def load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        try:
+            await self.store.set(key, value, jittered(self.ttl))
+        except redis.RedisError:
+            pass
+        return value
+
+    def stats(self) -> dict:
+        """
+        Hits and misses of the cache in the current worker.
+        no param
+        """
+        lookups = self.hits + self.misses
+        return {
+            "store": type(self.store).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+if settings.contacts_cache == "memory":
+    contacts_store = MemoryCache(maxsize=settings.contacts_cache_local_maxsize, ttl=settings.contacts_cache_ttl)
+else:
+    contacts_store = RedisCache(redis_client, ttl=settings.contacts_cache_ttl)
+
+contacts_cache = ContactsCache(contacts_store, contacts_version, ttl=settings.contacts_cache_ttl)
@@ -0,0 +1,180 @@
+import csv
+import io
+import json
+from typing import IO, Any, Iterator
+
+from pydantic import ValidationError
+
+from src.database.models import Contact
+from src.schemas.contacts import ContactModel
+
+CONTACT_FIELDS = list(ContactModel.model_fields)
+EXPORT_FIELDS = ["id", *CONTACT_FIELDS]
+# the defaults are validated too, so every imported contact can be read back as ContactResponse
+CONTACT_DEFAULTS = {name: field.default for name, field in ContactModel.model_fields.items()}
+# optional in ContactModel, but NOT NULL in the table
+REQUIRED_FIELDS = [
+    column.name for column in Contact.__table__.columns if not column.nullable and column.name in CONTACT_FIELDS
+]
+
+
+def missing_fields(contact: dict) -> list[str]:
+    """
+    Errors for the fields which are optional in ContactModel, but NOT NULL in the table.
+
+    :param contact: The contact (ContactModel.model_dump() dict) or the fields to update.
+    :type contact: dict
+    :return: The errors, empty if the contact can be written.
+    :rtype: list[str]
+    """
+    return [f"{field}: Field required" for field in REQUIRED_FIELDS if field in contact and contact[field] is None]
+
+
+def detect_format(filename: str | None) -> str | None:
+    """
+    The import format by the file extension.
+
+    :param filename: The name of the uploaded file.
+    :type filename: str | None
+    :return: "csv", "jsonl" or None if unknown.
+    :rtype: str | None
+    """
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return None
+
+
+def dump_header(format_: str) -> str:
+    """
+    The beginning of the export file: the header line of CSV, nothing for JSONL.
+
+    :param format_: "csv" or "jsonl".
+    :type format_: str
+    :return: The text.
+    :rtype: str
+    """
+    if format_ != "csv":
+        return ""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+
+def dump_contacts(contacts: list, format_: str) -> str:
+    """
+    A chunk of the export file. The files can be imported back (the id column is ignored by the import).
+
+    :param contacts: The contacts.
+    :type contacts: list[Contact]
+    :param format_: "csv" or "jsonl".
+    :type format_: str
+    :return: The text.
+    :rtype: str
+    """
+    rows = ([getattr(contact, field) for field in EXPORT_FIELDS] for contact in contacts)
+    if format_ == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            ["" if value is None else value for value in row] for row in rows
+        )
+        return buffer.getvalue()
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False, default=str) + "\n" for row in rows
+    )
+
+
+def read_lines(lines: Iterator) -> Iterator[tuple[int, Any, str | None]]:
+    """
+    Number the lines (rows) of the file. A file which is not UTF-8 or not a CSV can not be read
+    any further, the error is reported for the row it is found at and the rest of the file is skipped.
+
+    :param lines: The lines of the text file or the rows of the CSV reader.
+    :type lines: Iterator
+    :return: Triples (row number, line, read error).
+    :rtype: Iterator[tuple[int, Any, str | None]]
+    """
+    num = 0
+    while True:
+        num += 1
+        try:
+            line = next(lines)
+        except StopIteration:
+            return
+        except (UnicodeDecodeError, csv.Error) as err:
+            yield num, None, f"Invalid file: {err}, the rest of the file is skipped"
+            return
+        yield num, line, None
+
+
+def iter_rows(file: IO[bytes], format_: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """
+    Read the rows of the file one by one.
+
+    :param file: The binary file.
+    :type file: IO[bytes]
+    :param format_: "csv" (with a header line) or "jsonl" (one JSON object per line).
+    :type format_: str
+    :return: Triples (row number, data, parse error).
+    :rtype: Iterator[tuple[int, dict | None, str | None]]
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if format_ == "csv":
+        for num, row, error in read_lines(csv.DictReader(text)):
+            if error is not None:
+                yield num, None, error
+                continue
+            # empty cells take the defaults of ContactModel
+            yield num, {key: value for key, value in row.items() if key and value not in ("", None)}, None
+        return
+
+    for num, line, error in read_lines(iter(text)):
+        if error is not None:
+            yield num, None, error
+            continue
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as err:
+            yield num, None, f"Invalid JSON: {err}"
+            continue
+        if not isinstance(data, dict):
+            yield num, None, "Invalid JSON: an object is expected"
+            continue
+        yield num, data, None
+
+
+def iter_chunks(file: IO[bytes], format_: str, chunk_size: int) -> Iterator[tuple[list[dict], list[dict]]]:
+    """
+    Read and validate the file by chunks, so only one chunk is kept in memory.
+
+    :param file: The binary file.
+    :type file: IO[bytes]
+    :param format_: "csv" or "jsonl".
+    :type format_: str
+    :param chunk_size: The number of rows in the chunk.
+    :type chunk_size: int
+    :return: Pairs (valid contacts, errors), the errors are {"row": number, "errors": [...]}.
+    :rtype: Iterator[tuple[list[dict], list[dict]]]
+    """
+    contacts, errors = [], []
+    for num, data, error in iter_rows(file, format_):
+        if error is None:
+            try:
+                contact = ContactModel(**{**CONTACT_DEFAULTS, **data}).model_dump()
+            except ValidationError as err:
+                error = [f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in err.errors()]
+            else:
+                error = missing_fields(contact) or None
+                if error is None:
+                    contacts.append(contact)
+        if error is not None:
+            errors.append({"row": num, "errors": error if isinstance(error, list) else [error]})
+        if len(contacts) + len(errors) >= chunk_size:
+            yield contacts, errors
+            contacts, errors = [], []
+    if contacts or errors:
+        yield contacts, errors
@@ -0,0 +1,106 @@
+import uuid
+from typing import Iterable
+
+import redis
+
+from src.conf.config import settings
+from src.services.redis_pool import redis_client
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether the If-None-Match header of the request matches the ETag (weak comparison).
+
+    :param if_none_match: The value of the header.
+    :type if_none_match: str | None
+    :param etag: The current ETag.
+    :type etag: str
+    :return: True if the client has the current representation.
+    :rtype: bool
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class ContactsVersion:
+    """
+    Version of the contacts of each user in Redis, changed by every write of the contacts,
+    so the contacts routes answer conditional GETs without reading the database.
+
+    The version is a random token, not a counter: a key lost in Redis (expired, evicted)
+    gets a new token and never repeats an old ETag. Without Redis there are no ETags.
+    """
+
+    def __init__(self, redis_client, ttl: int, prefix: str = "contacts_version:"):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def key(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}"
+
+    async def get(self, user_id: int) -> str | None:
+        """
+        The current version of the contacts of the user, a new one if there is none:
+        SET NX and GET in one round trip.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :return: The version, None if Redis is unavailable.
+        :rtype: str | None
+        """
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(self.key(user_id), uuid.uuid4().hex, ex=self.ttl, nx=True)
+                pipe.get(self.key(user_id))
+                _, version = await pipe.execute()
+        except redis.RedisError:
+            return None
+        return version.decode() if isinstance(version, bytes) else version
+
+    async def etag(self, user_id: int) -> str | None:
+        """
+        The ETag of the contacts of the user (of the list and of every contact).
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :return: The weak ETag, None if Redis is unavailable.
+        :rtype: str | None
+        """
+        version = await self.get(user_id)
+        return f'W/"{user_id}-{version}"' if version is not None else None
+
+    async def bump(self, user_id: int):
+        """
+        Change the version after the contacts of the user are changed.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        """
+        await self.bump_many([user_id])
+
+    async def bump_many(self, user_ids: Iterable[int]):
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.set(self.key(user_id), uuid.uuid4().hex, ex=self.ttl)
+                await pipe.execute()
+        except redis.RedisError:
+            # the old versions expire by ttl
+            pass
+
+    async def clear(self):
+        """
+        Drop the versions of all the users (after the database is reset).
+        Redis errors are raised, as the ETags of the old contacts would match the new ones.
+        """
+        keys = [key async for key in self.redis.scan_iter(f"{self.prefix}*")]
+        if keys:
+            await self.redis.delete(*keys)
+
+
+contacts_version = ContactsVersion(redis_client, ttl=settings.contacts_version_ttl)
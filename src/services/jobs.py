@@ -0,0 +1,261 @@
+import asyncio
+import json
+import time
+import traceback
+import uuid
+from collections import deque
+from typing import Awaitable, Callable
+
+import redis
+from fastapi import HTTPException, status
+
+from src.conf import messages
+from src.conf.config import settings
+from src.services.redis_pool import redis_client
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# the registered jobs by name, see job
+JOBS: dict[str, Callable[..., Awaitable]] = {}
+# the names of the jobs which fail at the first error
+NOT_RETRIED: set[str] = set()
+
+
+def job(name: str, retry: bool = True):
+    """
+    Register the coroutine function as the job name. It is called with the keyword arguments
+    given to enqueue and progress, a coroutine function(done, total) to report the progress with.
+    The arguments and the result must be JSON serializable.
+
+    :param name: The name of the job.
+    :type name: str
+    :param retry: Whether the job is retried on errors. False for the jobs which commit
+        their work part by part, so a rerun would repeat the committed parts.
+    :type retry: bool
+    """
+
+    def register(func: Callable[..., Awaitable]):
+        JOBS[name] = func
+        if not retry:
+            NOT_RETRIED.add(name)
+        return func
+
+    return register
+
+
+class RedisJobStore:
+    """
+    The jobs in Redis: "<prefix><id>" holds the job as JSON for ttl seconds,
+    the list "<prefix>queue" holds the ids of the queued jobs.
+    """
+
+    def __init__(self, redis_client, ttl: int, prefix: str = "job:"):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def save(self, job_: dict):
+        await self.redis.set(f"{self.prefix}{job_['id']}", json.dumps(job_), ex=self.ttl)
+
+    async def load(self, job_id: str) -> dict | None:
+        raw = await self.redis.get(f"{self.prefix}{job_id}")
+        return json.loads(raw) if raw is not None else None
+
+    async def push(self, job_: dict):
+        """
+        Save the job and queue its id in one round trip (MULTI/EXEC),
+        so a queued id always has its job.
+
+        :param job_: The job.
+        :type job_: dict
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(f"{self.prefix}{job_['id']}", json.dumps(job_), ex=self.ttl)
+            pipe.rpush(f"{self.prefix}queue", job_["id"])
+            await pipe.execute()
+
+    async def pop(self) -> str | None:
+        job_id = await self.redis.lpop(f"{self.prefix}queue")
+        return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+
+class MemoryJobStore:
+    """
+    In-process stand-in for RedisJobStore: the jobs are run by the workers of this process only.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.jobs: dict[str, tuple[float, dict]] = {}
+        self.queue: deque[str] = deque()
+
+    async def save(self, job_: dict):
+        self.jobs[job_["id"]] = (time.monotonic() + self.ttl, dict(job_))
+
+    async def load(self, job_id: str) -> dict | None:
+        entry = self.jobs.get(job_id)
+        if entry is None or entry[0] <= time.monotonic():
+            self.jobs.pop(job_id, None)
+            return None
+        return dict(entry[1])
+
+    async def push(self, job_: dict):
+        await self.save(job_)
+        self.queue.append(job_["id"])
+
+    async def pop(self) -> str | None:
+        return self.queue.popleft() if self.queue else None
+
+
+class JobQueue:
+    """
+    Queue of the jobs run by the workers (see work) of the app or of separate processes
+    (python -m src.services.worker), so long operations do not hold the requests.
+    A failed job is retried up to max_attempts times with exponential backoff
+    (unless it is registered with retry=False).
+    """
+
+    def __init__(self, store, max_attempts: int, retry_delay: float, poll_interval: float):
+        self.store = store
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+
+    async def enqueue(self, name: str, **kwargs) -> dict:
+        """
+        Queue the job.
+
+        :param name: The name of the registered job.
+        :type name: str
+        :param kwargs: The arguments of the job.
+        :raises HTTPException: If the job store is unavailable.
+        :return: The job.
+        :rtype: dict
+        """
+        if name not in JOBS:
+            raise ValueError(f"Unknown job {name}")
+        now = time.time()
+        job_ = {
+            "id": uuid.uuid4().hex,
+            "name": name,
+            "kwargs": kwargs,
+            "status": QUEUED,
+            "attempts": 0,
+            "done": 0,
+            "total": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        try:
+            await self.store.push(job_)
+        except redis.RedisError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=messages.JOB_QUEUE_UNAVAILABLE
+            )
+        return job_
+
+    async def get(self, job_id: str) -> dict | None:
+        """
+        The job by id.
+
+        :param job_id: The id of the job.
+        :type job_id: str
+        :raises HTTPException: If the job store is unavailable.
+        :return: The job or None if there is no such job (or it expired).
+        :rtype: dict | None
+        """
+        try:
+            return await self.store.load(job_id)
+        except redis.RedisError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=messages.JOB_QUEUE_UNAVAILABLE
+            )
+
+    async def update(self, job_: dict, **fields):
+        job_.update(fields, updated_at=time.time())
+        await self.store.save(job_)
+
+    async def persist(self, job_: dict, **fields):
+        """
+        Update the status of the job, retrying every poll_interval while the store is unavailable:
+        the job is popped from the queue, so it would be lost (never run or never reported).
+
+        :param job_: The job.
+        :type job_: dict
+        :param fields: The fields to update.
+        """
+        while True:
+            try:
+                await self.update(job_, **fields)
+                return
+            except redis.RedisError as err:
+                print(f"Job {job_['id']} is not saved, retrying: {err}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def run(self, job_: dict):
+        """
+        Run the job until it succeeds or fails max_attempts times (once if it is not retried).
+
+        :param job_: The job.
+        :type job_: dict
+        """
+        func = JOBS.get(job_["name"])
+        if func is None:
+            await self.persist(job_, status=FAILED, error=f"Unknown job {job_['name']}")
+            return
+
+        async def progress(done: int, total: int | None = None):
+            # the progress is informational, the job goes on without it
+            try:
+                await self.update(job_, done=done, total=total)
+            except redis.RedisError as err:
+                print(f"Progress of job {job_['id']} is not saved: {err}")
+
+        while True:
+            await self.persist(job_, status=RUNNING, attempts=job_["attempts"] + 1, error=None)
+            try:
+                result = await func(progress=progress, **job_["kwargs"])
+            except Exception:
+                error = traceback.format_exc(limit=3)
+                if job_["attempts"] >= self.max_attempts or job_["name"] in NOT_RETRIED:
+                    await self.persist(job_, status=FAILED, error=error)
+                    return
+                await self.persist(job_, status=QUEUED, error=error)
+                await asyncio.sleep(self.retry_delay * 2 ** (job_["attempts"] - 1))
+            else:
+                await self.persist(job_, status=SUCCEEDED, result=result)
+                return
+
+    async def work(self):
+        """
+        Run the queued jobs one by one, runs until cancelled.
+        Store errors are retried after poll_interval.
+        """
+        while True:
+            try:
+                job_id = await self.store.pop()
+                job_ = await self.store.load(job_id) if job_id is not None else None
+                if job_ is None:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self.run(job_)
+            except redis.RedisError:
+                await asyncio.sleep(self.poll_interval)
+
+
+if settings.job_queue == "memory":
+    job_store = MemoryJobStore(settings.job_ttl)
+else:
+    job_store = RedisJobStore(redis_client, settings.job_ttl)
+
+job_queue = JobQueue(
+    job_store,
+    max_attempts=settings.job_max_attempts,
+    retry_delay=settings.job_retry_delay,
+    poll_interval=settings.job_poll_interval,
+)
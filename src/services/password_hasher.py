@@ -0,0 +1,128 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from src.conf import messages
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification in a dedicated bounded thread pool, so a burst of logins
+    does not block the event loop (bcrypt releases the GIL, the threads hash in parallel).
+    At most max_queue calls wait for a free thread, the others are rejected with 503.
+
+    All the hashes are made with the given number of rounds; a hash with other rounds
+    is reported by verify_and_update to be replaced.
+    """
+
+    def __init__(self, rounds: int, max_workers: int, max_queue: int):
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = Lock()
+        self.submitted = 0
+        self.started = 0
+        self.finished = 0
+        # the slots of the finished calls and of the calls cancelled while queued
+        self.released = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Call func(*args) in the pool.
+
+        :param func: The function.
+        :type func: Callable
+        :raises HTTPException: If the queue of the pool is full.
+        :return: The result of the function.
+        :rtype: Any
+        """
+        with self._lock:
+            # running + waiting
+            if self.submitted - self.released >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=messages.PASSWORD_HASHING_BUSY
+                )
+            self.submitted += 1
+        submitted_at = time.perf_counter()
+
+        def job():
+            started_at = time.perf_counter()
+            with self._lock:
+                self.started += 1
+                wait = started_at - submitted_at
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.finished += 1
+                    self.total_run += time.perf_counter() - started_at
+
+        def release(future):
+            # also when the caller is cancelled (a client disconnect) and job never runs
+            with self._lock:
+                self.released += 1
+                if future.cancelled():
+                    self.cancelled += 1
+
+        future = self.executor.submit(job)
+        future.add_done_callback(release)
+        # cancelling the caller cancels the queued job
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self.run(self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """
+        Verify the password and rehash it if the hash was made with other rounds.
+
+        :param password: The plain password.
+        :type password: str
+        :param hashed: The stored hash.
+        :type hashed: str
+        :return: Whether the password matches and the new hash (None if the hash is up to date).
+        :rtype: tuple[bool, str | None]
+        """
+        return await self.run(self.context.verify_and_update, password, hashed)
+
+    def stats(self) -> dict:
+        """
+        Queueing metrics of the pool of the current worker.
+        no param
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self.started - self.finished,
+                "queued": self.submitted - self.started - self.cancelled,
+                "completed": self.finished,
+                "cancelled": self.cancelled,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / self.started * 1000, 3) if self.started else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "avg_run_ms": round(self.total_run / self.finished * 1000, 3) if self.finished else 0.0,
+            }
@@ -0,0 +1,385 @@
+import asyncio
+import time
+from collections import OrderedDict
+from math import ceil
+from typing import Callable, NamedTuple
+
+import redis
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from src.conf import messages
+from src.conf.config import settings
+from src.database.db import pool_occupancy
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.redis_pool import redis_client
+
+# fixed window counter in one round trip: adds the cost unless it exceeds the limit,
+# returns {the count, milliseconds until the window ends, 1 if rejected}
+HIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local cost = tonumber(ARGV[3])
+local ttl = redis.call('PTTL', KEYS[1])
+if current + cost > tonumber(ARGV[1]) then
+    if ttl < 0 then
+        ttl = tonumber(ARGV[2])
+    end
+    return {current, ttl, 1}
+end
+current = redis.call('INCRBY', KEYS[1], cost)
+if ttl < 0 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    ttl = tonumber(ARGV[2])
+end
+return {current, ttl, 0}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    """
+    The state of a limit after a request: the limit, the units left,
+    milliseconds until all the units are back, milliseconds to wait (0 - the request is allowed).
+    """
+
+    limit: int
+    remaining: int
+    reset: int
+    retry: int
+
+
+class MemoryRateLimitBackend:
+    """
+    Token buckets in the worker: a bucket holds up to times tokens and gets them back
+    at times per window, every request takes its cost. No network, but each worker counts on its own.
+    The least recently used buckets above maxsize are dropped (they are full again anyway).
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def hit(self, key: str, times: int, milliseconds: int, cost: int = 1) -> RateLimitResult:
+        """
+        Count the request.
+
+        :param key: The key of the limit (client and route).
+        :type key: str
+        :param times: The number of units allowed in the window.
+        :type times: int
+        :param milliseconds: The window.
+        :type milliseconds: int
+        :param cost: The units the request takes.
+        :type cost: int
+        :return: The state of the limit.
+        :rtype: RateLimitResult
+        """
+        if times <= 0:
+            return RateLimitResult(times, 0, milliseconds, milliseconds)
+        now = time.monotonic()
+        rate = times / milliseconds
+        tokens, updated = self.buckets.pop(key, (times, now))
+        tokens = min(times, tokens + (now - updated) * 1000 * rate)
+        if tokens >= cost:
+            tokens -= cost
+            retry = 0
+        else:
+            retry = ceil((cost - tokens) / rate)
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.maxsize:
+            self.buckets.popitem(last=False)
+        return RateLimitResult(times, int(tokens), ceil((times - tokens) / rate), retry)
+
+
+class RedisRateLimitBackend:
+    """
+    Fixed window counters in Redis (HIT_SCRIPT), exact across the workers, one round trip per request.
+    """
+
+    def __init__(self, redis_client, prefix: str = "rate_limit:"):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.hit_script = redis_client.register_script(HIT_SCRIPT)
+
+    async def hit(self, key: str, times: int, milliseconds: int, cost: int = 1) -> RateLimitResult:
+        current, ttl, rejected = await self.hit_script(
+            keys=[f"{self.prefix}{key}"], args=[times, milliseconds, cost]
+        )
+        ttl = int(ttl)
+        return RateLimitResult(times, max(times - int(current), 0), ttl, ttl if int(rejected) else 0)
+
+
+class WindowCounter:
+    """
+    The units taken from a key in a window: synced - counted in Redis by all the workers
+    at the last sync, pending - counted here since.
+    """
+
+    __slots__ = ("milliseconds", "synced", "pending")
+
+    def __init__(self, milliseconds: int):
+        self.milliseconds = milliseconds
+        self.synced = 0
+        self.pending = 0
+
+
+class HybridRateLimitBackend:
+    """
+    Fixed window counters in the worker, reconciled with Redis in the background: the pending
+    counts of the touched windows are added to Redis in one pipeline every sync_interval seconds,
+    or as soon as a window has sync_batch pending units, and the totals of all the workers
+    are read back. A request never waits for Redis; the workers together may exceed a limit
+    by the units they counted between two syncs.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        sync_interval: float,
+        sync_batch: int,
+        maxsize: int,
+        prefix: str = "rate_limit:",
+    ):
+        self.redis = redis_client
+        self.sync_interval = sync_interval
+        self.sync_batch = sync_batch
+        self.maxsize = maxsize
+        self.prefix = prefix
+        self.counters: OrderedDict[tuple[str, int], WindowCounter] = OrderedDict()
+        self.dirty: set[tuple[str, int]] = set()
+        self.synced_at = time.monotonic()
+        self.sync_task: asyncio.Task | None = None
+
+    async def hit(self, key: str, times: int, milliseconds: int, cost: int = 1) -> RateLimitResult:
+        now = int(time.time() * 1000)
+        # the windows are aligned to the wall clock, so all the workers count the same window
+        window = now // milliseconds
+        counter = self.counters.get((key, window))
+        if counter is None:
+            counter = self.counters[(key, window)] = WindowCounter(milliseconds)
+            if len(self.counters) > self.maxsize:
+                self.counters.popitem(last=False)
+        reset = max((window + 1) * milliseconds - now, 1)
+        used = counter.synced + counter.pending
+        if used + cost > times:
+            return RateLimitResult(times, max(times - used, 0), reset, reset)
+        counter.pending += cost
+        self.dirty.add((key, window))
+        if counter.pending >= self.sync_batch or time.monotonic() - self.synced_at >= self.sync_interval:
+            self.schedule_sync()
+        return RateLimitResult(times, times - used - cost, reset, 0)
+
+    def schedule_sync(self):
+        if self.sync_task is None or self.sync_task.done():
+            self.synced_at = time.monotonic()
+            self.sync_task = asyncio.create_task(self.sync())
+
+    async def sync(self):
+        """
+        Add the pending counts to Redis and read back the totals of all the workers.
+        On a Redis error the counts stay pending until the next sync.
+        """
+        batch = []
+        for key, window in self.dirty:
+            counter = self.counters.get((key, window))
+            if counter is not None:
+                batch.append((key, window, counter, counter.pending))
+                counter.synced += counter.pending
+                counter.pending = 0
+        self.dirty = set()
+        if not batch:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, window, counter, count in batch:
+                    redis_key = f"{self.prefix}{key}:{window}"
+                    pipe.incrby(redis_key, count)
+                    pipe.pexpire(redis_key, counter.milliseconds * 2)
+                results = await pipe.execute()
+        except redis.RedisError:
+            for key, window, counter, count in batch:
+                counter.synced -= count
+                counter.pending += count
+                self.dirty.add((key, window))
+            return
+        for (_, _, counter, _), total in zip(batch, results[::2]):
+            counter.synced = max(counter.synced, int(total))
+        self.drop_expired()
+
+    def drop_expired(self):
+        now = int(time.time() * 1000)
+        for (key, window), counter in list(self.counters.items()):
+            if (window + 1) * counter.milliseconds <= now and (key, window) not in self.dirty:
+                del self.counters[(key, window)]
+
+
+rate_limit_backends = {
+    "memory": MemoryRateLimitBackend(maxsize=settings.rate_limit_local_maxsize),
+    "redis": RedisRateLimitBackend(redis_client),
+    "hybrid": HybridRateLimitBackend(
+        redis_client,
+        sync_interval=settings.rate_limit_sync_interval,
+        sync_batch=settings.rate_limit_sync_batch,
+        maxsize=settings.rate_limit_local_maxsize,
+    ),
+}
+
+
+def client_ip(request: Request) -> str:
+    """
+    The address of the client, the first one of X-Forwarded-For behind a proxy.
+
+    :param request: The request.
+    :type request: Request
+    :return: The address.
+    :rtype: str
+    """
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def query_int(request: Request, name: str, default: int) -> int:
+    """
+    The integer query parameter of the request for a cost function (not validated yet).
+
+    :param request: The request.
+    :type request: Request
+    :param name: The name of the parameter.
+    :type name: str
+    :param default: The value if the parameter is missing or invalid.
+    :type default: int
+    :return: The value.
+    :rtype: int
+    """
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        return default
+
+
+def load_factor() -> int:
+    """
+    The multiplier of the costs: 2 while the database pool is busy
+    (settings.rate_limit_busy_occupancy of its connections are in use), else 1.
+    no param
+    """
+    return 2 if pool_occupancy() >= settings.rate_limit_busy_occupancy else 1
+
+
+def rate_limit_headers(limits: list[tuple[RateLimitResult, int]]) -> dict:
+    """
+    The RateLimit-* headers (draft-ietf-httpapi-ratelimit-headers) of the limits of the request:
+    the state of the one closest to exhaustion and the policies of all of them.
+
+    :param limits: The states of the limits and their windows in seconds.
+    :type limits: list[tuple[RateLimitResult, int]]
+    :return: The headers.
+    :rtype: dict
+    """
+    result, _ = min(limits, key=lambda limit: (limit[0].remaining, -limit[0].reset))
+    return {
+        "RateLimit-Limit": str(result.limit),
+        "RateLimit-Remaining": str(result.remaining),
+        "RateLimit-Reset": str(ceil(result.reset / 1000)),
+        "RateLimit-Policy": ", ".join(f"{limit.limit};w={window}" for limit, window in limits),
+    }
+
+
+class RateLimiter:
+    """
+    The dependency limiting the requests of a client to a route: times units per window.
+    A request takes cost(request) units (1 by default), twice as many while the database is busy
+    (see load_factor), but no more than times. The backend is "memory", "redis" or "hybrid"
+    (see rate_limit_backends), settings.rate_limit_backend by default.
+    If Redis is unavailable the requests are allowed.
+    """
+
+    def __init__(
+        self,
+        times: int = 1,
+        milliseconds: int = 0,
+        seconds: int = 0,
+        minutes: int = 0,
+        hours: int = 0,
+        cost: Callable[[Request], int] | None = None,
+        backend: str | None = None,
+    ):
+        if backend is not None and backend not in rate_limit_backends:
+            raise ValueError(f"Unknown rate limit backend {backend}")
+        self.times = times
+        self.milliseconds = milliseconds + 1000 * seconds + 60000 * minutes + 3600000 * hours
+        self.cost = cost
+        self.backend = backend
+
+    def key(self, request: Request) -> str:
+        route = request.scope.get("route")
+        path = route.path if route is not None else request.url.path
+        return f"{client_ip(request)}:{request.method}:{path}"
+
+    def request_cost(self, request: Request) -> int:
+        cost = self.cost(request) if self.cost is not None else 1
+        return max(1, min(cost * load_factor(), self.times))
+
+    async def check(self, request: Request, response: Response, key: str):
+        """
+        Take the cost of the request from the limit, set the RateLimit-* headers.
+
+        :param request: The request.
+        :type request: Request
+        :param response: The response.
+        :type response: Response
+        :param key: The key of the limit.
+        :type key: str
+        :raises HTTPException: 429 if the limit is exceeded.
+        """
+        backend = rate_limit_backends[self.backend or settings.rate_limit_backend]
+        try:
+            result = await backend.hit(key, self.times, self.milliseconds, self.request_cost(request))
+        except redis.RedisError:
+            # fail open: the limits are not checked while Redis is unavailable
+            return
+        # all the limits of the request, for the headers
+        if not hasattr(request.state, "rate_limits"):
+            request.state.rate_limits = []
+        request.state.rate_limits.append((result, ceil(self.milliseconds / 1000)))
+        headers = rate_limit_headers(request.state.rate_limits)
+        if result.retry:
+            headers["Retry-After"] = str(ceil(result.retry / 1000))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=messages.TOO_MANY_REQUESTS,
+                headers=headers,
+            )
+        response.headers.update(headers)
+
+    async def __call__(self, request: Request, response: Response):
+        await self.check(request, response, self.key(request))
+
+
+class UserQuota(RateLimiter):
+    """
+    The daily quota of the authenticated user in cost units, shared by all the routes with it
+    (settings.user_daily_quota units a day by default).
+    """
+
+    def __init__(
+        self,
+        times: int | None = None,
+        cost: Callable[[Request], int] | None = None,
+        backend: str | None = None,
+    ):
+        super().__init__(
+            times=settings.user_daily_quota if times is None else times,
+            hours=24,
+            cost=cost,
+            backend=backend or settings.user_quota_backend,
+        )
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        user: User = Depends(auth_service.get_current_user),
+    ):
+        await self.check(request, response, f"quota:{user.id}")
@@ -0,0 +1,134 @@
+import time
+
+import redis
+import redis.asyncio as aioredis
+
+from src.conf.config import settings
+
+
+class MonitoredRedisPool(aioredis.ConnectionPool):
+    """
+    ConnectionPool which measures how long every checkout takes (mostly the connects).
+    When all max_connections are in use, a command fails at once ("Too many connections").
+
+    A circuit breaker: after a failed connect the commands fail at once for breaker_cooldown
+    seconds, then one command tries to connect again (the others keep failing meanwhile).
+    So while Redis is down the callers fall back (bypass the caches, fail open) without
+    waiting for a connect each time.
+    """
+
+    def __init__(self, *args, breaker_cooldown: float = 5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker_cooldown = breaker_cooldown
+        # time.monotonic() until which the breaker is open, 0 - closed
+        self.open_until = 0.0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.checkouts = 0
+        self.rejected = 0
+        self.failed = 0
+        self.short_circuited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_in_use = 0
+
+    async def get_connection(self, *args, **kwargs):
+        now = time.monotonic()
+        if now < self.open_until:
+            self.short_circuited += 1
+            raise redis.ConnectionError("Redis is unavailable (circuit breaker is open)")
+        if self.open_until:
+            # half-open: this command tries to connect, the others fail at once meanwhile
+            self.open_until = now + self.breaker_cooldown
+        if not self._available_connections and len(self._in_use_connections) >= self.max_connections:
+            self.rejected += 1
+            raise redis.ConnectionError("Too many connections")
+        start = time.perf_counter()
+        try:
+            # the pool releases the connection if the connect fails
+            connection = await super().get_connection(*args, **kwargs)
+        except (redis.ConnectionError, redis.TimeoutError):
+            self.failed += 1
+            self.open_until = time.monotonic() + self.breaker_cooldown
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        self.open_until = 0.0
+        self.checkouts += 1
+        self.max_in_use = max(self.max_in_use, len(self._in_use_connections))
+        return connection
+
+    def stats(self) -> dict:
+        """
+        Current pool occupancy together with the accumulated counters.
+        no param
+        :return: The pool statistics.
+        :rtype: dict
+        """
+        in_use = len(self._in_use_connections)
+        available = len(self._available_connections)
+        attempts = self.checkouts + self.failed
+        return {
+            "pool_class": type(self).__name__,
+            "max_connections": self.max_connections,
+            "created": in_use + available,
+            "in_use": in_use,
+            "available": available,
+            "occupancy": round(in_use / self.max_connections, 3),
+            "checkouts": self.checkouts,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "short_circuited": self.short_circuited,
+            "breaker_open": time.monotonic() < self.open_until,
+            "max_in_use": self.max_in_use,
+            "avg_wait_ms": round(self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+def create_pool() -> MonitoredRedisPool:
+    """
+    The Redis connection pool of the worker, configured from settings.redis_*.
+    The connections are opened on demand.
+
+    :return: The pool.
+    :rtype: MonitoredRedisPool
+    """
+    return MonitoredRedisPool(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        password=settings.redis_password or None,
+        db=0,
+        max_connections=settings.redis_max_connections,
+        breaker_cooldown=settings.redis_breaker_cooldown,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_timeout,
+        health_check_interval=30,
+        encoding="utf-8",
+        decode_responses=True,
+    )
+
+
+# the one Redis client of the worker: caches, sessions, jobs, rate limiting, pub/sub
+redis_pool = create_pool()
+redis_client = aioredis.Redis(connection_pool=redis_pool)
+
+
+def get_redis_pool_stats() -> dict:
+    """
+    Statistics of the Redis connection pool of this worker.
+    no param
+    """
+    return redis_pool.stats()
+
+
+async def close_redis():
+    """
+    Close the connections of the pool (at shutdown).
+    no param
+    """
+    await redis_client.aclose()
+    await redis_pool.disconnect()
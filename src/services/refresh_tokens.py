@@ -0,0 +1,130 @@
+import time
+
+from src.conf.config import settings
+from src.services.redis_pool import redis_client
+
+# results of rotate
+ROTATED = 1
+UNKNOWN = 0
+REUSED = -1
+
+# compare-and-swap of the current token id of the session in one round trip;
+# a rotated (old) token id means the token was stolen, the session is revoked
+ROTATE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+if current then
+    redis.call('DEL', KEYS[1])
+    return -1
+end
+return 0
+"""
+
+
+class RedisRefreshTokenStore:
+    """
+    The refresh token sessions in Redis: the key "<prefix><email>:<session id>" holds the id
+    of the only valid refresh token of the session and expires with it.
+    A user may have any number of sessions (devices), each one rotated on its own.
+    """
+
+    def __init__(self, redis_client, prefix: str = "refresh:"):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.rotate_script = redis_client.register_script(ROTATE_SCRIPT)
+
+    def key(self, email: str, session_id: str) -> str:
+        return f"{self.prefix}{email}:{session_id}"
+
+    async def add(self, email: str, session_id: str, token_id: str, ttl: int):
+        """
+        Start the session (or replace the token of an existing one).
+
+        :param email: The email of the user.
+        :type email: str
+        :param session_id: The id of the session.
+        :type session_id: str
+        :param token_id: The id of the refresh token.
+        :type token_id: str
+        :param ttl: The lifetime of the refresh token in seconds.
+        :type ttl: int
+        """
+        await self.redis.setex(self.key(email, session_id), ttl, token_id)
+
+    async def rotate(self, email: str, session_id: str, token_id: str, new_token_id: str, ttl: int) -> int:
+        """
+        Replace the token of the session if token_id is its current one.
+
+        :param email: The email of the user.
+        :type email: str
+        :param session_id: The id of the session.
+        :type session_id: str
+        :param token_id: The id of the presented refresh token.
+        :type token_id: str
+        :param new_token_id: The id of the new refresh token.
+        :type new_token_id: str
+        :param ttl: The lifetime of the new refresh token in seconds.
+        :type ttl: int
+        :return: ROTATED, UNKNOWN (no such session) or REUSED (an old token, the session is revoked).
+        :rtype: int
+        """
+        result = await self.rotate_script(keys=[self.key(email, session_id)], args=[token_id, new_token_id, ttl])
+        return int(result)
+
+    async def revoke(self, email: str, session_id: str):
+        await self.redis.delete(self.key(email, session_id))
+
+    async def clear(self):
+        """
+        Revoke the sessions of all the users (after the database is reset).
+        """
+        keys = [key async for key in self.redis.scan_iter(f"{self.prefix}*")]
+        if keys:
+            await self.redis.delete(*keys)
+
+
+class MemoryRefreshTokenStore:
+    """
+    In-process stand-in for RedisRefreshTokenStore, for a single worker (development, tests).
+    """
+
+    def __init__(self):
+        self.sessions: dict[tuple[str, str], tuple[float, str]] = {}
+
+    def current(self, email: str, session_id: str) -> str | None:
+        entry = self.sessions.get((email, session_id))
+        if entry is None:
+            return None
+        expires_at, token_id = entry
+        if expires_at <= time.monotonic():
+            del self.sessions[(email, session_id)]
+            return None
+        return token_id
+
+    async def add(self, email: str, session_id: str, token_id: str, ttl: int):
+        self.sessions[(email, session_id)] = (time.monotonic() + ttl, token_id)
+
+    async def rotate(self, email: str, session_id: str, token_id: str, new_token_id: str, ttl: int) -> int:
+        current = self.current(email, session_id)
+        if current == token_id:
+            await self.add(email, session_id, new_token_id, ttl)
+            return ROTATED
+        if current is not None:
+            await self.revoke(email, session_id)
+            return REUSED
+        return UNKNOWN
+
+    async def revoke(self, email: str, session_id: str):
+        self.sessions.pop((email, session_id), None)
+
+    async def clear(self):
+        self.sessions.clear()
+
+
+if settings.refresh_token_store == "memory":
+    refresh_token_store = MemoryRefreshTokenStore()
+else:
+    refresh_token_store = RedisRefreshTokenStore(redis_client)
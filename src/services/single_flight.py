@@ -0,0 +1,145 @@
+import asyncio
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Hashable
+
+import redis
+
+from src.conf.config import settings
+
+
+def jittered(ttl: float, jitter: float | None = None) -> float:
+    """
+    The TTL randomly changed by up to +-jitter (a fraction of it), so the entries cached
+    at the same time do not expire at the same time.
+
+    :param ttl: The TTL in seconds.
+    :type ttl: float
+    :param jitter: The fraction of the TTL. Defaults to settings.cache_ttl_jitter.
+    :type jitter: float | None
+    :return: The TTL in seconds.
+    :rtype: float
+    """
+    if jitter is None:
+        jitter = settings.cache_ttl_jitter
+    return ttl * random.uniform(1 - jitter, 1 + jitter)
+
+
+class SingleFlight:
+    """
+    Coalescing of concurrent loads of the same key within the worker:
+    the first caller starts the load, the others wait for its result instead of loading again.
+    """
+
+    def __init__(self):
+        self.tasks: dict[Hashable, asyncio.Task] = {}
+
+    def start(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        The load of the key in progress, or a new one.
+
+        :param key: The key.
+        :type key: Hashable
+        :param loader: Makes the awaitable that loads the value.
+        :type loader: Callable[[], Awaitable[Any]]
+        :return: The task of the load.
+        :rtype: asyncio.Task
+        """
+        task = self.tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self.tasks[key] = task
+            task.add_done_callback(lambda done: self.finish(key, done))
+        return task
+
+    def finish(self, key: Hashable, task: asyncio.Task):
+        if self.tasks.get(key) is task:
+            del self.tasks[key]
+        if not task.cancelled():
+            # retrieved here, so a failed background load is not reported as never retrieved
+            task.exception()
+
+    async def do(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Load the value of the key once for all concurrent callers.
+        A cancelled caller does not cancel the load for the others.
+
+        :param key: The key.
+        :type key: Hashable
+        :param loader: Makes the awaitable that loads the value.
+        :type loader: Callable[[], Awaitable[Any]]
+        :return: The loaded value.
+        :rtype: Any
+        """
+        return await asyncio.shield(self.start(key, loader))
+
+    def spawn(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        """
+        Load the value of the key in the background (stale-while-revalidate), once for all callers.
+
+        :param key: The key.
+        :type key: Hashable
+        :param loader: Makes the awaitable that loads the value.
+        :type loader: Callable[[], Awaitable[Any]]
+        """
+        self.start(key, loader)
+
+
+class RedisLock:
+    """
+    Short lock in Redis, so only one worker loads the key while the others wait for the result.
+    The lock expires by itself after timeout seconds if the worker dies.
+    """
+
+    def __init__(self, redis_client, timeout: float, prefix: str = "lock:"):
+        self.redis = redis_client
+        self.timeout = timeout
+        self.prefix = prefix
+
+    async def acquire(self, key: str) -> str | None:
+        """
+        Try to take the lock without waiting.
+
+        :param key: The key.
+        :type key: str
+        :return: The token of the lock, None if it is taken by another worker.
+            If Redis is unavailable, the lock is considered acquired.
+        :rtype: str | None
+        """
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.redis.set(f"{self.prefix}{key}", token, nx=True, px=int(self.timeout * 1000))
+        except redis.RedisError:
+            return token
+        return token if acquired else None
+
+    async def release(self, key: str, token: str):
+        try:
+            lock_key = f"{self.prefix}{key}"
+            current = await self.redis.get(lock_key)
+            if isinstance(current, bytes):
+                current = current.decode()
+            if current == token:
+                await self.redis.delete(lock_key)
+        except redis.RedisError:
+            pass
+
+    async def wait(self, check: Callable[[], Awaitable[Any]], interval: float = 0.05) -> Any:
+        """
+        Wait until check() returns a value (loaded by the worker holding the lock) or the lock times out.
+
+        :param check: Returns the value or None.
+        :type check: Callable[[], Awaitable[Any]]
+        :param interval: Seconds between the checks.
+        :type interval: float
+        :return: The value or None after the timeout.
+        :rtype: Any
+        """
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            value = await check()
+            if value is not None:
+                return value
+            await asyncio.sleep(interval)
+        return None
@@ -0,0 +1,378 @@
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable
+
+import redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.database.models import User
+from src.services.cache import LRUCache
+from src.services.redis_pool import redis_client
+from src.services.single_flight import RedisLock, SingleFlight, jittered
+
+# everything the authenticated routes read from the current user (UserDb included),
+# updated_at is the version of the entry
+USER_FIELDS = ("id", "email", "username", "avatar", "confirmed", "created_at", "updated_at")
+DATETIME_FIELDS = ("created_at", "updated_at")
+INVALIDATION_CHANNEL = "user_cache:invalidate"
+# the invalidation message of all the users, not a valid email
+ALL_USERS = "*"
+LISTEN_RETRY_DELAY = 5
+# seconds a listener waits for a message, below the socket timeout of the pool
+LISTEN_TIMEOUT = 1.0
+
+# SET EX unless the cached user is newer (the ISO updated_at is compared as a string),
+# so a slow load does not overwrite the user written by a later change
+SET_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    local ok, entry = pcall(cjson.decode, current)
+    if ok and type(entry) == 'table' and type(entry.user) == 'table'
+        and type(entry.user.updated_at) == 'string' and entry.user.updated_at > ARGV[3] then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+
+def user_to_dto(user: User) -> dict:
+    """
+    The compact representation of the user for the cache.
+
+    :param user: The user.
+    :type user: User
+    :return: The user fields.
+    :rtype: dict
+    """
+    data = {field: getattr(user, field) for field in USER_FIELDS}
+    for field in DATETIME_FIELDS:
+        if isinstance(data[field], datetime):
+            data[field] = data[field].isoformat()
+    return data
+
+
+def user_from_dto(data: dict) -> User:
+    """
+    A detached User made from the cached fields.
+
+    :param data: The user fields.
+    :type data: dict
+    :return: The user.
+    :rtype: User
+    """
+    data = dict(data)
+    for field in DATETIME_FIELDS:
+        if data.get(field):
+            data[field] = datetime.fromisoformat(data[field])
+    return User(**data)
+
+
+class UserCache:
+    """
+    Cache of the users by email in two tiers: a short-lived in-process LRU in front of Redis.
+    The users are stored as small JSON documents (see USER_FIELDS), not as pickled ORM objects.
+    Redis errors are treated as a miss, so the users are read from the database.
+
+    When a user is changed, the Redis entry is refreshed or deleted and the email is published
+    to INVALIDATION_CHANNEL, so every worker (see listen) drops its in-process entry.
+    An entry is never replaced by an older version of the user (by updated_at, see SET_SCRIPT).
+
+    A Redis entry is fresh for ttl seconds (with jitter) and is kept stale_ttl seconds more:
+    a stale user is returned at once and reloaded in the background. Concurrent loads of a user
+    are coalesced in the worker and, with lock_timeout, across the workers by a Redis lock.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        ttl: int,
+        local_maxsize: int,
+        local_ttl: float,
+        stale_ttl: int = 0,
+        lock_timeout: float = 0,
+        prefix: str = "user:",
+    ):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.prefix = prefix
+        self.local = LRUCache(local_maxsize, local_ttl)
+        self.flight = SingleFlight()
+        self.lock_timeout = lock_timeout
+        # the worker ignores its own invalidation messages
+        self.worker_id = uuid.uuid4().hex
+        self.set_script = redis_client.register_script(SET_SCRIPT)
+
+    def key(self, email: str) -> str:
+        return f"{self.prefix}{email}"
+
+    async def lookup(self, email: str) -> tuple[dict | None, bool]:
+        """
+        The cached user fields, looked up in process first and in Redis on a local miss.
+
+        :param email: The email of the user.
+        :type email: str
+        :return: The user fields (None on a miss) and whether they are stale.
+        :rtype: tuple[dict | None, bool]
+        """
+        data = self.local.get(email)
+        if data is not None:
+            return data, False
+        try:
+            raw = await self.redis.get(self.key(email))
+            if raw is None:
+                return None, False
+            entry = json.loads(raw)
+            data, fresh_until = entry["user"], entry["fresh_until"]
+        except (redis.RedisError, ValueError, KeyError, TypeError):
+            # Redis is unavailable or the entry is in an old format
+            return None, False
+        self.local.set(email, data, jittered(self.local.ttl))
+        return data, fresh_until < time.time()
+
+    async def get(self, email: str) -> User | None:
+        """
+        The cached user (fresh or stale).
+
+        :param email: The email of the user.
+        :type email: str
+        :return: The user or None on a miss.
+        :rtype: User | None
+        """
+        data, _ = await self.lookup(email)
+        return user_from_dto(data) if data is not None else None
+
+    async def get_or_load(
+        self,
+        email: str,
+        db: AsyncSession,
+        loader: Callable[[str, AsyncSession], Awaitable[User | None]],
+    ) -> User | None:
+        """
+        The cached user, loaded on a miss once for all concurrent requests of the worker.
+        A stale user is returned at once and reloaded in the background with its own session.
+
+        :param email: The email of the user.
+        :type email: str
+        :param db: The database session of the request.
+        :type db: AsyncSession
+        :param loader: Loads the user by email from the database.
+        :type loader: Callable[[str, AsyncSession], Awaitable[User | None]]
+        :return: The user or None if there is no such user.
+        :rtype: User | None
+        """
+        data, stale = await self.lookup(email)
+        if data is None:
+            data = await self.flight.do(email, lambda: self.load(email, db, loader))
+        elif stale:
+            self.flight.spawn(email, lambda: self.reload(email, loader))
+        return user_from_dto(data) if data is not None else None
+
+    async def load(
+        self,
+        email: str,
+        db: AsyncSession,
+        loader: Callable[[str, AsyncSession], Awaitable[User | None]],
+    ) -> dict | None:
+        """
+        Load the user from the database and cache it. With lock_timeout only one worker loads it,
+        the others wait for the Redis entry.
+
+        :param email: The email of the user.
+        :type email: str
+        :param db: The database session.
+        :type db: AsyncSession
+        :param loader: Loads the user by email from the database.
+        :type loader: Callable[[str, AsyncSession], Awaitable[User | None]]
+        :return: The user fields or None if there is no such user.
+        :rtype: dict | None
+        """
+        lock = RedisLock(self.redis, self.lock_timeout) if self.lock_timeout else None
+        token = await lock.acquire(self.key(email)) if lock else None
+        if lock and token is None:
+            data = await lock.wait(lambda: self.lookup_data(email))
+            if data is not None:
+                return data
+        try:
+            user = await loader(email, db)
+            if user is None:
+                return None
+            await self.set(user)
+            return user_to_dto(user)
+        finally:
+            if token is not None:
+                await lock.release(self.key(email), token)
+
+    async def lookup_data(self, email: str) -> dict | None:
+        data, _ = await self.lookup(email)
+        return data
+
+    async def reload(
+        self, email: str, loader: Callable[[str, AsyncSession], Awaitable[User | None]]
+    ) -> dict | None:
+        # the session of the request can not be shared with a background task
+        async with SessionLocal() as db:
+            return await self.load(email, db, loader)
+
+    def entry(self, user: User) -> tuple[dict, list[str], list]:
+        """
+        The in-process and the Redis entries of the user.
+
+        :param user: The user.
+        :type user: User
+        :return: The user fields, the keys and the args of SET_SCRIPT (the value, the ttl in seconds
+            and the version).
+        :rtype: tuple[dict, list[str], list]
+        """
+        data = user_to_dto(user)
+        ttl = jittered(self.ttl)
+        entry = {"user": data, "fresh_until": time.time() + ttl}
+        args = [json.dumps(entry), int(ttl + self.stale_ttl), data["updated_at"] or ""]
+        return data, [self.key(user.email)], args
+
+    def set_local(self, data: dict):
+        """
+        Store the user fields in process, unless a newer version is there.
+
+        :param data: The user fields.
+        :type data: dict
+        """
+        current = self.local.get(data["email"])
+        if current is None or (current.get("updated_at") or "") <= (data["updated_at"] or ""):
+            self.local.set(data["email"], data, jittered(self.local.ttl))
+
+    def message(self, email: str) -> str:
+        return f"{self.worker_id}:{email}"
+
+    async def set(self, user: User):
+        """
+        Store the user in both tiers (one script call in Redis), unless a newer version is cached.
+
+        :param user: The user.
+        :type user: User
+        """
+        data, keys, args = self.entry(user)
+        try:
+            stored = await self.set_script(keys=keys, args=args)
+        except redis.RedisError:
+            stored = True
+        if stored:
+            self.set_local(data)
+
+    async def delete(self, email: str):
+        """
+        Drop the user from both tiers.
+
+        :param email: The email of the user.
+        :type email: str
+        """
+        self.local.delete(email)
+        try:
+            await self.redis.delete(self.key(email))
+        except redis.RedisError:
+            pass
+
+    async def refresh(self, user: User):
+        """
+        Write the changed user through to both tiers and drop it in the other workers,
+        the write and the PUBLISH in one round trip. A load of the old version in progress
+        does not overwrite it (see SET_SCRIPT).
+
+        :param user: The changed user.
+        :type user: User
+        """
+        data, keys, args = self.entry(user)
+        self.set_local(data)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                await self.set_script(keys=keys, args=args, client=pipe)
+                pipe.publish(INVALIDATION_CHANNEL, self.message(user.email))
+                await pipe.execute()
+        except redis.RedisError:
+            pass
+
+    async def invalidate(self, email: str):
+        """
+        Drop the changed user in both tiers and in the other workers,
+        the DEL and the PUBLISH in one round trip.
+
+        :param email: The email of the user.
+        :type email: str
+        """
+        self.local.delete(email)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(self.key(email))
+                pipe.publish(INVALIDATION_CHANNEL, self.message(email))
+                await pipe.execute()
+        except redis.RedisError:
+            pass
+
+    async def clear(self):
+        """
+        Drop all the users in both tiers and in the other workers (after the database is reset).
+        Redis errors are raised, as the users of the old database would be served.
+        """
+        self.local.clear()
+        keys = [key async for key in self.redis.scan_iter(f"{self.prefix}*")]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if keys:
+                pipe.delete(*keys)
+            pipe.publish(INVALIDATION_CHANNEL, self.message(ALL_USERS))
+            await pipe.execute()
+
+    def on_invalidation(self, message: str | bytes):
+        """
+        Handle the message of INVALIDATION_CHANNEL: "<worker id>:<email>" or "<worker id>:*" (all the users).
+
+        :param message: The message.
+        :type message: str | bytes
+        """
+        if isinstance(message, bytes):
+            message = message.decode()
+        worker_id, _, email = message.partition(":")
+        if worker_id == self.worker_id:
+            return
+        if email == ALL_USERS:
+            self.local.clear()
+        else:
+            self.local.delete(email)
+
+    async def listen(self, redis_client):
+        """
+        Drop the in-process entries invalidated by other workers, runs until cancelled.
+        After a lost connection the in-process tier is cleared, as messages may have been missed.
+        The messages are polled with LISTEN_TIMEOUT, so an idle channel does not hit
+        the socket timeout of the pool.
+
+        :param redis_client: The asyncio Redis client.
+        :type redis_client: redis.asyncio.Redis
+        """
+        while True:
+            try:
+                async with redis_client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    while True:
+                        message = await pubsub.get_message(timeout=LISTEN_TIMEOUT)
+                        if message is not None and message["type"] == "message":
+                            self.on_invalidation(message["data"])
+            except (redis.RedisError, OSError):
+                self.local.clear()
+                await asyncio.sleep(LISTEN_RETRY_DELAY)
+
+
+user_cache = UserCache(
+    redis_client,
+    ttl=settings.user_cache_ttl,
+    local_maxsize=settings.user_cache_local_maxsize,
+    local_ttl=settings.user_cache_local_ttl,
+    stale_ttl=settings.user_cache_stale_ttl,
+    lock_timeout=settings.cache_lock_timeout if settings.cache_lock_enabled else 0,
+)
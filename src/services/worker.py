@@ -0,0 +1,65 @@
+import asyncio
+from typing import Callable
+
+from src.conf.config import settings
+from src.database.db import reset_db
+from src.seed.contacts import seed_contacts
+from src.seed.users import seed_users
+from src.services.birthday_index import birthday_index
+from src.services.contacts_version import contacts_version
+from src.services.email import send_email
+from src.services.jobs import job, job_queue
+from src.services.refresh_tokens import refresh_token_store
+from src.services.user_cache import user_cache
+
+
+@job("send_email")
+async def send_email_job(progress: Callable, email: str, username: str, host: str):
+    await send_email(email, username, host)
+
+
+# the seed jobs commit every chunk, a rerun would insert them again
+@job("seed_users", retry=False)
+async def seed_users_job(progress: Callable, count: int) -> int:
+    return await seed_users(count, workers=settings.seed_workers, progress=progress)
+
+
+@job("seed_contacts", retry=False)
+async def seed_contacts_job(progress: Callable, count: int, seed: int | None = None) -> int:
+    return await seed_contacts(count, seed=seed, workers=settings.seed_workers, progress=progress)
+
+
+@job("reset_db", retry=False)
+async def reset_db_job(progress: Callable):
+    await reset_db()
+    # the new users get the IDs and the emails of the old ones: drop everything kept by user
+    await contacts_version.clear()
+    await user_cache.clear()
+    await refresh_token_store.clear()
+    # the other workers drop their entries after birthday_index_ttl
+    birthday_index.clear()
+
+
+def start_workers(count: int) -> list[asyncio.Task]:
+    """
+    Start count workers of the job queue in the running event loop.
+
+    :param count: The number of workers.
+    :type count: int
+    :return: The tasks of the workers, cancel them to stop.
+    :rtype: list[asyncio.Task]
+    """
+    return [asyncio.create_task(job_queue.work()) for _ in range(count)]
+
+
+async def run_workers(count: int):
+    await asyncio.gather(*start_workers(count))
+
+
+def main():
+    # a worker process without the app: settings.job_workers of the app may be 0
+    asyncio.run(run_workers(max(settings.job_workers, 1)))
+
+
+if __name__ == "__main__":
+    main()
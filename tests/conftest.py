@@ -1,11 +1,16 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from main import app
 from src.database.models import Base
 from src.database.db import get_db
+from src.services.auth import auth_service
+from src.services.refresh_tokens import MemoryRefreshTokenStore
+from src.services.jobs import MemoryJobStore, job_queue
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
@@ -15,6 +20,15 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# the app itself works through the async driver on the same database file
+async_engine = create_async_engine(
+    "sqlite+aiosqlite:///./test.db",
+    poolclass=NullPool,
+)
+AsyncTestingSessionLocal = async_sessionmaker(
+    expire_on_commit=False, autocommit=False, autoflush=False, bind=async_engine
+)
+
 
 @pytest.fixture(scope="module")
 def session():
@@ -34,13 +48,17 @@ def session():
 def client(session):
     # Dependency override
 
-    def override_get_db():
+    async def override_get_db():
+        db = AsyncTestingSessionLocal()
         try:
-            yield session
+            yield db
         finally:
-            session.close()
+            await db.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    # no Redis in the tests
+    auth_service.refresh_tokens = MemoryRefreshTokenStore()
+    job_queue.store = MemoryJobStore(ttl=3600)
 
     yield TestClient(app)
 
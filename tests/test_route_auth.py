@@ -1,16 +1,18 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 from src.database.models import User
 
 
 def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+    mock_enqueue = AsyncMock()
+    monkeypatch.setattr("src.routes.auth.job_queue.enqueue", mock_enqueue)
     response = client.post("/api/auth/signup", json=user)
     assert response.status_code == 201, response.text
     data = response.json()
     assert data["user"]["email"] == user.get("email")
     assert "id" in data["user"]
+    assert mock_enqueue.call_args.args == ("send_email",)
+    assert mock_enqueue.call_args.kwargs["email"] == user.get("email")
 
 
 def test_repeat_create_user(client, user):
@@ -48,6 +50,29 @@ def test_login_user(client, session, user):
     assert data["token_type"] == "bearer"
 
 
+def test_refresh_token(client, user):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get("email"), "password": user.get("password")},
+    )
+    refresh_token = response.json()["refresh_token"]
+    response = client.get(
+        "/api/auth/refresh_token", headers={"Authorization": f"Bearer {refresh_token}"}
+    )
+    assert response.status_code == 200, response.text
+    new_refresh_token = response.json()["refresh_token"]
+    assert new_refresh_token != refresh_token
+    # the rotated token is reused: the session is revoked
+    response = client.get(
+        "/api/auth/refresh_token", headers={"Authorization": f"Bearer {refresh_token}"}
+    )
+    assert response.status_code == 401, response.text
+    response = client.get(
+        "/api/auth/refresh_token", headers={"Authorization": f"Bearer {new_refresh_token}"}
+    )
+    assert response.status_code == 401, response.text
+
+
 def test_login_wrong_password(client, user):
     response = client.post(
         "/api/auth/login",
@@ -66,3 +91,19 @@ def test_login_wrong_email(client, user):
     assert response.status_code == 401, response.text
     data = response.json()
     assert data["detail"] == "Invalid email"
+
+
+def test_token_cache_stats(client):
+    response = client.get("/api/auth/token_cache_stats")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    for key in ("size", "hits", "misses", "hit_rate"):
+        assert key in data
+
+
+def test_hashing_stats(client):
+    response = client.get("/api/auth/hashing_stats")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    for key in ("active", "queued", "rejected", "avg_wait_ms"):
+        assert key in data
@@ -0,0 +1,3 @@
+def test_cache_stats_unauthorized(client):
+    response = client.get("/api/contacts/cache_stats")
+    assert response.status_code == 401, response.text
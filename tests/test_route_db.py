@@ -0,0 +1,22 @@
+def test_healthchecker(client):
+    response = client.get("/api/database/healthchecker")
+    assert response.status_code == 200, response.text
+    assert response.json()["message"] == "Congratulations! Database is really healthy"
+
+
+def test_pool_stats(client):
+    response = client.get("/api/database/pool_stats")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["pool_class"] == "MonitoredQueuePool"
+    for key in ("pool_size", "checked_out", "overflow", "checkouts", "avg_wait_ms", "timeouts"):
+        assert key in data
+
+
+def test_redis_pool_stats(client):
+    response = client.get("/api/database/redis_pool_stats")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["max_connections"] > 0
+    for key in ("created", "in_use", "available"):
+        assert key in data
@@ -0,0 +1,13 @@
+def test_seed_job(client):
+    response = client.post("/seed/contacts", params={"number_contacts": 100, "seed": 42})
+    assert response.status_code == 202, response.text
+    job = response.json()
+    assert (job["name"], job["status"]) == ("seed_contacts", "queued")
+    response = client.get(f"/api/jobs/{job['id']}")
+    assert response.status_code == 200, response.text
+    assert response.json()["id"] == job["id"]
+
+
+def test_job_not_found(client):
+    response = client.get("/api/jobs/unknown")
+    assert response.status_code == 404, response.text
@@ -0,0 +1,88 @@
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+from fastapi import HTTPException
+from jose import jwt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.auth import Auth
+from src.services.cache import LRUCache
+from src.services.refresh_tokens import MemoryRefreshTokenStore
+
+
+class TestAccessTokenCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.auth = Auth()
+        self.auth.token_cache = LRUCache(maxsize=10, ttl=0)
+
+    async def test_verified_once(self):
+        token = await self.auth.create_access_token({"sub": "test@user.com"})
+        with patch("src.services.auth.jwt.decode", wraps=jwt.decode) as decode:
+            for _ in range(3):
+                self.assertEqual(self.auth.decode_access_token(token)["sub"], "test@user.com")
+        decode.assert_called_once()
+        self.assertEqual(self.auth.token_cache.stats()["hits"], 2)
+
+    async def test_refresh_token_rejected(self):
+        token = await self.auth.create_refresh_token({"sub": "test@user.com"})
+        self.assertIsNone(self.auth.decode_access_token(token))
+        self.assertEqual(self.auth.token_cache.stats()["size"], 0)
+
+    async def test_invalid_token(self):
+        token = await self.auth.create_access_token({"sub": "test@user.com"})
+        self.assertIsNone(self.auth.decode_access_token(token[:-2]))
+        self.assertIsNone(self.auth.decode_access_token("not a token"))
+
+    async def test_cached_until_exp(self):
+        token = await self.auth.create_access_token({"sub": "test@user.com"}, expires_delta=60)
+        self.auth.decode_access_token(token)
+        (expires_at, _), = self.auth.token_cache.entries.values()
+        self.assertAlmostEqual(expires_at - time.monotonic(), 60, delta=2)
+
+    def test_expired_token(self):
+        payload = {
+            "sub": "test@user.com",
+            "scope": "access_token",
+            "exp": datetime.utcnow() - timedelta(seconds=1),
+        }
+        token = jwt.encode(payload, self.auth.SECRET_KEY, algorithm=self.auth.ALGORITHM)
+        self.assertIsNone(self.auth.decode_access_token(token))
+
+
+class TestSessionTokens(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.auth = Auth()
+        self.auth.refresh_tokens = MemoryRefreshTokenStore()
+
+    async def test_sessions_rotated_separately(self):
+        phone = await self.auth.create_session_tokens("test@user.com", "phone")
+        laptop = await self.auth.create_session_tokens("test@user.com", "laptop")
+        rotated = await self.auth.rotate_session_tokens(phone["refresh_token"])
+        self.assertEqual(self.auth.refresh_token_claims(rotated["refresh_token"])["sid"], "phone")
+        await self.auth.rotate_session_tokens(laptop["refresh_token"])
+
+    async def test_token_without_session(self):
+        token = await self.auth.create_refresh_token({"sub": "test@user.com"})
+        with self.assertRaises(HTTPException) as error:
+            await self.auth.rotate_session_tokens(token)
+        self.assertEqual(error.exception.status_code, 401)
+
+    async def test_store_unavailable(self):
+        self.auth.refresh_tokens = AsyncMock()
+        self.auth.refresh_tokens.add.side_effect = redis.ConnectionError()
+        with self.assertRaises(HTTPException) as error:
+            await self.auth.create_session_tokens("test@user.com")
+        self.assertEqual(error.exception.status_code, 503)
+
+
+if __name__ == "__main__":
+    unittest.main()
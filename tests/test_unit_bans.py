@@ -0,0 +1,158 @@
+import sys
+import os
+import json
+import tempfile
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.bans import (
+    BanList,
+    BanMiddleware,
+    IPPrefixTree,
+    UserAgentMatcher,
+    read_ban_file,
+    read_ban_redis,
+)
+
+
+class TestIPPrefixTree(unittest.TestCase):
+
+    def test_networks(self):
+        tree = IPPrefixTree(["10.0.0.0/8", "192.168.1.7", "2001:db8::/32"])
+        self.assertIn("10.20.30.40", tree)
+        self.assertIn("192.168.1.7", tree)
+        self.assertIn("2001:db8::1", tree)
+        self.assertNotIn("11.0.0.1", tree)
+        self.assertNotIn("192.168.1.8", tree)
+        self.assertNotIn("2001:db9::1", tree)
+        # not an address, e.g. the host of the test client
+        self.assertNotIn("testclient", tree)
+
+    def test_all(self):
+        self.assertIn("8.8.8.8", IPPrefixTree(["0.0.0.0/0"]))
+        self.assertNotIn("::1", IPPrefixTree(["0.0.0.0/0"]))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            IPPrefixTree(["10.0.0.0/33"])
+
+
+class TestUserAgentMatcher(unittest.TestCase):
+
+    def test_patterns(self):
+        matcher = UserAgentMatcher([r"Googlebot", r"^curl/", r"[invalid"])
+        self.assertEqual(matcher.size, 2)
+        self.assertTrue(matcher.is_banned("Mozilla/5.0 (compatible; Googlebot/2.1)"))
+        self.assertTrue(matcher.is_banned("curl/8.0"))
+        self.assertFalse(matcher.is_banned("Mozilla/5.0 curl/8.0"))
+        self.assertFalse(matcher.is_banned(""))
+        self.assertFalse(UserAgentMatcher().is_banned("Googlebot"))
+
+    def test_flags(self):
+        # valid each on its own, the global flag is not allowed in the middle of the combined regex
+        matcher = UserAgentMatcher([r"Googlebot", r"(?i)somebot"])
+        self.assertEqual(matcher.size, 2)
+        self.assertTrue(matcher.is_banned("SOMEBOT/1.0"))
+        self.assertFalse(matcher.is_banned("googlebot"))
+
+    def test_combined_invalid(self):
+        # the same group name twice in the combined regex
+        matcher = UserAgentMatcher([r"(?P<name>bot)", r"(?P<name>spider)", r"crawler"])
+        self.assertEqual(matcher.size, 2)
+        self.assertTrue(matcher.is_banned("bot"))
+        self.assertTrue(matcher.is_banned("crawler"))
+        self.assertFalse(matcher.is_banned("spider"))
+
+    def test_cache(self):
+        matcher = UserAgentMatcher([r"bot"], cache_size=2)
+        for _ in range(3):
+            matcher.is_banned("Somebot")
+        info = matcher.is_banned.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 1))
+
+
+class TestBanList(unittest.IsolatedAsyncioTestCase):
+
+    def test_update(self):
+        ban_list = BanList(cache_size=10)
+        self.assertTrue(ban_list.is_banned("0.0.0.1", ""))
+        self.assertTrue(ban_list.update(["^BadAgent"], ["172.16.0.0/12"]))
+        self.assertTrue(ban_list.is_banned("172.16.5.5", ""))
+        self.assertTrue(ban_list.is_banned(None, "BadAgent/1.0"))
+        # the built-in bans stay
+        self.assertTrue(ban_list.is_banned(None, "Python-urllib/3.11"))
+        self.assertFalse(ban_list.update(["^BadAgent"], ["172.16.0.0/12"]))
+        ban_list.update([], [])
+        self.assertFalse(ban_list.is_banned("172.16.5.5", "BadAgent/1.0"))
+
+    def test_update_failed(self):
+        ban_list = BanList(cache_size=10)
+        with patch("src.services.bans.UserAgentMatcher", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                ban_list.update(["^BadAgent"], [])
+        # the same lists are loaded on the next reload
+        self.assertTrue(ban_list.update(["^BadAgent"], []))
+        self.assertTrue(ban_list.is_banned(None, "BadAgent/1.0"))
+
+    async def test_read_ban_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bans.json")
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump({"ips": ["10.0.0.0/8"]}, file)
+            self.assertEqual(await read_ban_file(path), ([], ["10.0.0.0/8"]))
+
+    async def test_read_ban_redis(self):
+        redis_client = MagicMock()
+        pipe = MagicMock()
+        pipe.__aenter__.return_value = pipe
+        pipe.execute = AsyncMock(return_value=[{"bot"}, {"10.0.0.1"}])
+        redis_client.pipeline.return_value = pipe
+        self.assertEqual(await read_ban_redis(redis_client), (["bot"], ["10.0.0.1"]))
+        pipe.smembers.assert_any_call("bans:ips")
+
+
+class TestBanMiddleware(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.app = AsyncMock()
+        self.middleware = BanMiddleware(self.app, BanList(cache_size=10))
+        self.send = AsyncMock()
+
+    def scope(self, host: str, user_agent: bytes | None = None, type_: str = "http") -> dict:
+        headers = [(b"host", b"localhost")]
+        if user_agent is not None:
+            headers.append((b"user-agent", user_agent))
+        return {"type": type_, "client": (host, 5000), "headers": headers, "method": "GET", "path": "/"}
+
+    async def test_allowed(self):
+        # no User-Agent at all
+        scope = self.scope("10.0.0.1")
+        await self.middleware(scope, AsyncMock(), self.send)
+        self.app.assert_awaited_once_with(scope, unittest.mock.ANY, self.send)
+
+    async def test_banned_user_agent(self):
+        await self.middleware(self.scope("10.0.0.1", b"Googlebot/2.1"), AsyncMock(), self.send)
+        self.app.assert_not_awaited()
+        self.assertEqual(self.send.await_args_list[0].args[0]["status"], 403)
+        self.assertEqual(json.loads(self.send.await_args_list[1].args[0]["body"]), {"detail": "You are banned"})
+
+    async def test_banned_ip(self):
+        await self.middleware(self.scope("0.0.0.1", b"Mozilla/5.0"), AsyncMock(), self.send)
+        self.app.assert_not_awaited()
+        self.assertEqual(self.send.await_args_list[0].args[0]["status"], 403)
+
+    async def test_websocket(self):
+        await self.middleware(self.scope("0.0.0.1", type_="websocket"), AsyncMock(), self.send)
+        self.send.assert_awaited_once_with({"type": "websocket.close", "code": 1008})
+
+    async def test_lifespan(self):
+        scope = {"type": "lifespan"}
+        await self.middleware(scope, AsyncMock(), self.send)
+        self.app.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
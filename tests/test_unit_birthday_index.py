@@ -0,0 +1,83 @@
+import sys
+import os
+import asyncio
+from datetime import date
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.birthday_index import BirthdayIndex, UserBirthdays, day_of_year
+
+
+class TestBirthdayIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.birthdays = {
+            1: date(1990, 12, 30),
+            2: date(1985, 1, 2),
+            3: date(2000, 2, 29),
+            4: date(1970, 3, 1),
+            5: date(1999, 6, 15),
+        }
+        self.entry = UserBirthdays(
+            list(self.birthdays), [day_of_year(b) for b in self.birthdays.values()]
+        )
+
+    def test_window(self):
+        self.assertEqual(self.entry.upcoming(date(2025, 6, 10), 7), [5])
+        self.assertEqual(self.entry.upcoming(date(2025, 6, 16), 7), [])
+
+    def test_window_new_year(self):
+        self.assertEqual(self.entry.upcoming(date(2025, 12, 28), 7), [1, 2])
+
+    def test_february_29(self):
+        # non-leap year: celebrated on March 1, together with the contact 4
+        self.assertEqual(self.entry.upcoming(date(2025, 2, 28), 0), [])
+        self.assertEqual(self.entry.upcoming(date(2025, 3, 1), 0), [3, 4])
+        # leap year
+        self.assertEqual(self.entry.upcoming(date(2028, 2, 28), 1), [3])
+
+    def test_whole_year(self):
+        self.assertEqual(self.entry.upcoming(date(2025, 6, 15), 365), [5, 1, 2, 3, 4])
+        # beyond date.max
+        self.assertEqual(self.entry.upcoming(date(2025, 6, 15), 10**9), [5, 1, 2, 3, 4])
+
+    def test_add_remove(self):
+        for contact_id in range(10, 40):
+            self.entry.add(contact_id, day_of_year(date(2001, 6, 16)))
+        self.entry.remove(5)
+        self.assertEqual(self.entry.upcoming(date(2025, 6, 15), 1), list(range(10, 40)))
+
+    def test_ttl(self):
+        index = BirthdayIndex(max_users=10, ttl=60)
+        index.users[1] = self.entry
+        self.assertIs(index.get(1), self.entry)
+        self.entry.loaded_at -= 61
+        self.assertIsNone(index.get(1))
+
+
+
+class TestBirthdayIndexLoad(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_load(self):
+        index = BirthdayIndex(max_users=10, ttl=60)
+        rows = MagicMock()
+        rows.all.return_value = [MagicMock(id=1, birthday=date(1990, 6, 15))]
+
+        async def execute(stmt):
+            await asyncio.sleep(0.01)
+            return rows
+
+        db = AsyncMock()
+        db.execute.side_effect = execute
+        results = await asyncio.gather(
+            *(index.upcoming(1, db, date(2025, 6, 10), 7) for _ in range(5))
+        )
+        self.assertEqual(results, [[1]] * 5)
+        db.execute.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
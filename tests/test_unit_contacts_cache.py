@@ -0,0 +1,90 @@
+import sys
+import os
+import json
+import asyncio
+
+import unittest
+from unittest.mock import AsyncMock
+
+import redis
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.cache import MemoryCache, RedisCache
+from src.services.contacts_cache import ContactsCache
+
+
+class TestContactsCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.versions = AsyncMock()
+        self.versions.get.return_value = "v1"
+        self.cache = ContactsCache(MemoryCache(maxsize=10, ttl=60), self.versions, ttl=60)
+        self.loader = AsyncMock(return_value={"id": 1})
+
+    async def test_read_through(self):
+        for _ in range(3):
+            value = await self.cache.get_or_load(1, ("contact", 1), self.loader)
+            self.assertEqual(value, {"id": 1})
+        self.loader.assert_awaited_once()
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+
+    async def test_invalidated_by_version(self):
+        await self.cache.get_or_load(1, ("contact", 1), self.loader)
+        self.versions.get.return_value = "v2"
+        await self.cache.get_or_load(1, ("contact", 1), self.loader)
+        self.assertEqual(self.loader.await_count, 2)
+
+    async def test_bypassed_without_version(self):
+        self.versions.get.return_value = None
+        await self.cache.get_or_load(1, ("contact", 1), self.loader)
+        await self.cache.get_or_load(1, ("contact", 1), self.loader)
+        self.assertEqual(self.loader.await_count, 2)
+        self.assertEqual(self.cache.stats()["bypassed"], 2)
+
+    async def test_coalesced(self):
+
+        async def slow_loader():
+            await asyncio.sleep(0.01)
+            return {"id": 1}
+
+        loader = AsyncMock(side_effect=slow_loader)
+        values = await asyncio.gather(*(self.cache.get_or_load(1, ("contact", 1), loader) for _ in range(5)))
+        self.assertEqual(values, [{"id": 1}] * 5)
+        loader.assert_awaited_once()
+
+    async def test_ttl_jitter(self):
+        store = AsyncMock()
+        store.get.return_value = None
+        self.cache.store = store
+        ttls = set()
+        for _ in range(5):
+            await self.cache.get_or_load(1, ("contact", 1), self.loader)
+            ttls.add(store.set.await_args.args[2])
+        self.assertTrue(all(60 * 0.9 <= ttl <= 60 * 1.1 for ttl in ttls))
+        self.assertGreater(len(ttls), 1)
+
+    async def test_store_unavailable(self):
+        store = AsyncMock()
+        store.get.side_effect = redis.ConnectionError()
+        store.set.side_effect = redis.ConnectionError()
+        self.cache.store = store
+        self.assertEqual(await self.cache.get_or_load(1, ("contact", 1), self.loader), {"id": 1})
+
+
+class TestRedisCache(unittest.IsolatedAsyncioTestCase):
+
+    async def test_get_set(self):
+        redis_client = AsyncMock()
+        cache = RedisCache(redis_client, ttl=60)
+        await cache.set("key", [{"id": 1}])
+        redis_client.setex.assert_awaited_once_with("key", 60, json.dumps([{"id": 1}]))
+        redis_client.get.return_value = json.dumps([{"id": 1}]).encode()
+        self.assertEqual(await cache.get("key"), [{"id": 1}])
+        redis_client.get.return_value = None
+        self.assertIsNone(await cache.get("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import sys
+import os
+import io
+
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date
+
+from src.database.models import Contact
+from src.services.contacts_io import detect_format, iter_chunks, dump_header, dump_contacts
+
+
+VALID = "Ann,Lee,ann@ex.com,+380671234567,1990-05-01"
+
+
+class TestContactsImport(unittest.TestCase):
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format("contacts.CSV"), "csv")
+        self.assertEqual(detect_format("contacts.ndjson"), "jsonl")
+        self.assertIsNone(detect_format("contacts.txt"))
+        self.assertIsNone(detect_format(None))
+
+    def test_csv_chunks(self):
+        data = "first_name,last_name,email,phone,birthday\n" + f"{VALID}\n" * 5
+        chunks = list(iter_chunks(io.BytesIO(data.encode()), "csv", 2))
+        self.assertEqual([len(contacts) for contacts, _ in chunks], [2, 2, 1])
+        self.assertEqual(chunks[0][0][0]["first_name"], "Ann")
+        self.assertEqual(chunks[0][0][0]["notes"], "")
+
+    def test_csv_errors(self):
+        data = (
+            "\ufefffirst_name,last_name,email,phone,birthday\n"
+            f"{VALID}\n"
+            "Bob,Lee,bob,+380671234567,1990-05-01\n"
+            "Kim,Lee,kim@ex.com,+380671234567,\n"
+        )
+        contacts, errors = next(iter_chunks(io.BytesIO(data.encode()), "csv", 10))
+        self.assertEqual(len(contacts), 1)
+        self.assertEqual([error["row"] for error in errors], [2, 3])
+        self.assertTrue(errors[0]["errors"][0].startswith("email"))
+        self.assertEqual(errors[1]["errors"], ["birthday: Field required"])
+
+    def test_jsonl(self):
+        data = (
+            b'{"first_name": "Ann", "email": "ann@ex.com", "phone": "+380671234567", "birthday": "1990-05-01"}\n'
+            b"\n"
+            b"{broken\n"
+            b"[1, 2]\n"
+        )
+        contacts, errors = next(iter_chunks(io.BytesIO(data), "jsonl", 10))
+        self.assertEqual(len(contacts), 1)
+        self.assertEqual([error["row"] for error in errors], [3, 4])
+        self.assertTrue(errors[0]["errors"][0].startswith("Invalid JSON"))
+
+    def test_not_utf8(self):
+        data = "first_name,last_name,email,phone,birthday\n".encode() + "Анна".encode("cp1251") + b"\n"
+        contacts, errors = next(iter_chunks(io.BytesIO(data), "csv", 10))
+        self.assertEqual(contacts, [])
+        self.assertEqual(errors[0]["row"], 1)
+        self.assertTrue(errors[0]["errors"][0].startswith("Invalid file"))
+        _, errors = next(iter_chunks(io.BytesIO(b"\xff\xfe{}\n"), "jsonl", 10))
+        self.assertTrue(errors[0]["errors"][0].startswith("Invalid file"))
+
+    def test_csv_malformed(self):
+        # a field over csv.field_size_limit()
+        data = f"first_name,last_name,email,phone,birthday\n{VALID}\nBob,{'x' * 200_000}\n{VALID}\n"
+        contacts, errors = next(iter_chunks(io.BytesIO(data.encode()), "csv", 10))
+        self.assertEqual(len(contacts), 1)
+        self.assertEqual(errors[0]["row"], 2)
+        self.assertTrue(errors[0]["errors"][0].startswith("Invalid file"))
+
+
+class TestContactsExport(unittest.TestCase):
+
+    def setUp(self):
+        self.contacts = [
+            Contact(
+                id=7,
+                first_name="Ann",
+                last_name="Lee",
+                email="ann@ex.com",
+                phone="+380671234567",
+                birthday=date(1990, 5, 1),
+                notes='a, "b"',
+            )
+        ]
+
+    def test_csv(self):
+        data = dump_header("csv") + dump_contacts(self.contacts, "csv")
+        self.assertEqual(
+            data.splitlines(),
+            [
+                "id,first_name,last_name,email,phone,birthday,notes",
+                '7,Ann,Lee,ann@ex.com,+380671234567,1990-05-01,"a, ""b"""',
+            ],
+        )
+
+    def test_jsonl(self):
+        self.assertEqual(dump_header("jsonl"), "")
+        line = dump_contacts(self.contacts, "jsonl")
+        self.assertTrue(line.endswith("\n"))
+        self.assertIn('"birthday": "1990-05-01"', line)
+
+    def test_round_trip(self):
+        for format_ in ("csv", "jsonl"):
+            data = dump_header(format_) + dump_contacts(self.contacts, format_)
+            contacts, errors = next(iter_chunks(io.BytesIO(data.encode()), format_, 10))
+            self.assertEqual(errors, [])
+            self.assertEqual(contacts[0]["notes"], 'a, "b"')
+            self.assertEqual(contacts[0]["birthday"], date(1990, 5, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
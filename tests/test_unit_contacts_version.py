@@ -0,0 +1,111 @@
+import sys
+import os
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+from fastapi import Response
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.database.models import User
+from src.routes.contacts import not_modified
+from src.services.contacts_version import ContactsVersion, etag_matches
+
+
+class TestEtagMatches(unittest.TestCase):
+
+    def test_matches(self):
+        etag = 'W/"1-abc"'
+        self.assertTrue(etag_matches('W/"1-abc"', etag))
+        self.assertTrue(etag_matches('"1-abc"', etag))
+        self.assertTrue(etag_matches('"x", W/"1-abc"', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('W/"1-abd"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+class TestContactsVersion(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.pipe = MagicMock()
+        self.pipe.__aenter__.return_value = self.pipe
+        self.pipe.execute = AsyncMock()
+        self.redis.pipeline = MagicMock(return_value=self.pipe)
+        self.version = ContactsVersion(self.redis, ttl=60)
+
+    async def test_get(self):
+        # SET NX did not replace the existing version, GET returns it
+        self.pipe.execute.return_value = [None, "abc"]
+        self.assertEqual(await self.version.etag(1), 'W/"1-abc"')
+        self.assertEqual(self.pipe.set.call_args.args[0], "contacts_version:1")
+        self.assertEqual(self.pipe.set.call_args.kwargs, {"ex": 60, "nx": True})
+        self.pipe.get.assert_called_once_with("contacts_version:1")
+        self.pipe.execute.assert_awaited_once()
+
+    async def test_get_unavailable(self):
+        self.pipe.execute.side_effect = redis.ConnectionError()
+        self.assertIsNone(await self.version.etag(1))
+
+    async def test_bump(self):
+        await self.version.bump_many([1, 2])
+        self.assertEqual(
+            [call.args[0] for call in self.pipe.set.call_args_list], ["contacts_version:1", "contacts_version:2"]
+        )
+        self.pipe.execute.assert_awaited_once()
+        self.redis.pipeline.side_effect = redis.ConnectionError()
+        with patch("builtins.print") as print_:
+            await self.version.bump(1)
+        print_.assert_not_called()
+
+    async def test_clear(self):
+
+        async def scan_iter(match):
+            yield "contacts_version:1"
+
+        self.redis.scan_iter = MagicMock(side_effect=scan_iter)
+        await self.version.clear()
+        self.redis.delete.assert_awaited_once_with("contacts_version:1")
+        self.redis.scan_iter.side_effect = redis.ConnectionError()
+        with self.assertRaises(redis.ConnectionError):
+            await self.version.clear()
+
+
+class TestNotModified(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.user = User(id=1)
+        self.request = MagicMock()
+        self.response = Response()
+
+    @patch("src.routes.contacts.contacts_version", new_callable=AsyncMock)
+    async def test_etag_set(self, contacts_version):
+        contacts_version.etag.return_value = 'W/"1-abc"'
+        self.request.headers = {}
+        self.assertIsNone(await not_modified(self.request, self.response, self.user))
+        self.assertEqual(self.response.headers["etag"], 'W/"1-abc"')
+
+    @patch("src.routes.contacts.contacts_version", new_callable=AsyncMock)
+    async def test_not_modified(self, contacts_version):
+        contacts_version.etag.return_value = 'W/"1-abc"'
+        self.request.headers = {"if-none-match": 'W/"1-abc"'}
+        # set by the rate limiter
+        self.response.headers["RateLimit-Policy"] = "5;w=60"
+        cached = await not_modified(self.request, self.response, self.user)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.headers["etag"], 'W/"1-abc"')
+        self.assertEqual(cached.headers["ratelimit-policy"], "5;w=60")
+        self.assertNotIn("content-length", cached.headers)
+
+    @patch("src.routes.contacts.contacts_version", new_callable=AsyncMock)
+    async def test_without_redis(self, contacts_version):
+        contacts_version.etag.return_value = None
+        self.request.headers = {"if-none-match": "*"}
+        self.assertIsNone(await not_modified(self.request, self.response, self.user))
+        self.assertNotIn("etag", self.response.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
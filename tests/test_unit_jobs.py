@@ -0,0 +1,171 @@
+import sys
+import os
+import asyncio
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+from fastapi import HTTPException
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.jobs import (
+    FAILED,
+    QUEUED,
+    SUCCEEDED,
+    NOT_RETRIED,
+    JobQueue,
+    MemoryJobStore,
+    RedisJobStore,
+    job,
+)
+
+calls = []
+
+
+@job("test_add")
+async def add(progress, a: int, b: int) -> int:
+    await progress(1, 2)
+    return a + b
+
+
+@job("test_flaky")
+async def flaky(progress, fail_times: int):
+    calls.append(fail_times)
+    if len(calls) <= fail_times:
+        raise ConnectionError("try again")
+    return len(calls)
+
+
+@job("test_once", retry=False)
+async def once(progress):
+    calls.append(1)
+    raise ConnectionError("committed a part")
+
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        calls.clear()
+        self.store = MemoryJobStore(ttl=60)
+        self.queue = JobQueue(self.store, max_attempts=3, retry_delay=0, poll_interval=0.01)
+
+    async def test_enqueue(self):
+        job_ = await self.queue.enqueue("test_add", a=1, b=2)
+        self.assertEqual(job_["status"], QUEUED)
+        self.assertEqual(await self.store.pop(), job_["id"])
+        self.assertEqual((await self.queue.get(job_["id"]))["kwargs"], {"a": 1, "b": 2})
+        with self.assertRaises(ValueError):
+            await self.queue.enqueue("unknown")
+
+    async def test_run(self):
+        job_ = await self.queue.enqueue("test_add", a=1, b=2)
+        await self.queue.run(job_)
+        job_ = await self.queue.get(job_["id"])
+        self.assertEqual((job_["status"], job_["result"], job_["done"], job_["total"]), (SUCCEEDED, 3, 1, 2))
+
+    async def test_retried(self):
+        job_ = await self.queue.enqueue("test_flaky", fail_times=2)
+        await self.queue.run(job_)
+        job_ = await self.queue.get(job_["id"])
+        self.assertEqual((job_["status"], job_["attempts"], job_["result"]), (SUCCEEDED, 3, 3))
+
+    async def test_failed(self):
+        job_ = await self.queue.enqueue("test_flaky", fail_times=5)
+        await self.queue.run(job_)
+        job_ = await self.queue.get(job_["id"])
+        self.assertEqual((job_["status"], job_["attempts"]), (FAILED, 3))
+        self.assertIn("try again", job_["error"])
+
+    async def test_not_retried(self):
+        self.assertIn("test_once", NOT_RETRIED)
+        job_ = await self.queue.enqueue("test_once")
+        await self.queue.run(job_)
+        job_ = await self.queue.get(job_["id"])
+        self.assertEqual((job_["status"], job_["attempts"], len(calls)), (FAILED, 1, 1))
+
+    async def test_progress_store_unavailable(self):
+        job_ = await self.queue.enqueue("test_add", a=1, b=2)
+        save = self.store.save
+        saves = []
+
+        async def failing_save(job_):
+            saves.append(job_["done"])
+            # the progress update
+            if len(saves) == 2:
+                raise redis.ConnectionError()
+            await save(job_)
+
+        with patch.object(self.store, "save", side_effect=failing_save):
+            await self.queue.run(job_)
+        job_ = await self.queue.get(job_["id"])
+        # not retried, the progress is lost
+        self.assertEqual((job_["status"], job_["attempts"], job_["result"]), (SUCCEEDED, 1, 3))
+
+    async def test_status_store_unavailable(self):
+        job_ = await self.queue.enqueue("test_add", a=1, b=2)
+        save = self.store.save
+        saves = []
+
+        async def failing_save(job_):
+            saves.append(job_["status"])
+            # the RUNNING update of the popped job, twice
+            if len(saves) <= 2:
+                raise redis.ConnectionError()
+            await save(job_)
+
+        with patch.object(self.store, "save", side_effect=failing_save):
+            await self.queue.run(job_)
+        job_ = await self.queue.get(job_["id"])
+        # not dropped, run once the store is back
+        self.assertEqual((job_["status"], job_["attempts"], job_["result"]), (SUCCEEDED, 1, 3))
+
+    async def test_work(self):
+        job_ = await self.queue.enqueue("test_add", a=2, b=2)
+        worker = asyncio.create_task(self.queue.work())
+        for _ in range(100):
+            if (await self.queue.get(job_["id"]))["status"] == SUCCEEDED:
+                break
+            await asyncio.sleep(0.01)
+        worker.cancel()
+        self.assertEqual((await self.queue.get(job_["id"]))["result"], 4)
+
+    async def test_store_unavailable(self):
+        self.queue.store = AsyncMock()
+        self.queue.store.push.side_effect = redis.ConnectionError()
+        with self.assertRaises(HTTPException) as error:
+            await self.queue.enqueue("test_add", a=1, b=2)
+        self.assertEqual(error.exception.status_code, 503)
+
+
+class TestRedisJobStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.pipe = MagicMock()
+        self.pipe.__aenter__.return_value = self.pipe
+        self.pipe.execute = AsyncMock()
+        self.redis.pipeline = MagicMock(return_value=self.pipe)
+        self.store = RedisJobStore(self.redis, ttl=60)
+
+    async def test_save_load(self):
+        await self.store.save({"id": "1", "status": QUEUED})
+        key, raw = self.redis.set.call_args.args
+        self.assertEqual((key, self.redis.set.call_args.kwargs["ex"]), ("job:1", 60))
+        self.redis.get.return_value = raw.encode()
+        self.assertEqual(await self.store.load("1"), {"id": "1", "status": QUEUED})
+
+    async def test_queue(self):
+        await self.store.push({"id": "1", "status": QUEUED})
+        # the job and its id in one transaction
+        self.redis.pipeline.assert_called_once_with(transaction=True)
+        self.assertEqual(self.pipe.set.call_args.args[0], "job:1")
+        self.pipe.rpush.assert_called_once_with("job:queue", "1")
+        self.pipe.execute.assert_awaited_once()
+        self.redis.lpop.return_value = b"1"
+        self.assertEqual(await self.store.pop(), "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import sys
+import os
+import asyncio
+import threading
+
+import unittest
+
+from fastapi import HTTPException
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.password_hasher import PasswordHasher
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        # the minimal bcrypt rounds keep the tests fast
+        self.hasher = PasswordHasher(rounds=4, max_workers=2, max_queue=1)
+
+    def tearDown(self):
+        self.hasher.executor.shutdown(wait=True)
+
+    async def test_hash_verify(self):
+        hashed = await self.hasher.hash("secret")
+        self.assertIn("$04$", hashed)
+        self.assertTrue(await self.hasher.verify("secret", hashed))
+        self.assertFalse(await self.hasher.verify("wrong", hashed))
+        stats = self.hasher.stats()
+        self.assertEqual((stats["completed"], stats["active"], stats["queued"]), (3, 0, 0))
+
+    async def test_verify_and_update(self):
+        hashed = await self.hasher.hash("secret")
+        self.assertEqual(await self.hasher.verify_and_update("secret", hashed), (True, None))
+        other = PasswordHasher(rounds=5, max_workers=1, max_queue=1)
+        try:
+            verified, new_hash = await other.verify_and_update("secret", hashed)
+        finally:
+            other.executor.shutdown(wait=True)
+        self.assertTrue(verified)
+        self.assertIn("$05$", new_hash)
+        self.assertEqual(await self.hasher.verify_and_update("wrong", hashed), (False, None))
+
+    async def test_rejected_when_full(self):
+        release = threading.Event()
+        busy = [asyncio.ensure_future(self.hasher.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        with self.assertRaises(HTTPException) as error:
+            await self.hasher.run(release.wait)
+        self.assertEqual(error.exception.status_code, 503)
+        stats = self.hasher.stats()
+        self.assertEqual((stats["active"], stats["queued"], stats["rejected"]), (2, 1, 1))
+        release.set()
+        await asyncio.gather(*busy)
+        self.assertEqual(self.hasher.stats()["completed"], 3)
+
+    async def test_cancelled_while_queued(self):
+        release = threading.Event()
+        busy = [asyncio.ensure_future(self.hasher.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        for _ in range(5):
+            # the client disconnects while the call waits for a thread
+            queued = asyncio.ensure_future(self.hasher.run(release.wait))
+            await asyncio.sleep(0.01)
+            queued.cancel()
+            await asyncio.gather(queued, return_exceptions=True)
+        stats = self.hasher.stats()
+        self.assertEqual((stats["active"], stats["queued"], stats["cancelled"]), (2, 0, 5))
+        release.set()
+        await asyncio.gather(*busy)
+        # the slots are free again
+        self.assertTrue(await self.hasher.run(lambda: True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+import sys
+import os
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+from fastapi import HTTPException, Response
+from starlette.datastructures import State
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.rate_limit import (
+    HybridRateLimitBackend,
+    MemoryRateLimitBackend,
+    RateLimiter,
+    RateLimitResult,
+    RedisRateLimitBackend,
+    UserQuota,
+    client_ip,
+    rate_limit_headers,
+)
+
+
+def mock_redis() -> AsyncMock:
+    redis_client = AsyncMock()
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock()
+    redis_client.pipeline = MagicMock(return_value=pipe)
+    redis_client.pipe = pipe
+    redis_client.register_script = MagicMock(return_value=AsyncMock())
+    return redis_client
+
+
+class TestMemoryRateLimitBackend(unittest.IsolatedAsyncioTestCase):
+
+    async def test_token_bucket(self):
+        backend = MemoryRateLimitBackend(maxsize=10)
+        with patch("src.services.rate_limit.time.monotonic", return_value=100):
+            self.assertEqual(await backend.hit("key", 2, 60000), RateLimitResult(2, 1, 30000, 0))
+            self.assertEqual(await backend.hit("key", 2, 60000), RateLimitResult(2, 0, 60000, 0))
+            # a token comes back every 30 seconds
+            self.assertEqual((await backend.hit("key", 2, 60000)).retry, 30000)
+            self.assertEqual((await backend.hit("other", 2, 60000)).retry, 0)
+        with patch("src.services.rate_limit.time.monotonic", return_value=130):
+            self.assertEqual((await backend.hit("key", 2, 60000)).retry, 0)
+
+    async def test_cost(self):
+        backend = MemoryRateLimitBackend(maxsize=10)
+        with patch("src.services.rate_limit.time.monotonic", return_value=100):
+            self.assertEqual((await backend.hit("key", 5, 60000, cost=4)).remaining, 1)
+            # 3 more tokens in 36 seconds
+            self.assertEqual((await backend.hit("key", 5, 60000, cost=4)).retry, 36000)
+
+    async def test_maxsize(self):
+        backend = MemoryRateLimitBackend(maxsize=2)
+        for key in ("a", "b", "c"):
+            await backend.hit(key, 1, 1000)
+        self.assertEqual(list(backend.buckets), ["b", "c"])
+
+
+class TestRedisRateLimitBackend(unittest.IsolatedAsyncioTestCase):
+
+    async def test_hit(self):
+        backend = RedisRateLimitBackend(mock_redis())
+        backend.hit_script.return_value = [3, 1500, 0]
+        self.assertEqual(await backend.hit("key", 5, 60000, cost=2), RateLimitResult(5, 2, 1500, 0))
+        backend.hit_script.assert_awaited_once_with(keys=["rate_limit:key"], args=[5, 60000, 2])
+        backend.hit_script.return_value = [5, 1000, 1]
+        self.assertEqual(await backend.hit("key", 5, 60000), RateLimitResult(5, 0, 1000, 1000))
+
+
+class TestHybridRateLimitBackend(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = mock_redis()
+        # in the middle of a window
+        clock = patch("src.services.rate_limit.time.time", return_value=1_000_050.0)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.backend = HybridRateLimitBackend(self.redis, sync_interval=60, sync_batch=100, maxsize=100)
+
+    async def test_local_limit(self):
+        results = [await self.backend.hit("key", 3, 60000) for _ in range(3)]
+        self.assertEqual([result.remaining for result in results], [2, 1, 0])
+        self.assertEqual({result.retry for result in results}, {0})
+        # the window ends in 30 seconds
+        self.assertEqual(await self.backend.hit("key", 3, 60000), RateLimitResult(3, 0, 30000, 30000))
+        # no round trip per request
+        self.redis.pipe.execute.assert_not_awaited()
+
+    async def test_sync(self):
+        await self.backend.hit("key", 3, 60000)
+        # another worker counted 2 more in the window
+        self.redis.pipe.execute.return_value = [3, True]
+        await self.backend.sync()
+        self.assertEqual(self.redis.pipe.incrby.call_args.args[1], 1)
+        self.redis.pipe.execute.assert_awaited_once()
+        self.assertGreater((await self.backend.hit("key", 3, 60000)).retry, 0)
+
+    async def test_cost(self):
+        self.assertEqual((await self.backend.hit("key", 5, 60000, cost=4)).remaining, 1)
+        self.assertGreater((await self.backend.hit("key", 5, 60000, cost=2)).retry, 0)
+        # the rejected request takes nothing
+        self.assertEqual((await self.backend.hit("key", 5, 60000)).remaining, 0)
+
+    async def test_sync_unavailable(self):
+        await self.backend.hit("key", 3, 60000)
+        self.redis.pipe.execute.side_effect = redis.ConnectionError()
+        await self.backend.sync()
+        (counter,) = self.backend.counters.values()
+        self.assertEqual((counter.synced, counter.pending), (0, 1))
+        self.redis.pipe.execute.side_effect = None
+        self.redis.pipe.execute.return_value = [1, True]
+        await self.backend.sync()
+        self.assertEqual((counter.synced, counter.pending), (1, 0))
+
+    async def test_sync_batch(self):
+        self.backend.sync_batch = 2
+        self.redis.pipe.execute.return_value = [2, True]
+        await self.backend.hit("key", 10, 60000)
+        self.assertIsNone(self.backend.sync_task)
+        await self.backend.hit("key", 10, 60000)
+        await self.backend.sync_task
+        self.redis.pipe.execute.assert_awaited_once()
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        backends = patch.dict(
+            "src.services.rate_limit.rate_limit_backends", {"memory": MemoryRateLimitBackend(maxsize=10)}
+        )
+        backends.start()
+        self.addCleanup(backends.stop)
+
+    def request(self, forwarded: str | None = None) -> MagicMock:
+        request = MagicMock()
+        request.headers = {"x-forwarded-for": forwarded} if forwarded else {}
+        request.client.host = "10.0.0.1"
+        request.method = "GET"
+        request.scope = {"route": MagicMock(path="/api/contacts/{contact_id}")}
+        request.state = State()
+        return request
+
+    def test_client_ip(self):
+        self.assertEqual(client_ip(self.request()), "10.0.0.1")
+        self.assertEqual(client_ip(self.request("1.2.3.4, 10.0.0.2")), "1.2.3.4")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(times=1, seconds=1, backend="unknown")
+
+    async def test_too_many_requests(self):
+        limiter = RateLimiter(times=2, seconds=60, backend="memory")
+        response = Response()
+        await limiter(self.request(), response)
+        self.assertEqual(response.headers["RateLimit-Remaining"], "1")
+        self.assertEqual(response.headers["RateLimit-Policy"], "2;w=60")
+        with self.assertRaises(HTTPException) as error:
+            await limiter(self.request(), Response())
+            await limiter(self.request(), Response())
+        self.assertEqual(error.exception.status_code, 429)
+        self.assertEqual(error.exception.headers["Retry-After"], "30")
+        self.assertEqual(error.exception.headers["RateLimit-Remaining"], "0")
+
+    @patch("src.services.rate_limit.pool_occupancy", return_value=0.0)
+    def test_request_cost(self, pool_occupancy):
+        limiter = RateLimiter(times=5, seconds=60, cost=lambda request: 3)
+        self.assertEqual(limiter.request_cost(self.request()), 3)
+        # twice as much while the database is busy, but no more than the limit
+        pool_occupancy.return_value = 0.9
+        self.assertEqual(limiter.request_cost(self.request()), 5)
+        self.assertEqual(RateLimiter(times=5, seconds=60).request_cost(self.request()), 2)
+
+    async def test_user_quota(self):
+        quota = UserQuota(times=10, cost=lambda request: 4, backend="memory")
+        request = self.request()
+        await RateLimiter(times=5, seconds=60, backend="memory")(request, Response())
+        response = Response()
+        await quota(request, response, user=MagicMock(id=7))
+        # the quota is closer to exhaustion than the rate limit
+        self.assertEqual(response.headers["RateLimit-Remaining"], "4")
+        self.assertEqual(response.headers["RateLimit-Policy"], "5;w=60, 10;w=86400")
+        with self.assertRaises(HTTPException):
+            await quota(self.request(), Response(), user=MagicMock(id=7))
+            await quota(self.request(), Response(), user=MagicMock(id=7))
+        await quota(self.request(), Response(), user=MagicMock(id=8))
+
+    def test_rate_limit_headers(self):
+        headers = rate_limit_headers([(RateLimitResult(5, 3, 20000, 0), 60), (RateLimitResult(100, 3, 80000, 0), 86400)])
+        self.assertEqual((headers["RateLimit-Limit"], headers["RateLimit-Reset"]), ("100", "80"))
+
+    async def test_redis_unavailable(self):
+        limiter = RateLimiter(times=1, seconds=60, backend="redis")
+        backend = AsyncMock()
+        backend.hit.side_effect = redis.ConnectionError()
+        with patch.dict("src.services.rate_limit.rate_limit_backends", {"redis": backend}):
+            self.assertIsNone(await limiter(self.request(), MagicMock()))
+        backend.hit.assert_awaited_once_with("10.0.0.1:GET:/api/contacts/{contact_id}", 1, 60000, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import sys
+import os
+import socket
+import time
+
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import redis
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.redis_pool import MonitoredRedisPool, create_pool, redis_client, redis_pool
+
+
+def pool_settings(password: str):
+    settings = patch("src.services.redis_pool.settings").start()
+    settings.redis_password = password
+    settings.redis_max_connections = 2
+    settings.redis_breaker_cooldown = 5
+    settings.redis_socket_timeout = 1
+    return settings
+
+
+def closed_port() -> int:
+    # a port nothing listens on: the connects are refused
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestRedisPool(unittest.IsolatedAsyncioTestCase):
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_shared_pool(self):
+        self.assertIs(redis_client.connection_pool, redis_pool)
+        self.assertIsInstance(redis_pool, MonitoredRedisPool)
+
+    def test_password(self):
+        pool_settings("secret")
+        self.assertEqual(create_pool().connection_kwargs["password"], "secret")
+        pool_settings("")
+        # an empty REDIS_PASSWORD means no AUTH
+        self.assertIsNone(create_pool().connection_kwargs["password"])
+
+    async def test_stats(self):
+        pool_settings("")
+        pool = create_pool()
+        with patch.object(MonitoredRedisPool, "ensure_connection", AsyncMock()):
+            first = await pool.get_connection("GET")
+            await pool.get_connection("GET")
+            # both connections are in use, the third one fails at once
+            with self.assertRaises(redis.ConnectionError):
+                await pool.get_connection("GET")
+            await pool.release(first)
+        stats = pool.stats()
+        self.assertEqual((stats["max_connections"], stats["in_use"], stats["available"]), (2, 1, 1))
+        self.assertEqual((stats["checkouts"], stats["rejected"], stats["max_in_use"]), (2, 1, 2))
+        self.assertFalse(stats["breaker_open"])
+
+    async def test_redis_down(self):
+        settings = pool_settings("")
+        settings.redis_host = "127.0.0.1"
+        settings.redis_port = closed_port()
+        pool = create_pool()
+        client = redis.asyncio.Redis(connection_pool=pool)
+        start = time.perf_counter()
+        for _ in range(20):
+            with self.assertRaises(redis.ConnectionError):
+                await client.get("key")
+        # no waits for the connections
+        self.assertLess(time.perf_counter() - start, 1)
+        stats = pool.stats()
+        # only the first command tries to connect, the failed connect frees its slot
+        self.assertEqual((stats["in_use"], stats["failed"], stats["short_circuited"]), (0, 1, 19))
+        self.assertTrue(stats["breaker_open"])
+        # after the cooldown one command tries again
+        pool.open_until = time.monotonic() - 1
+        with self.assertRaises(redis.ConnectionError):
+            await client.get("key")
+        self.assertEqual((pool.stats()["failed"], pool.stats()["in_use"]), (2, 0))
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import sys
+import os
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.refresh_tokens import (
+    REUSED,
+    ROTATED,
+    UNKNOWN,
+    MemoryRefreshTokenStore,
+    RedisRefreshTokenStore,
+)
+
+
+class TestMemoryRefreshTokenStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.store = MemoryRefreshTokenStore()
+
+    async def test_rotate(self):
+        await self.store.add("test@user.com", "phone", "t1", 60)
+        self.assertEqual(await self.store.rotate("test@user.com", "phone", "t1", "t2", 60), ROTATED)
+        self.assertEqual(self.store.current("test@user.com", "phone"), "t2")
+
+    async def test_reuse_revokes_session(self):
+        await self.store.add("test@user.com", "phone", "t1", 60)
+        await self.store.add("test@user.com", "laptop", "t1", 60)
+        await self.store.rotate("test@user.com", "phone", "t1", "t2", 60)
+        self.assertEqual(await self.store.rotate("test@user.com", "phone", "t1", "t3", 60), REUSED)
+        self.assertEqual(await self.store.rotate("test@user.com", "phone", "t2", "t3", 60), UNKNOWN)
+        # the other sessions of the user are not affected
+        self.assertEqual(self.store.current("test@user.com", "laptop"), "t1")
+
+    async def test_expired(self):
+        with patch("src.services.refresh_tokens.time.monotonic", return_value=100):
+            await self.store.add("test@user.com", "phone", "t1", 60)
+        with patch("src.services.refresh_tokens.time.monotonic", return_value=161):
+            self.assertEqual(await self.store.rotate("test@user.com", "phone", "t1", "t2", 60), UNKNOWN)
+
+
+class TestRedisRefreshTokenStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.redis.register_script = MagicMock(return_value=AsyncMock())
+        self.store = RedisRefreshTokenStore(self.redis)
+
+    async def test_add(self):
+        await self.store.add("test@user.com", "phone", "t1", 60)
+        self.redis.setex.assert_awaited_once_with("refresh:test@user.com:phone", 60, "t1")
+
+    async def test_rotate(self):
+        self.store.rotate_script.return_value = 1
+        self.assertEqual(await self.store.rotate("test@user.com", "phone", "t1", "t2", 60), ROTATED)
+        self.store.rotate_script.assert_awaited_once_with(
+            keys=["refresh:test@user.com:phone"], args=["t1", "t2", 60]
+        )
+
+    async def test_revoke(self):
+        await self.store.revoke("test@user.com", "phone")
+        self.redis.delete.assert_awaited_once_with("refresh:test@user.com:phone")
+
+    async def test_clear(self):
+
+        async def scan_iter(match):
+            for key in ("refresh:a@user.com:phone", "refresh:b@user.com:laptop"):
+                yield key
+
+        self.redis.scan_iter = MagicMock(side_effect=scan_iter)
+        await self.store.clear()
+        self.redis.scan_iter.assert_called_once_with("refresh:*")
+        self.redis.delete.assert_awaited_once_with("refresh:a@user.com:phone", "refresh:b@user.com:laptop")
+
+
+if __name__ == "__main__":
+    unittest.main()
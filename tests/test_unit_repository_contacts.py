@@ -5,23 +5,34 @@ from datetime import date, timedelta, datetime
 from fastapi import HTTPException
 
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import traceback
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 load_dotenv()
 
 from src.database.models import Contact, User
-from src.schemas.contacts import ContactModel
+from src.schemas.contacts import ContactModel, ContactPatch, ContactBatchUpdateItem
 from src.repository.contacts import (
     create_contact,
     read_contacts,
     find_contact,
     delete_contact,
     update_contact,
+    patch_contact,
     get_next_birthdays,
+    get_next_days_birthdays,
+    upcoming_birthdays_stmt,
+    decode_cursor,
+    encode_cursor,
+    insert_contacts,
+    stream_contacts,
+    create_contacts,
+    find_contacts,
+    update_contacts,
+    delete_contacts,
 )
 
 
@@ -34,7 +45,11 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             email="test@user.com",
             confirmed=True,
         )
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.session.execute.return_value = MagicMock()
+        patcher = patch("src.repository.contacts.contacts_version", new_callable=AsyncMock)
+        self.contacts_version = patcher.start()
+        self.addCleanup(patcher.stop)
 
     def _print(self, result):
         """for debugging"""
@@ -111,10 +126,47 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assert_fields(result, contact)
 
     async def test_read_contacts_all(self):
-        contacts = [Contact(), Contact(), Contact(), Contact(), Contact()]
-        self.session.query().filter().all.return_value = contacts
+        contacts = [Contact(id=i) for i in range(5)]
+        self.session.execute.return_value.all.return_value = [
+            (contact, contact.id) for contact in contacts
+        ]
         result = await read_contacts(user=self.user, db=self.session)
-        self.assertEqual(result, contacts)
+        self.assertEqual(result, {"items": contacts, "next_cursor": None})
+
+    async def test_read_contacts_next_cursor(self):
+        contacts = [
+            Contact(id=1, last_name="Adams"),
+            Contact(id=2, last_name="Brown"),
+            Contact(id=3, last_name="Brown"),
+        ]
+        self.session.execute.return_value.all.return_value = [
+            (contact, contact.last_name) for contact in contacts
+        ]
+        result = await read_contacts(
+            user=self.user, db=self.session, limit=2, sort_by="last_name"
+        )
+        self.assertEqual(result["items"], contacts[:2])
+        self.assertEqual(decode_cursor(result["next_cursor"], "last_name"), ("Brown", 2))
+
+    async def test_read_contacts_invalid_cursor(self):
+        with self.assertRaises(HTTPException) as context:
+            await read_contacts(user=self.user, db=self.session, cursor="broken")
+        self.assertEqual(context.exception.status_code, 400)
+        # the sort keys are NOT NULL
+        with self.assertRaises(HTTPException) as context:
+            await read_contacts(
+                user=self.user, db=self.session, sort_by="last_name", cursor=encode_cursor("last_name", None, 2)
+            )
+        self.assertEqual(context.exception.status_code, 400)
+
+    async def test_read_contacts_keyset(self):
+        await read_contacts(
+            user=self.user, db=self.session, sort_by="birthday", cursor=encode_cursor("birthday", date(2000, 1, 2), 2)
+        )
+        stmt = self.session.execute.call_args.args[0]
+        # the row value comparison, seeks the index (user_id, birthday, id)
+        self.assertIn("(contacts.birthday, contacts.id) > (", str(stmt))
+        self.assertIn("ORDER BY contacts.birthday, contacts.id", str(stmt))
 
     async def test_read_contacts_with_query(self):
         query = "test"
@@ -134,35 +186,148 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
                 email="user_2@test.com",
             ),
         ]
-        self.session.query().filter().all.return_value = contacts
+        self.session.execute.return_value.all.return_value = [
+            (contact, contact.id) for contact in contacts
+        ]
         result = await read_contacts(q=query, user=self.user, db=self.session)
         # self._print(result)
-        self.assertEqual(result, contacts)
+        self.assertEqual(result["items"], contacts)
+
+    async def test_read_contacts_fulltext_postgresql(self):
+        self.session.get_bind.return_value.dialect.name = "postgresql"
+        self.session.execute.return_value.all.return_value = []
+        await read_contacts(q="test", user=self.user, db=self.session)
+        stmt = str(self.session.execute.call_args.args[0])
+        self.assertIn("websearch_to_tsquery", stmt)
+        self.assertIn("ts_rank_cd", stmt)
+        self.assertNotIn("lower", stmt)
+
+    async def test_read_contacts_fuzzy_postgresql(self):
+        self.session.get_bind.return_value.dialect.name = "postgresql"
+        self.session.execute.return_value.all.return_value = []
+        await read_contacts(
+            q="tset", mode="fuzzy", threshold=0.4, user=self.user, db=self.session
+        )
+        set_threshold, query = self.session.execute.call_args_list
+        self.assertIn("set_config", str(set_threshold.args[0]))
+        self.assertIn("similarity", str(query.args[0]))
+
+    async def test_insert_contacts(self):
+        contacts = [
+            ContactModel(first_name="a", birthday=date(1990, 12, 25)).model_dump(),
+            ContactModel(first_name="b", birthday=date(1991, 1, 2)).model_dump(),
+        ]
+        result = await insert_contacts(contacts, self.user, self.session)
+        self.assertEqual(result, 2)
+        rows = self.session.execute.call_args.args[1]
+        self.assertEqual([row["birthday_mmdd"] for row in rows], [1225, 102])
+        self.assertEqual({row["user_id"] for row in rows}, {self.user.id})
+        self.session.commit.assert_awaited_once()
+
+    async def test_insert_contacts_postgresql(self):
+        self.session.get_bind.return_value.dialect.name = "postgresql"
+        self.session.connection.return_value = AsyncMock()
+        contacts = [ContactModel(first_name="a", birthday=date(1990, 12, 25)).model_dump()]
+        result = await insert_contacts(contacts, self.user, self.session)
+        self.assertEqual(result, 1)
+        raw_connection = await self.session.connection.return_value.get_raw_connection()
+        copy = raw_connection.driver_connection.copy_records_to_table
+        copy.assert_awaited_once()
+        columns, records = copy.call_args.kwargs["columns"], copy.call_args.kwargs["records"]
+        self.assertEqual(records[0][columns.index("birthday_mmdd")], 1225)
+        self.session.execute.assert_not_called()
+
+    async def test_insert_contacts_empty(self):
+        self.assertEqual(await insert_contacts([], self.user, self.session), 0)
+        self.session.commit.assert_not_called()
+
+    async def test_stream_contacts(self):
+        chunks = [[Contact(id=1), Contact(id=2)], [Contact(id=3)]]
+
+        async def partitions():
+            for chunk in chunks:
+                yield chunk
+
+        result = MagicMock()
+        result.scalars.return_value.partitions.return_value = partitions()
+        self.session.stream.return_value = result
+        streamed = [chunk async for chunk in stream_contacts(self.user, self.session, 2)]
+        self.assertEqual(streamed, chunks)
+        stmt = self.session.stream.call_args.args[0]
+        self.assertEqual(stmt.get_execution_options()["yield_per"], 2)
+
+    async def test_create_contacts(self):
+        contacts = [
+            ContactModel(first_name="a", birthday=date(1990, 12, 25)),
+            ContactModel(first_name="b"),
+            ContactModel(first_name="c", birthday=date(1991, 1, 2)),
+        ]
+        created = [Contact(id=1, first_name="a"), Contact(id=2, first_name="c")]
+        self.session.execute.return_value.scalars.return_value.all.return_value = created
+        result = await create_contacts(contacts, self.user, self.session)
+        self.assertEqual([item["status"] for item in result], [201, 422, 201])
+        self.assertEqual(result[2]["contact"], created[1])
+        self.assertEqual(len(self.session.execute.call_args.args[1]), 2)
+        self.session.commit.assert_awaited_once()
+
+    async def test_find_contacts(self):
+        contacts = [Contact(id=1), Contact(id=3)]
+        self.session.execute.return_value.scalars.return_value.all.return_value = contacts
+        result = await find_contacts([3, 2, 1], self.user, self.session)
+        self.assertEqual([item["status"] for item in result], [200, 404, 200])
+        self.assertEqual(result[0]["contact"], contacts[1])
+        self.session.execute.assert_awaited_once()
+
+    async def test_update_contacts(self):
+        items = [
+            ContactBatchUpdateItem(id=1, first_name="a", birthday=date(1990, 12, 25)),
+            ContactBatchUpdateItem(id=2, first_name="b", birthday=date(1990, 12, 25)),
+            ContactBatchUpdateItem(id=3, first_name="c"),
+        ]
+        contact = Contact(id=1, first_name="a")
+        self.session.execute.return_value.scalars.return_value.all.return_value = [contact]
+        result = await update_contacts(items, self.user, self.session)
+        self.assertEqual([item["status"] for item in result], [200, 404, 422])
+        self.assertEqual(result[0]["contact"], contact)
+        update_call, _ = self.session.execute.call_args_list
+        self.assertEqual([row["contact_id"] for row in update_call.args[1]], [1, 2])
+        self.session.commit.assert_awaited_once()
+
+    async def test_delete_contacts(self):
+        self.session.execute.return_value.scalars.return_value.all.return_value = [2]
+        result = await delete_contacts([1, 2], self.user, self.session)
+        self.assertEqual([item["status"] for item in result], [404, 200])
+        self.session.execute.assert_awaited_once()
+        self.session.commit.assert_awaited_once()
+        self.contacts_version.bump.assert_awaited_once_with(self.user.id)
 
     async def test_find_contact_found(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.session.execute.return_value.scalar_one_or_none.return_value = contact
         result = await find_contact(contact_id=1, user=self.user, db=self.session)
         # self._print(result)
         self.assertEqual(result, contact)
 
     async def test_find_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.session.execute.return_value.scalar_one_or_none.return_value = None
         with self.assertRaises(HTTPException) as context:
             await find_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(context.exception.status_code, 404)
 
     async def test_remove_contact_found(self):
-        contact = Contact(id=1)
-        self.session.query().filter().first.return_value = contact
+        self.session.execute.return_value.scalar_one_or_none.return_value = 1
         result = await delete_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, {"message": "Contact successfully deleted"})
+        self.session.execute.assert_awaited_once()
+        self.assertIn("RETURNING", str(self.session.execute.call_args.args[0]))
+        self.contacts_version.bump.assert_awaited_once_with(self.user.id)
 
     async def test_remove_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.session.execute.return_value.scalar_one_or_none.return_value = None
         with self.assertRaises(HTTPException) as context:
             await delete_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(context.exception.status_code, 404)
+        self.contacts_version.bump.assert_not_called()
 
     async def test_update_contact(self):
         contact = ContactModel(
@@ -181,18 +346,38 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             birthday=date.today() + timedelta(days=12),
             notes="Тривога рішення ставити міф бак безглуздий деякий",
         )
-        self.session.query().filter().first.return_value = Contact()
+        self.session.execute.return_value.scalar_one_or_none.return_value = Contact(**contact.model_dump())
         result = await update_contact(
             contact_id=1, user=self.user, body=contact, db=self.session
         )
         self.assert_fields(result, contact)
 
         self.assertIsInstance(result, Contact)
+        self.session.execute.return_value.scalar_one_or_none.return_value = Contact(**contact_upd.model_dump())
         result = await update_contact(
             contact_id=1, user=self.user, body=contact_upd, db=self.session
         )
         self.assertIsInstance(result, Contact)
         self.assert_fields(result, contact_upd)
+        stmt = self.session.execute.call_args.args[0]
+        self.assertIn("RETURNING", str(stmt))
+        self.assertIn("birthday_mmdd", str(stmt))
+        self.assertEqual(self.session.execute.await_count, 2)
+
+    async def test_patch_contact(self):
+        contact = Contact(id=1, notes="new")
+        self.session.execute.return_value.scalar_one_or_none.return_value = contact
+        result = await patch_contact(1, self.user, ContactPatch(notes="new"), self.session)
+        self.assertEqual(result, contact)
+        stmt = str(self.session.execute.call_args.args[0])
+        self.assertIn("SET notes=", stmt)
+        self.assertNotIn("first_name=", stmt)
+
+    async def test_patch_contact_required_null(self):
+        with self.assertRaises(HTTPException) as context:
+            await patch_contact(1, self.user, ContactPatch(birthday=None), self.session)
+        self.assertEqual(context.exception.status_code, 422)
+        self.session.execute.assert_not_called()
 
     async def test_update_contact_not_found(self):
         contact_body = ContactModel(
@@ -203,7 +388,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             birthday=date.today(),
             notes="Тривога рішення ставити міф бак безглуздий деякий",
         )
-        self.session.query().filter().first.return_value = None
+        self.session.execute.return_value.scalar_one_or_none.return_value = None
         self.session.commit.return_value = None
         with self.assertRaises(HTTPException) as context:
             await update_contact(
@@ -219,13 +404,43 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             Contact(birthday=datetime.today().date()),
             Contact(birthday=datetime.today().date() + timedelta(5)),
         ]
-        self.session.query().filter().all.return_value = future_birthday_contacts
+        self.session.execute.return_value.scalars.return_value.all.return_value = (
+            future_birthday_contacts
+        )
 
         future_birthdays = await get_next_birthdays(
             user=self.user, db=self.session
         )
         self.assertEqual(future_birthdays, future_birthday_contacts)
 
+    async def test_get_next_days_birthdays_single_query(self):
+        contacts = [Contact(id=1, birthday=datetime.today().date())]
+        self.session.execute.return_value.scalars.return_value.all.return_value = contacts
+        result = await get_next_days_birthdays(user=self.user, db=self.session, days_=365)
+        self.assertEqual(result, contacts)
+        self.session.execute.assert_awaited_once()
+
+    async def test_get_next_days_birthdays_large_days(self):
+        self.session.execute.return_value.scalars.return_value.all.return_value = []
+        # today + days is beyond date.max
+        self.assertEqual(await get_next_days_birthdays(user=self.user, db=self.session, days_=10**9), [])
+
+    def test_upcoming_birthdays_stmt_sargable(self):
+        # non-leap year, the window includes March 1: February 29 is matched on the raw column
+        stmt = upcoming_birthdays_stmt(self.user, date(2023, 2, 27), 3)
+        where, order = str(stmt.whereclause), str(stmt._order_by_clause)
+        self.assertNotIn("CASE", where)
+        self.assertIn("contacts.birthday_mmdd BETWEEN", where)
+        self.assertIn("OR contacts.birthday_mmdd = ", where)
+        self.assertIn("CASE", order)
+        # no March 1 in the window
+        where = str(upcoming_birthdays_stmt(self.user, date(2023, 2, 20), 3).whereclause)
+        self.assertNotIn("OR", where)
+        # leap year
+        stmt = upcoming_birthdays_stmt(self.user, date(2024, 2, 27), 3)
+        self.assertNotIn("OR", str(stmt.whereclause))
+        self.assertNotIn("CASE WHEN (contacts.birthday_mmdd =", str(stmt._order_by_clause))
+
 
 if __name__ == "__main__":
     unittest.main()
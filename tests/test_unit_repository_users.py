@@ -1,10 +1,10 @@
 import sys
 import os
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 load_dotenv()
@@ -14,7 +14,7 @@ from src.schemas.users import UserModel
 from src.repository.users import (
     get_user_by_email,
     create_user,
-    update_token,
+    update_password,
     confirmed_email,
     update_avatar,
 )
@@ -23,12 +23,13 @@ from src.repository.users import (
 class TestUsers(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.session.execute.return_value = MagicMock()
         self.user = User(id=1)
 
     async def test_get_user_by_email(self):
         email = "test@example.com"
-        self.session.query().filter().first.return_value = self.user
+        self.session.execute.return_value.scalar_one_or_none.return_value = self.user
         result = await get_user_by_email(email, db=self.session)
         self.assertEqual(result, self.user)
 
@@ -40,25 +41,38 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result_user.email, user_data.email)
         self.assertEqual(result_user.password, user_data.password)
 
-    async def test_update_token(self):
-        token = "test_token"
-        await update_token(user=self.user, token=token, db=self.session)
-        self.assertEqual(self.user.refresh_token, token)
+    async def test_update_password(self):
+        await update_password(user=self.user, password="new_hash", db=self.session)
+        self.assertEqual(self.user.password, "new_hash")
+        self.session.commit.assert_awaited_once()
 
 
-    async def test_confirmed_email(self):
+    @patch("src.repository.users.user_cache", new_callable=AsyncMock)
+    async def test_confirmed_email(self, user_cache):
         email = "test@example.com"
-        user = MagicMock(confirmed=False)
-        self.session.query().filter().first.return_value = user
         await confirmed_email(email, db=self.session)
-        self.assertTrue(user.confirmed)
+        self.session.execute.assert_awaited_once()
+        self.assertIn("UPDATE users", str(self.session.execute.call_args.args[0]))
+        self.session.commit.assert_awaited_once()
+        user_cache.invalidate.assert_awaited_once_with(email)
 
-    async def test_update_avatar(self):
+    @patch("src.repository.users.user_cache", new_callable=AsyncMock)
+    async def test_update_avatar(self, user_cache):
         url = "https://example.com/avatar.jpg"
-        self.user.avatar = None
-        self.session.query().filter().first.return_value = self.user
+        self.user.email = "test@example.com"
+        self.user.avatar = "https://example.com/old.jpg"
+        self.session.execute.return_value.scalar_one_or_none.return_value = self.user
         result_user = await update_avatar(self.user.email, url, db=self.session)
-        self.assertEqual(result_user.avatar, url)
+        # the user of RETURNING
+        self.assertIs(result_user, self.user)
+        self.session.execute.assert_awaited_once()
+        stmt = self.session.execute.call_args.args[0]
+        self.assertIn("RETURNING", str(stmt))
+        params = stmt.compile().params
+        self.assertEqual(params["avatar"], url)
+        self.assertIn("test@example.com", params.values())
+        self.session.commit.assert_awaited_once()
+        user_cache.refresh.assert_awaited_once_with(self.user)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+import sys
+import os
+from datetime import datetime
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.seed.engine import chunk_seed, chunk_sizes, generate_chunks
+from src.seed.contacts import create_contacts
+from src.seed.users import create_users, create_users_bulk
+
+
+def double(value):
+    return [value * 2]
+
+
+class TestSeedEngine(unittest.IsolatedAsyncioTestCase):
+
+    def test_chunk_sizes(self):
+        self.assertEqual(list(chunk_sizes(25, 10)), [(0, 10), (10, 10), (20, 5)])
+        self.assertEqual(list(chunk_sizes(0, 10)), [])
+
+    def test_chunk_seed(self):
+        self.assertNotEqual(chunk_seed(1, 0), chunk_seed(0, 1))
+
+    async def test_generate_chunks_in_order(self):
+        initializer = MagicMock()
+        chunks = [rows async for rows in generate_chunks(double, [(1,), (2,), (3,)], 0, initializer, (5,))]
+        self.assertEqual(chunks, [[2], [4], [6]])
+        initializer.assert_called_once_with(5)
+
+
+class TestSeedRows(unittest.IsolatedAsyncioTestCase):
+
+    def test_create_contacts_reproducible(self):
+        contacts = create_contacts(20, 42, (7, 8))
+        self.assertEqual(contacts, create_contacts(20, 42, (7, 8)))
+        self.assertNotEqual(contacts, create_contacts(20, 43, (7, 8)))
+        self.assertTrue({contact["user_id"] for contact in contacts} <= {7, 8})
+        birthday = contacts[0]["birthday"]
+        self.assertEqual(contacts[0]["birthday_mmdd"], birthday.month * 100 + birthday.day)
+
+    def test_create_users(self):
+        users = create_users(5, 2, "hash", datetime(2024, 1, 1))
+        self.assertEqual([user["email"] for user in users], ["user_5@gmail.com", "user_6@gmail.com"])
+        self.assertEqual({user["password"] for user in users}, {"hash"})
+
+    @patch("src.seed.users.auth_service")
+    async def test_create_users_bulk_hashes_once(self, auth_service):
+        auth_service.get_password_hash = AsyncMock(return_value="hash")
+        session = MagicMock(spec=AsyncSession)
+        session.execute.return_value = MagicMock()
+        session.execute.return_value.scalar.return_value = 0
+        with patch("src.seed.users.SEED_CHUNK_SIZE", 2):
+            self.assertEqual(await create_users_bulk(5, session), 5)
+        auth_service.get_password_hash.assert_awaited_once()
+        # count + 3 chunks
+        self.assertEqual(session.execute.await_count, 4)
+        self.assertEqual(session.commit.await_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
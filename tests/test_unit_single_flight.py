@@ -0,0 +1,92 @@
+import sys
+import os
+import asyncio
+
+import unittest
+from unittest.mock import AsyncMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.single_flight import RedisLock, SingleFlight, jittered
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+
+    async def load(self, value="value", delay=0.01):
+        self.calls += 1
+        await asyncio.sleep(delay)
+        return value
+
+    async def test_coalesced(self):
+        results = await asyncio.gather(*(self.flight.do("key", self.load) for _ in range(5)))
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(self.calls, 1)
+        await asyncio.sleep(0)
+        self.assertEqual(self.flight.tasks, {})
+        await self.flight.do("key", self.load)
+        self.assertEqual(self.calls, 2)
+
+    async def test_error(self):
+        async def fail():
+            raise ValueError("db is down")
+
+        results = await asyncio.gather(
+            *(self.flight.do("key", fail) for _ in range(3)), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    async def test_cancelled_caller(self):
+        first = asyncio.ensure_future(self.flight.do("key", self.load))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(self.flight.do("key", self.load))
+        first.cancel()
+        self.assertEqual(await second, "value")
+        self.assertEqual(self.calls, 1)
+
+    async def test_spawn(self):
+        self.flight.spawn("key", self.load)
+        self.assertEqual(await self.flight.do("key", self.load), "value")
+        self.assertEqual(self.calls, 1)
+
+
+class TestJittered(unittest.TestCase):
+
+    def test_bounds(self):
+        ttls = [jittered(100, 0.1) for _ in range(200)]
+        self.assertTrue(all(90 <= ttl <= 110 for ttl in ttls))
+        self.assertGreater(len(set(ttls)), 1)
+
+
+class TestRedisLock(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.lock = RedisLock(self.redis, timeout=0.2)
+
+    async def test_acquire(self):
+        self.redis.set.return_value = True
+        token = await self.lock.acquire("key")
+        self.redis.set.assert_awaited_once_with("lock:key", token, nx=True, px=200)
+        self.redis.set.return_value = None
+        self.assertIsNone(await self.lock.acquire("key"))
+
+    async def test_release(self):
+        self.redis.get.return_value = "other"
+        await self.lock.release("key", "token")
+        self.redis.delete.assert_not_called()
+        self.redis.get.return_value = "token"
+        await self.lock.release("key", "token")
+        self.redis.delete.assert_called_once_with("lock:key")
+
+    async def test_wait(self):
+        values = iter([None, None, "value"])
+        self.assertEqual(await self.lock.wait(AsyncMock(side_effect=values), interval=0.01), "value")
+        self.assertIsNone(await self.lock.wait(AsyncMock(return_value=None), interval=0.05))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+import sys
+import os
+import json
+import time
+import asyncio
+from datetime import datetime
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.database.models import User
+from src.services.cache import LRUCache
+from src.services.user_cache import INVALIDATION_CHANNEL, UserCache, user_to_dto
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_eviction(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_ttl(self):
+        cache = LRUCache(maxsize=2, ttl=10)
+        with patch("src.services.cache.time.monotonic", return_value=100):
+            cache.set("a", 1)
+        with patch("src.services.cache.time.monotonic", return_value=109):
+            self.assertEqual(cache.get("a"), 1)
+        with patch("src.services.cache.time.monotonic", return_value=111):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+
+def mock_redis() -> AsyncMock:
+    """
+    The asyncio Redis client, its pipeline records the commands as calls of pipe.
+    """
+    redis_client = AsyncMock()
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock()
+    redis_client.pipeline = MagicMock(return_value=pipe)
+    redis_client.pipe = pipe
+    redis_client.register_script = MagicMock(return_value=AsyncMock())
+    return redis_client
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = mock_redis()
+        self.cache = UserCache(self.redis, ttl=900, local_maxsize=10, local_ttl=30, stale_ttl=300)
+        self.user = User(
+            id=1,
+            username="test_user",
+            email="test@user.com",
+            password="secret",
+            avatar="https://example.com/avatar.jpg",
+            confirmed=True,
+            created_at=datetime(2024, 1, 2, 3, 4, 5),
+            updated_at=datetime(2024, 1, 3, 3, 4, 5),
+        )
+
+    async def test_set(self):
+        await self.cache.set(self.user)
+        keys, (raw, ttl, version) = self.cache.set_script.await_args.kwargs.values()
+        self.assertEqual(keys, ["user:test@user.com"])
+        # jittered ttl + stale_ttl
+        self.assertTrue(900 * 0.9 + 300 - 1 <= ttl <= 900 * 1.1 + 300)
+        self.assertNotIn("password", json.loads(raw)["user"])
+        self.assertEqual(version, "2024-01-03T03:04:05")
+
+    async def test_get_local(self):
+        await self.cache.set(self.user)
+        user = await self.cache.get(self.user.email)
+        self.assertEqual((user.id, user.created_at), (1, self.user.created_at))
+        self.redis.get.assert_not_called()
+
+    def entry(self, fresh_for: float) -> bytes:
+        entry = {"user": user_to_dto(self.user), "fresh_until": time.time() + fresh_for}
+        return json.dumps(entry).encode()
+
+    async def test_get_redis(self):
+        self.redis.get.return_value = self.entry(100)
+        self.assertEqual((await self.cache.get(self.user.email)).username, "test_user")
+        self.assertEqual((await self.cache.get(self.user.email)).username, "test_user")
+        self.redis.get.assert_awaited_once_with("user:test@user.com")
+
+    async def test_get_miss(self):
+        self.redis.get.return_value = None
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.redis.get.side_effect = redis.ConnectionError()
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.redis.get.side_effect = None
+        self.redis.get.return_value = b"\x80\x04pickle"
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.redis.get.return_value = json.dumps(user_to_dto(self.user)).encode()
+        self.assertIsNone(await self.cache.get(self.user.email))
+
+    async def test_delete(self):
+        await self.cache.set(self.user)
+        await self.cache.delete(self.user.email)
+        self.redis.delete.assert_awaited_once_with("user:test@user.com")
+        self.redis.get.return_value = None
+        self.assertIsNone(await self.cache.get(self.user.email))
+
+    async def test_invalidate(self):
+        await self.cache.set(self.user)
+        await self.cache.invalidate(self.user.email)
+        self.assertIsNone(self.cache.local.get(self.user.email))
+        # one round trip
+        self.redis.pipe.delete.assert_called_once_with("user:test@user.com")
+        self.redis.pipe.publish.assert_called_once_with(
+            INVALIDATION_CHANNEL, f"{self.cache.worker_id}:test@user.com"
+        )
+        self.redis.pipe.execute.assert_awaited_once()
+
+    async def test_refresh(self):
+        await self.cache.refresh(self.user)
+        self.assertIsNotNone(self.cache.local.get(self.user.email))
+        self.assertIs(self.cache.set_script.await_args.kwargs["client"], self.redis.pipe)
+        self.redis.pipe.publish.assert_called_once()
+        self.redis.pipe.execute.assert_awaited_once()
+        self.redis.setex.assert_not_called()
+
+    async def test_refresh_not_overwritten(self):
+        await self.cache.refresh(self.user)
+        # a slow load of the version before the change
+        old = User(id=1, username="old_name", email="test@user.com", updated_at=datetime(2024, 1, 1))
+        await self.cache.set(old)
+        self.assertEqual((await self.cache.get(self.user.email)).username, "test_user")
+        # the Redis entry is written by SET_SCRIPT, which compares the versions
+        self.assertEqual(self.cache.set_script.await_args.kwargs["args"][2], "2024-01-01T00:00:00")
+        # the same in another worker: the newer Redis entry is kept, so is the in-process tier
+        self.cache.local.clear()
+        self.cache.set_script.return_value = 0
+        await self.cache.set(old)
+        self.assertIsNone(self.cache.local.get(self.user.email))
+
+    async def test_refresh_unavailable(self):
+        self.redis.pipe.execute.side_effect = redis.ConnectionError()
+        await self.cache.refresh(self.user)
+        self.assertIsNotNone(self.cache.local.get(self.user.email))
+
+    async def test_on_invalidation(self):
+        await self.cache.set(self.user)
+        self.cache.on_invalidation(f"{self.cache.worker_id}:test@user.com")
+        self.assertIsNotNone(self.cache.local.get("test@user.com"))
+        self.cache.on_invalidation(b"other:test@user.com")
+        self.assertIsNone(self.cache.local.get("test@user.com"))
+        await self.cache.set(self.user)
+        self.cache.on_invalidation("other:*")
+        self.assertIsNone(self.cache.local.get("test@user.com"))
+
+    async def test_clear(self):
+        await self.cache.set(self.user)
+
+        async def scan_iter(match):
+            yield "user:test@user.com"
+
+        self.redis.scan_iter = MagicMock(side_effect=scan_iter)
+        await self.cache.clear()
+        self.assertIsNone(self.cache.local.get(self.user.email))
+        self.redis.scan_iter.assert_called_once_with("user:*")
+        self.redis.pipe.delete.assert_called_once_with("user:test@user.com")
+        self.redis.pipe.publish.assert_called_once_with(INVALIDATION_CHANNEL, f"{self.cache.worker_id}:*")
+
+
+class TestUserCacheLoad(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = mock_redis()
+        self.redis.get.return_value = None
+        self.cache = UserCache(self.redis, ttl=900, local_maxsize=10, local_ttl=30, stale_ttl=300)
+        self.user = User(id=1, username="test_user", email="test@user.com", confirmed=True)
+
+    async def test_get_or_load_coalesced(self):
+        calls = []
+
+        async def loader(email, db):
+            calls.append(email)
+            await asyncio.sleep(0.01)
+            return self.user
+
+        users = await asyncio.gather(
+            *(self.cache.get_or_load(self.user.email, None, loader) for _ in range(10))
+        )
+        self.assertEqual(calls, [self.user.email])
+        self.assertEqual({user.id for user in users}, {1})
+        self.assertIsNot(users[0], users[1])
+
+    async def test_get_or_load_unknown(self):
+        async def loader(email, db):
+            return None
+
+        self.assertIsNone(await self.cache.get_or_load("nobody@user.com", None, loader))
+        self.cache.set_script.assert_not_awaited()
+
+    async def test_get_or_load_stale(self):
+        self.redis.get.return_value = json.dumps(
+            {"user": user_to_dto(self.user), "fresh_until": time.time() - 1}
+        ).encode()
+        with patch.object(self.cache.flight, "spawn") as spawn:
+            user = await self.cache.get_or_load(self.user.email, None, None)
+        self.assertEqual(user.id, 1)
+        spawn.assert_called_once()
+
+    async def test_load_locked(self):
+        self.cache.lock_timeout = 1
+        # another worker holds the lock and caches the user meanwhile
+        self.redis.set.return_value = None
+        self.redis.get.side_effect = [
+            None,
+            json.dumps({"user": user_to_dto(self.user), "fresh_until": time.time() + 100}).encode(),
+        ]
+        loader = MagicMock()
+        data = await self.cache.load(self.user.email, None, loader)
+        self.assertEqual(data["id"], 1)
+        loader.assert_not_called()
+
+
+class TestUserCacheListen(unittest.IsolatedAsyncioTestCase):
+
+    async def test_listen(self):
+        cache = UserCache(mock_redis(), ttl=900, local_maxsize=10, local_ttl=30)
+        cache.local.set("test@user.com", {"id": 1})
+        cache.local.set("kept@user.com", {"id": 2})
+
+        pubsub = MagicMock()
+        pubsub.__aenter__.return_value = pubsub
+        pubsub.subscribe = AsyncMock()
+        # an idle poll (None) is not a lost connection
+        pubsub.get_message = AsyncMock(
+            side_effect=[None, {"type": "message", "data": "other:test@user.com"}, asyncio.CancelledError]
+        )
+        redis_client = MagicMock()
+        redis_client.pubsub.return_value = pubsub
+        with self.assertRaises(asyncio.CancelledError):
+            await cache.listen(redis_client)
+        pubsub.subscribe.assert_awaited_once_with(INVALIDATION_CHANNEL)
+        self.assertIsNone(cache.local.get("test@user.com"))
+        self.assertIsNotNone(cache.local.get("kept@user.com"))
+
+
+if __name__ == "__main__":
+    unittest.main()